@@ -1,23 +1,535 @@
+import itertools
+import sqlite3
+import time
 import pandas as pd
 import numpy as np
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+import report
+from statistics_creator import StatisticsAccumulator
 
+# Год и месяц публикации вычисляются из published_at самой базой и хранятся в индексах
+_year_sql = 'CAST(substr(published_at, 1, 4) AS INTEGER)'
+_month_sql = 'substr(published_at, 1, 7)'
+_vacancies_indexes = {'idx_{table}_year_name_salary': '(year, name, Salary)',
+                      'idx_{table}_area_salary': '(area_name, Salary)',
+                      'idx_{table}_name_salary': '(name, Salary)'}
+# Настройки соединения на время массовой загрузки: журнал WAL, без fsync, кэш страниц 256 МБ
+_load_pragmas = {'synchronous': 'OFF', 'cache_size': '-262144', 'temp_store': 'MEMORY'}
+_load_modes = ('append', 'replace', 'upsert')
+
+# Сводные таблицы отчёта: суммы и число зарплат по годам, городам и годам профессий из таблицы professions.
+# Профессия ищется в названии с учётом регистра, как в StatisticsAccumulator
+_aggregate_tables = [
+    'CREATE TABLE IF NOT EXISTS professions (profession TEXT PRIMARY KEY) WITHOUT ROWID',
+    'CREATE TABLE IF NOT EXISTS agg_year (year INTEGER PRIMARY KEY, salary_sum REAL NOT NULL, cnt INTEGER NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS agg_town (area_name TEXT PRIMARY KEY, salary_sum REAL NOT NULL, '
+    'cnt INTEGER NOT NULL) WITHOUT ROWID',
+    'CREATE TABLE IF NOT EXISTS agg_year_profession (profession TEXT, year INTEGER, salary_sum REAL NOT NULL, '
+    'cnt INTEGER NOT NULL, PRIMARY KEY (profession, year)) WITHOUT ROWID']
+_aggregate_upsert = 'ON CONFLICT DO UPDATE SET salary_sum = salary_sum + excluded.salary_sum, cnt = cnt + excluded.cnt'
+# Пересчёт каждой сводной таблицы по таблице вакансий, столбцы в порядке столбцов сводной таблицы
+_aggregate_queries = {
+    'agg_year': 'SELECT year, sum(Salary), count(Salary) FROM vacancies WHERE Salary IS NOT NULL GROUP BY year',
+    'agg_town': 'SELECT area_name, sum(Salary), count(Salary) FROM vacancies WHERE Salary IS NOT NULL '
+                'GROUP BY area_name',
+    'agg_year_profession': 'SELECT profession, year, sum(Salary), count(Salary) FROM professions '
+                           'JOIN vacancies ON instr(name, profession) > 0 WHERE Salary IS NOT NULL '
+                           'GROUP BY profession, year'}
+
+
+def _aggregate_add(row: str) -> str:
+    """Тело триггера, прибавляющее строку NEW к сводным таблицам, если у неё есть зарплата."""
+    year = _year_sql.replace('published_at', f'{row}.published_at')
+    return f"""
+    INSERT INTO agg_year SELECT {year}, {row}.Salary, 1 WHERE {row}.Salary IS NOT NULL {_aggregate_upsert};
+    INSERT INTO agg_town SELECT {row}.area_name, {row}.Salary, 1 WHERE {row}.Salary IS NOT NULL {_aggregate_upsert};
+    INSERT INTO agg_year_profession SELECT profession, {year}, {row}.Salary, 1 FROM professions
+    WHERE {row}.Salary IS NOT NULL AND instr({row}.name, profession) > 0 {_aggregate_upsert};"""
+
+
+def _aggregate_subtract(row: str) -> str:
+    """Тело триггера, вычитающее строку OLD из сводных таблиц и удаляющее опустевшие группы."""
+    year = _year_sql.replace('published_at', f'{row}.published_at')
+    return f"""
+    UPDATE agg_year SET salary_sum = salary_sum - {row}.Salary, cnt = cnt - 1
+    WHERE {row}.Salary IS NOT NULL AND year = {year};
+    UPDATE agg_town SET salary_sum = salary_sum - {row}.Salary, cnt = cnt - 1
+    WHERE {row}.Salary IS NOT NULL AND area_name = {row}.area_name;
+    UPDATE agg_year_profession SET salary_sum = salary_sum - {row}.Salary, cnt = cnt - 1
+    WHERE {row}.Salary IS NOT NULL AND year = {year} AND instr({row}.name, profession) > 0;"""
+
+
+_aggregate_cleanup = """
+    DELETE FROM agg_year WHERE cnt = 0;
+    DELETE FROM agg_town WHERE cnt = 0;
+    DELETE FROM agg_year_profession WHERE cnt = 0;"""
+_aggregate_triggers = {
+    'agg_vacancies_insert': f"""
+CREATE TRIGGER IF NOT EXISTS agg_vacancies_insert AFTER INSERT ON vacancies
+BEGIN{_aggregate_add('NEW')}
+END""",
+    'agg_vacancies_delete': f"""
+CREATE TRIGGER IF NOT EXISTS agg_vacancies_delete AFTER DELETE ON vacancies
+BEGIN{_aggregate_subtract('OLD')}{_aggregate_cleanup}
+END""",
+    'agg_vacancies_update': f"""
+CREATE TRIGGER IF NOT EXISTS agg_vacancies_update AFTER UPDATE OF Salary, name, area_name, published_at ON vacancies
+BEGIN{_aggregate_subtract('OLD')}{_aggregate_add('NEW')}{_aggregate_cleanup}
+END""",
+    'agg_professions_insert': f"""
+CREATE TRIGGER IF NOT EXISTS agg_professions_insert AFTER INSERT ON professions
+BEGIN
+    INSERT INTO agg_year_profession
+    SELECT NEW.profession, year, sum(Salary), count(Salary) FROM vacancies
+    WHERE Salary IS NOT NULL AND instr(name, NEW.profession) > 0 GROUP BY year;
+END""",
+    'agg_professions_delete': """
+CREATE TRIGGER IF NOT EXISTS agg_professions_delete AFTER DELETE ON professions
+BEGIN
+    DELETE FROM agg_year_profession WHERE profession = OLD.profession;
+END"""}
 
 def createDataBaseCurrencies():
     engine = create_engine('sqlite:///Vacancies.db', echo=False)
 
 
-def insert_table(filename='monthly_currency.csv', tablename='currencies'):
+def insert_table(filename='monthly_currency.csv', tablename='currencies', mode='append', key=None):
     """
-    Вставка таблицы, прямое преобразование из csv в таблицу SQlite
+    Вставка таблицы из csv в базу Vacancies.db потоковым загрузчиком load_csv
 
     :param filename: имя файла
     :param tablename: название таблицы
+    :param mode: append, replace или upsert
+    :param key: столбцы ключа для режима upsert
+    :return: отчёт load_csv о загрузке
+    """
+    return load_csv(create_engine('sqlite:///Vacancies.db', echo=False), filename, tablename, mode, key)
+
+
+def table_columns(connection, table: str) -> list:
+    """
+    Список столбцов таблицы, включая генерируемые
+
+    :param connection: соединение sqlalchemy
+    :param table: название таблицы
+    :return: имена столбцов, пустой список - таблицы нет
+    """
+    return [row[1] for row in connection.exec_driver_sql(f'PRAGMA table_xinfo("{table}")')]
+
+
+def create_vacancies_indexes(engine, table='vacancies'):
+    """
+    Создает индексы таблицы вакансий: (year, name, Salary) и (area_name, Salary) покрывают запросы отчёта,
+    так что они читают только индексы, без обращений к строкам таблицы, (name, Salary) - точный поиск профессии
+
+    :param engine: Движок взаимодействия с базой данных SQLite
+    :param table: название таблицы
     :return: None
     """
-    df = pd.read_csv(filename, delimiter=',')
-    engine = create_engine('sqlite:///Vacancies.db', echo=False)
-    df.to_sql(tablename, con=engine, index=False)
+    with engine.begin() as connection:
+        for name, columns in _vacancies_indexes.items():
+            connection.exec_driver_sql(f'CREATE INDEX IF NOT EXISTS "{name.format(table=table)}" '
+                                       f'ON "{table}" {columns}')
+        connection.exec_driver_sql(f'ANALYZE "{table}"')
+
+
+def drop_vacancies_indexes(engine, table='vacancies'):
+    """
+    Удаляет индексы таблицы вакансий, например перед массовой загрузкой
+
+    :param engine: Движок взаимодействия с базой данных SQLite
+    :param table: название таблицы
+    :return: None
+    """
+    with engine.begin() as connection:
+        for name in _vacancies_indexes:
+            connection.exec_driver_sql(f'DROP INDEX IF EXISTS "{name.format(table=table)}"')
+
+
+def migrate_vacancies_schema(engine, table='vacancies', indexes=True):
+    """
+    Приводит таблицу вакансий к управляемой схеме: создает её или добавляет к существующей вычисляемые
+    столбцы year и month и индексы. На SQLite старше 3.31 без генерируемых столбцов year и month
+    заполняются обновлением и триггером после вставки
+
+    :param engine: Движок взаимодействия с базой данных SQLite
+    :param table: название таблицы
+    :param indexes: создать индексы
+    :return: None
+    """
+    generated = sqlite3.sqlite_version_info >= (3, 31, 0)
+    computed = {'year': ('INTEGER', _year_sql), 'month': ('TEXT', _month_sql)}
+    with engine.begin() as connection:
+        columns = table_columns(connection, table)
+        if len(columns) == 0:
+            connection.exec_driver_sql(f'CREATE TABLE "{table}" (name TEXT, Salary REAL, area_name TEXT, '
+                                       f'published_at TEXT)')
+        for column, (column_type, expression) in computed.items():
+            if column in columns:
+                continue
+            if generated:
+                connection.exec_driver_sql(f'ALTER TABLE "{table}" ADD COLUMN {column} {column_type} '
+                                           f'GENERATED ALWAYS AS ({expression}) VIRTUAL')
+            else:
+                connection.exec_driver_sql(f'ALTER TABLE "{table}" ADD COLUMN {column} {column_type}')
+                connection.exec_driver_sql(f'UPDATE "{table}" SET {column} = {expression}')
+        if not generated:
+            connection.exec_driver_sql(f'CREATE TRIGGER IF NOT EXISTS "{table}_computed_columns" '
+                                       f'AFTER INSERT ON "{table}" BEGIN UPDATE "{table}" '
+                                       f'SET year = {_year_sql}, month = {_month_sql} WHERE rowid = NEW.rowid; END')
+    if indexes:
+        create_vacancies_indexes(engine, table)
+
+
+def create_table_like(engine, table: str, frame: pd.DataFrame):
+    """
+    Создает таблицу по столбцам и типам первой порции csv. Таблица вакансий создается
+    в управляемой схеме migrate_vacancies_schema, без индексов
+
+    :param engine: Движок взаимодействия с базой данных SQLite
+    :param table: название таблицы
+    :param frame: первая порция данных
+    :return: None
+    """
+    if table == 'vacancies':
+        migrate_vacancies_schema(engine, table, indexes=False)
+    else:
+        frame.head(0).to_sql(table, con=engine, index=False)
+
+
+def deferred_indexes(connection, table: str) -> list:
+    """
+    Неуникальные индексы таблицы, которые можно удалить на время загрузки и построить заново
+
+    :param connection: соединение sqlite3
+    :param table: название таблицы
+    :return: список (имя, SQL создания)
+    """
+    unique = {row[1] for row in connection.execute(f'PRAGMA index_list("{table}")') if row[2]}
+    return [(name, sql) for name, sql in connection.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql NOT NULL", (table,))
+        if name not in unique]
+
+
+def insert_statement(table: str, columns: list, mode: str, key: list) -> str:
+    """
+    Запрос вставки строки с перечислением столбцов, для upsert - с обновлением по ключу
+
+    :param table: название таблицы
+    :param columns: столбцы csv
+    :param mode: append, replace или upsert
+    :param key: столбцы ключа для режима upsert
+    :return: SQL запрос с параметрами ?
+    """
+    names = ', '.join(f'"{column}"' for column in columns)
+    statement = f'INSERT INTO "{table}" ({names}) VALUES ({", ".join("?" * len(columns))})'
+    if mode != 'upsert':
+        return statement
+    updates = ', '.join(f'"{column}" = excluded."{column}"' for column in columns if column not in key)
+    conflict = ', '.join(f'"{column}"' for column in key)
+    return statement + f' ON CONFLICT ({conflict}) ' + (f'DO UPDATE SET {updates}' if updates else 'DO NOTHING')
+
+
+def load_csv(engine, filename='trimmed_vacancies_data.csv', table='vacancies', mode='append', key=None,
+             chunksize=50_000, transaction_rows=500_000) -> dict:
+    """
+    Потоковая загрузка csv в SQLite: файл читается порциями по chunksize строк и вставляется executemany
+    в транзакциях по transaction_rows строк. На время загрузки включается WAL, отключается synchronous и
+    увеличивается кэш. Если таблица пуста (в том числе в режиме replace), неуникальные индексы удаляются и
+    строятся заново в конце, иначе остаются на месте. Индексы таблицы вакансий создаются после загрузки,
+    курсы из таблицы currencies после загрузки переносятся в rates.
+
+    :param engine: Движок взаимодействия с базой данных SQLite
+    :param filename: имя csv файла с заголовком
+    :param table: название таблицы
+    :param mode: append - дописать строки, replace - заменить таблицу, upsert - обновить строки с тем же key
+    :param key: столбцы ключа для режима upsert, по ним создается уникальный индекс
+    :param chunksize: строк в одной порции
+    :param transaction_rows: строк в одной транзакции
+    :return: словарь с числом строк, временем загрузки и скоростью в строках в секунду
+    """
+    if mode not in _load_modes:
+        raise ValueError(f'Неизвестный режим загрузки: {mode}')
+    if mode == 'upsert' and not key:
+        raise ValueError('Для режима upsert нужен key')
+    start = time.perf_counter()
+    chunks = pd.read_csv(filename, delimiter=',', chunksize=chunksize)
+    first = next(chunks, None)
+    if first is None:
+        raise ValueError(f'Пустой файл: {filename}')
+    with engine.begin() as connection:
+        if mode == 'replace':
+            connection.exec_driver_sql(f'DROP TABLE IF EXISTS "{table}"')
+        exists = len(table_columns(connection, table)) > 0
+    if not exists:
+        create_table_like(engine, table, first)
+    elif table == 'vacancies':
+        # Таблица, созданная старым insert_table, получает year и month до первой вставки, иначе строки
+        # были бы записаны, а индексы по year после загрузки не создались бы
+        migrate_vacancies_schema(engine, table, indexes=False)
+
+    raw = engine.raw_connection()
+    try:
+        connection = raw.driver_connection
+        connection.commit()
+        saved = {name: connection.execute(f'PRAGMA {name}').fetchone()[0]
+                 for name in ('journal_mode', *_load_pragmas)}
+        connection.execute('PRAGMA journal_mode = WAL')
+        for name, value in _load_pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        if mode == 'upsert':
+            columns = ', '.join(f'"{column}"' for column in key)
+            connection.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "ux_{table}_{"_".join(key)}" '
+                               f'ON "{table}" ({columns})')
+        # Перестроить индексы заново дешевле только при загрузке в пустую таблицу, иначе индексы по уже
+        # имеющимся строкам строились бы повторно ради нескольких новых
+        empty = connection.execute(f'SELECT NOT EXISTS (SELECT 1 FROM "{table}")').fetchone()[0]
+        indexes = deferred_indexes(connection, table) if empty else []
+        for name, _ in indexes:
+            connection.execute(f'DROP INDEX "{name}"')
+        statement = insert_statement(table, list(first.columns), mode, key or [])
+        rows = pending = 0
+        for chunk in itertools.chain([first], chunks):
+            values = chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None)
+            connection.executemany(statement, values)
+            rows += len(chunk)
+            pending += len(chunk)
+            if pending >= transaction_rows:
+                connection.commit()
+                pending = 0
+        for _, sql in indexes:
+            connection.execute(sql)
+        connection.execute(f'ANALYZE "{table}"')
+        connection.commit()
+        # journal_mode восстанавливается последним, чтобы файл базы не оставался в WAL после загрузки
+        for name in (*_load_pragmas, 'journal_mode'):
+            connection.execute(f'PRAGMA {name} = {saved[name]}')
+    finally:
+        raw.close()
+    if table == 'vacancies':
+        create_vacancies_indexes(engine, table)
+        if mode == 'replace' and has_aggregates(engine):
+            # Вместе с таблицей удалились и триггеры, сводные таблицы пересчитываются один раз после загрузки
+            create_aggregates(engine)
+    elif table == 'currencies':
+        # Длинная таблица rates повторяет currencies: новые и обновлённые месяцы переносятся после каждой загрузки
+        migrate_currencies(engine, table, replace=mode == 'replace')
+    seconds = time.perf_counter() - start
+    return {'rows': rows, 'seconds': seconds, 'rows_per_second': rows / seconds if seconds > 0 else float('inf')}
+
+
+def has_aggregates(engine) -> bool:
+    """
+    :param engine: Движок взаимодействия с базой данных SQLite
+    :return: созданы ли в базе сводные таблицы отчёта
+    """
+    with engine.connect() as connection:
+        return len(table_columns(connection, 'agg_year')) > 0
+
+
+def create_aggregates(engine, professions=()):
+    """
+    Создает сводные таблицы agg_year, agg_town, agg_year_profession, таблицу professions и триггеры,
+    которые обновляют сводные таблицы при вставке и удалении вакансий, и пересчитывает их по таблице вакансий
+
+    :param engine: Движок взаимодействия с базой данных SQLite
+    :param professions: профессии, для которых ведётся динамика по годам
+    :return: None
+    """
+    migrate_vacancies_schema(engine)
+    with engine.begin() as connection:
+        for statement in _aggregate_tables:
+            connection.exec_driver_sql(statement)
+        for statement in _aggregate_triggers.values():
+            connection.exec_driver_sql(statement)
+    rebuild_aggregates(engine)
+    add_professions(engine, professions)
+
+
+def drop_aggregate_triggers(engine):
+    """
+    Удаляет триггеры сводных таблиц, например перед массовой загрузкой с последующим rebuild_aggregates
+
+    :param engine: Движок взаимодействия с базой данных SQLite
+    :return: None
+    """
+    with engine.begin() as connection:
+        for name in _aggregate_triggers:
+            connection.exec_driver_sql(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def rebuild_aggregates(engine):
+    """
+    Полностью пересчитывает сводные таблицы по таблице вакансий в одной транзакции
+
+    :param engine: Движок взаимодействия с базой данных SQLite
+    :return: None
+    """
+    with engine.begin() as connection:
+        for table, query in _aggregate_queries.items():
+            connection.exec_driver_sql(f'DELETE FROM {table}')
+            connection.exec_driver_sql(f'INSERT INTO {table} {query}')
+
+
+def add_professions(engine, professions):
+    """
+    Добавляет профессии в таблицу professions, триггер сразу считает их динамику по годам
+
+    :param engine: Движок взаимодействия с базой данных SQLite
+    :param professions: названия профессий
+    :return: None
+    """
+    professions = [(profession,) for profession in professions]
+    if len(professions) == 0:
+        return
+    with engine.begin() as connection:
+        connection.exec_driver_sql('INSERT OR IGNORE INTO professions VALUES (?)', professions)
+
+
+def check_aggregates(engine) -> list:
+    """
+    Сверяет сводные таблицы с пересчётом по таблице вакансий
+
+    :param engine: Движок взаимодействия с базой данных SQLite
+    :return: названия сводных таблиц, которые расходятся с пересчётом
+    """
+    differ = []
+    with engine.connect() as connection:
+        for table, query in _aggregate_queries.items():
+            stored = pd.read_sql(f'SELECT * FROM {table}', connection)
+            fresh = pd.read_sql(query, connection)
+            fresh.columns = stored.columns
+            keys = list(stored.columns[:-2])
+            stored = stored.sort_values(keys).reset_index(drop=True)
+            fresh = fresh.sort_values(keys).reset_index(drop=True)
+            if (len(stored) != len(fresh) or not stored[keys].equals(fresh[keys])
+                    or not (stored['cnt'] == fresh['cnt']).all()
+                    or not np.allclose(stored['salary_sum'], fresh['salary_sum'])):
+                differ.append(table)
+    return differ
+
+
+def accumulator_from_aggregates(engine, profession: str) -> StatisticsAccumulator:
+    """
+    Собирает накопитель статистики из сводных таблиц, не читая таблицу вакансий.
+    Профессии, которой нет в таблице professions, добавляется и считается один раз
+
+    :param engine: Движок взаимодействия с базой данных SQLite
+    :param profession: название профессии
+    :return: StatisticsAccumulator с суммами по годам, городам и годам профессии
+    """
+    add_professions(engine, [profession])
+    accumulator = StatisticsAccumulator(profession)
+    with engine.connect() as connection:
+        for year, salary_sum, count in connection.exec_driver_sql(
+                'SELECT year, salary_sum, cnt FROM agg_year ORDER BY year'):
+            accumulator.year_sums[year], accumulator.year_counts[year] = salary_sum, count
+        for town, salary_sum, count in connection.exec_driver_sql(
+                'SELECT area_name, salary_sum, cnt FROM agg_town ORDER BY area_name'):
+            accumulator.town_sums[town], accumulator.town_counts[town] = salary_sum, count
+        for year, salary_sum, count in connection.exec_driver_sql(
+                'SELECT year, salary_sum, cnt FROM agg_year_profession WHERE profession = ? ORDER BY year',
+                (profession,)):
+            accumulator.profession_sums[year], accumulator.profession_counts[year] = salary_sum, count
+    accumulator.total = sum(accumulator.town_counts.values())
+    return accumulator
+
+
+def report_from_aggregates(engine, profession: str) -> report.Report:
+    """
+    Карточка отчёта по профессии из сводных таблиц: время не зависит от числа вакансий в базе
+
+    :param engine: Движок взаимодействия с базой данных SQLite
+    :param profession: название профессии
+    :return: Report
+    """
+    return accumulator_from_aggregates(engine, profession).create_report()
+
+
+def create_rates_table(engine):
+    """
+    Создает длинную таблицу курсов rates (month, code, rate) с составным первичным ключом
+
+    :param engine: Движок взаимодействия с базой данных SQLite
+    :return: None
+    """
+    with engine.begin() as connection:
+        connection.exec_driver_sql('CREATE TABLE IF NOT EXISTS rates (month TEXT NOT NULL, code TEXT NOT NULL, '
+                                   'rate REAL NOT NULL, PRIMARY KEY (month, code)) WITHOUT ROWID')
+
+
+def migrate_currencies(engine, table='currencies', replace=False):
+    """
+    Переносит курсы из широкой таблицы (Date и по столбцу на валюту) в таблицу rates.
+    Пустые курсы не переносятся, уже существующие пары месяц-валюта обновляются
+
+    :param engine: Движок взаимодействия с базой данных SQLite
+    :param table: название широкой таблицы курсов
+    :param replace: предварительно очистить rates, чтобы в ней остались только курсы из table
+    :return: число перенесённых курсов
+    """
+    create_rates_table(engine)
+    moved = 0
+    with engine.begin() as connection:
+        if replace:
+            connection.exec_driver_sql('DELETE FROM rates')
+        for code in table_columns(connection, table):
+            if code == 'Date':
+                continue
+            moved += connection.exec_driver_sql(
+                f'INSERT OR REPLACE INTO rates SELECT Date, ?, "{code}" FROM "{table}" WHERE "{code}" IS NOT NULL',
+                (code,)).rowcount
+    return moved
+
+
+def ensure_rates(engine, table='currencies'):
+    """
+    Создает таблицу rates, если её ещё нет: при наличии широкой таблицы курсов она переносится в rates
+
+    :param engine: Движок взаимодействия с базой данных SQLite
+    :param table: название широкой таблицы курсов
+    :return: None
+    """
+    with engine.connect() as connection:
+        if table_columns(connection, 'rates'):
+            return
+        has_wide = len(table_columns(connection, table)) > 0
+    if has_wide:
+        migrate_currencies(engine, table)
+    else:
+        create_rates_table(engine)
+
+
+def convert_salaries(engine, table='vacancies_dif_currencies', target=None):
+    """
+    Переводит зарплаты в рубли внутри SQLite одним UPDATE: зарплата - середина вилки salary_from, salary_to
+    или заданная граница, курс берётся из rates по месяцу публикации и коду валюты через первичный ключ.
+    RUR и валюты, которых нет в rates, не переводятся. Вакансии без курса валюты за месяц и за месяцы без
+    курсов получают в table NULL; в target, как и у fasterSalaryFromPositions, не попадают вакансии за месяцы
+    без курсов, а вакансии без курса валюты попадают с NULL. Если rates нет, она переносится из currencies
+
+    :param engine: Движок взаимодействия с базой данных SQLite
+    :param table: таблица вакансий со столбцами salary_from, salary_to, salary_currency, published_at
+    :param target: таблица, в которую дописываются name, Salary, area_name, published_at, None - не дописывать
+    :return: число вакансий, у которых после перевода есть зарплата (Salary не NULL)
+    """
+    ensure_rates(engine)
+    with engine.begin() as connection:
+        if 'Salary' not in table_columns(connection, table):
+            connection.exec_driver_sql(f'ALTER TABLE "{table}" ADD COLUMN Salary REAL')
+        connection.exec_driver_sql(f"""
+UPDATE "{table}" SET Salary = coalesce((salary_from + salary_to) / 2.0, salary_from, salary_to) * CASE
+    WHEN substr(published_at, 1, 7) NOT IN (SELECT month FROM rates) THEN NULL
+    WHEN salary_currency IN (SELECT code FROM rates) THEN
+        (SELECT rate FROM rates WHERE month = substr("{table}".published_at, 1, 7)
+                                  AND code = "{table}".salary_currency)
+    ELSE 1 END""")
+        converted = connection.exec_driver_sql(f'SELECT count(*) FROM "{table}" WHERE Salary IS NOT NULL').scalar()
+        if target is not None:
+            connection.exec_driver_sql(f'INSERT INTO "{target}" (name, Salary, area_name, published_at) '
+                                       f'SELECT name, Salary, area_name, published_at FROM "{table}" '
+                                       f'WHERE substr(published_at, 1, 7) IN (SELECT month FROM rates)')
+    return converted
 
 
 def getCurrencyForMonth(engine, month):
@@ -26,9 +538,18 @@ def getCurrencyForMonth(engine, month):
 
     :param engine: Движок взаимодействия с базой данных SQLite
     :param month: Дата в формате YYYY-MM
-    :return: Dataframe с валютами за один месяц
+    :return: Dataframe с валютами за один месяц: Date и по столбцу на валюту в порядке столбцов currencies,
+     пустые курсы - NaN
     """
-    return pd.read_sql(f"SELECT * FROM 'currencies' where Date = '{month}'", engine)
+    ensure_rates(engine)
+    with engine.connect() as connection:
+        codes = [column for column in table_columns(connection, 'currencies') if column != 'Date'] or \
+            [code for code, in connection.exec_driver_sql('SELECT DISTINCT code FROM rates ORDER BY code')]
+    rates = pd.read_sql(text('SELECT code, rate FROM rates WHERE month = :month'), engine, params={'month': month})
+    if len(rates) == 0:
+        return pd.DataFrame(columns=['Date', *codes])
+    row = pd.DataFrame([{'Date': month, **dict(zip(rates['code'], rates['rate']))}])
+    return row.reindex(columns=['Date', *codes])
 
 
 def example(engine, month):
@@ -42,58 +563,78 @@ def example(engine, month):
     return getCurrencyForMonth(engine, month)
 
 
+# Динамика по годам: общая и по профессии за один проход, условными агрегатами
+_years_query = """
+SELECT CAST({year} AS TEXT) AS date,
+       round(avg(Salary), 3) AS average,
+       count(Salary) AS cnt,
+       round(avg(CASE WHEN name LIKE :profession THEN Salary END), 3) AS profession_average,
+       count(CASE WHEN name LIKE :profession THEN Salary END) AS profession_cnt
+FROM vacancies
+WHERE Salary NOT NULL
+GROUP BY {year}
+"""
+
+# Все города с долей вакансий, общее число считается один раз в CTE
+_towns_query = text("""
+WITH total AS (SELECT count(*) AS cnt FROM vacancies WHERE Salary NOT NULL)
+SELECT area_name,
+       round(avg(Salary), 3) AS average,
+       1.0 * count(*) / total.cnt AS share,
+       round(1.0 * count(*) / total.cnt, 4) AS percentage
+FROM vacancies, total
+WHERE Salary NOT NULL
+GROUP BY area_name
+""")
+
+
 def read_from_sql(engine, profession=''):
-    # Динамика уровня зарплат по годам
-    df = pd.read_sql(
-        "Select substr(published_at,1,4) as date, round(avg(Salary),3) as average from vacancies where salary not "
-        "null group by substr(published_at,1,4);",
-        engine)
-
-    # Динамика количества вакансий по годам
-    df1 = pd.read_sql(
-        "Select substr(published_at,1,4) as date, count(Salary) as cnt from vacancies where salary not null group by "
-        "substr(published_at,1,4);",
-        engine)
-
-    # Динамика уровня зарплат по годам для выбранной профессии
-    df2 = pd.read_sql(f"Select substr(published_at,1,4) as date, round(avg(Salary),3) \
-     as average from vacancies where (salary not null and name like '{profession}') group by substr(published_at,1,4);",
-                      engine)
-
-    # Динамика количества вакансий по годам для выбранной профессии
-    df3 = pd.read_sql("Select substr(published_at,1,4) as date, count(Salary) \
-           as cnt from vacancies where (salary not null and name = 'Программист') group by substr(published_at,1,4);",
-                      engine)
-
-    # Средняя з/п по городам
-    df4 = pd.read_sql("Select area_name,\
-      round(avg(Salary),3) as average\
-       from vacancies\
-        where (salary not null)\
-         group by area_name\
-          having 1.0 * count(*) / (select count(*) from vacancies where (salary not null)) > 0.01\
-           order by average DESC\
-           LIMIT 10;", engine)
+    """
+    Статистика вакансий из базы: два запроса вместо шести, профессия передаётся параметром
+
+    :param engine: Движок взаимодействия с базой данных SQLite
+    :param profession: шаблон LIKE названия вакансии
+    :return: динамика зарплат и количества вакансий по годам, то же для профессии,
+     средняя з/п по городам и доля вакансий по городам (top-10)
+    """
+    with engine.connect() as connection:
+        # В таблице, созданной старым insert_table, нет столбца year: год вычисляется из даты на лету
+        year = 'year' if 'year' in table_columns(connection, 'vacancies') else _year_sql
+    years = pd.read_sql(text(_years_query.format(year=year)), engine, params={'profession': profession})
+    # Динамика уровня зарплат и количества вакансий по годам
+    df = years[['date', 'average']]
+    df1 = years[['date', 'cnt']]
+
+    # Динамика уровня зарплат и количества вакансий по годам для выбранной профессии
+    chosen = years[years['profession_cnt'] > 0].reset_index(drop=True)
+    df2 = chosen[['date', 'profession_average']].rename(columns={'profession_average': 'average'})
+    df3 = chosen[['date', 'profession_cnt']].rename(columns={'profession_cnt': 'cnt'})
+
+    towns = pd.read_sql(_towns_query, engine)
+    # Средняя з/п по городам, где больше 1% вакансий
+    df4 = (towns[towns['share'] > 0.01].sort_values('average', ascending=False, kind='stable')
+           .head(10).reset_index(drop=True)[['area_name', 'average']])
 
     # Доля вакансий по городам
-    df5 = pd.read_sql("Select area_name,\
-                      round(1.0 * count(*) / (SELECT COUNT(*) FROM vacancies where (salary not null)),4) as percentage\
-       from vacancies\
-        where (salary not null)\
-         group by area_name\
-           order by percentage DESC\
-           LIMIT 10;", engine)
+    df5 = (towns.sort_values('percentage', ascending=False, kind='stable')
+           .head(10).reset_index(drop=True)[['area_name', 'percentage']])
     return df, df1, df2, df3, df4, df5
 
-
 engine = create_engine('sqlite:///Vacancies.db', echo=False)
 
-#example_row = example(engine, '2005-01')
-#print(example_row)
-# createDataBaseCurrencies()
-# insert_currencies()
-#frames = read_from_sql(engine, 'Программист')
-#for i in frames:
-#    print(i.head(2))
-insert_table('monthly_currencies.csv')
-print('Работа выполнена студентом: Велиуллаев Владислав Маратович')
+if __name__ == '__main__':
+    #example_row = example(engine, '2005-01')
+    #print(example_row)
+    # createDataBaseCurrencies()
+    # insert_currencies()
+    #frames = read_from_sql(engine, 'Программист')
+    #for i in frames:
+    #    print(i.head(2))
+    for filename, table, mode, key in [('monthly_currencies.csv', 'currencies', 'upsert', ['Date']),
+                                       ('trimmed_vacancies_data.csv', 'vacancies', 'replace', None)]:
+        loaded = load_csv(engine, filename, table, mode, key)
+        print(f'{filename} -> {table}: {loaded["rows"]} строк за {loaded["seconds"]:.2f} с '
+              f'({loaded["rows_per_second"]:.0f} строк/с)')
+    migrate_currencies(engine)
+    create_aggregates(engine, ['Программист'])
+    print('Работа выполнена студентом: Велиуллаев Владислав Маратович')
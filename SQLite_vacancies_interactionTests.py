@@ -0,0 +1,253 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+import pandas as pd
+from sqlalchemy import create_engine, event
+import SQLite_vacancies_interaction as interaction
+import currencty_convertator
+import statistics_creator
+
+
+class VacanciesSchemaTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.directory.name, 'Vacancies.db')
+        with sqlite3.connect(self.db_file) as connection:
+            connection.execute('CREATE TABLE vacancies (name TEXT, Salary REAL, area_name TEXT, published_at TEXT)')
+            connection.executemany('INSERT INTO vacancies VALUES (?, ?, ?, ?)', [
+                ('Программист', 100.0, 'Москва', '2021-03-01T10:00:00+0300'),
+                ('Аналитик', 300.0, 'Казань', '2021-07-01T10:00:00+0300'),
+                ('Программист', 200.0, 'Москва', '2022-01-05T10:00:00+0300'),
+                ('Программист', None, 'Казань', '2022-02-05T10:00:00+0300')])
+        self.engine = create_engine(f'sqlite:///{self.db_file}', echo=False)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def test_migration_keeps_report(self):
+        interaction.migrate_vacancies_schema(self.engine)
+        interaction.migrate_vacancies_schema(self.engine)
+        with sqlite3.connect(self.db_file) as connection:
+            connection.execute("INSERT INTO vacancies (name, Salary, area_name, published_at) "
+                               "VALUES ('Программист', 400.0, 'Москва', '2022-05-05T10:00:00+0300')")
+            self.assertEqual(connection.execute('SELECT year, month FROM vacancies WHERE Salary = 400').fetchone(),
+                             (2022, '2022-05'))
+            plan = ' '.join(row[3] for row in connection.execute(
+                'EXPLAIN QUERY PLAN SELECT year, avg(Salary) FROM vacancies WHERE Salary NOT NULL GROUP BY year'))
+            self.assertIn('idx_vacancies_year_name_salary', plan)
+        df, df1, df2, df3, df4, df5 = interaction.read_from_sql(self.engine, 'Программист')
+        self.assertEqual(df['date'].tolist(), ['2021', '2022'])
+        self.assertEqual(df['average'].tolist(), [200.0, 300.0])
+        self.assertEqual(df3['cnt'].tolist(), [1, 2])
+        self.assertEqual(df4['area_name'].tolist(), ['Казань', 'Москва'])
+
+    def test_report_without_migration(self):
+        legacy = interaction.read_from_sql(self.engine, 'Программист')
+        with self.engine.connect() as connection:
+            self.assertNotIn('year', interaction.table_columns(connection, 'vacancies'))
+        interaction.migrate_vacancies_schema(self.engine)
+        for before, after in zip(legacy, interaction.read_from_sql(self.engine, 'Программист')):
+            pd.testing.assert_frame_equal(before, after)
+        self.assertEqual(legacy[0]['date'].tolist(), ['2021', '2022'])
+
+    def test_profession_is_parameter(self):
+        interaction.migrate_vacancies_schema(self.engine)
+        df, df1, df2, df3, df4, df5 = interaction.read_from_sql(self.engine, 'Аналит%')
+        self.assertEqual(df2['date'].tolist(), ['2021'])
+        self.assertEqual(df3['cnt'].tolist(), [1])
+        self.assertEqual(df1['cnt'].tolist(), [2, 1])
+        self.assertEqual(len(interaction.read_from_sql(self.engine, "' or 1=1 --")[3]), 0)
+
+
+class LoadCsvTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f'sqlite:///{os.path.join(self.directory.name, "Vacancies.db")}', echo=False)
+        self.csv_file = os.path.join(self.directory.name, 'currencies.csv')
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def load(self, frame: pd.DataFrame, mode: str, key=None) -> pd.DataFrame:
+        frame.to_csv(self.csv_file, index=False)
+        loaded = interaction.load_csv(self.engine, self.csv_file, 'currencies', mode, key, chunksize=2,
+                                      transaction_rows=3)
+        self.assertEqual(loaded['rows'], len(frame))
+        return pd.read_sql('SELECT * FROM currencies ORDER BY Date', self.engine)
+
+    def test_modes(self):
+        first = pd.DataFrame({'Date': ['2003-01', '2003-02', '2003-03'], 'USD': [30.0, None, 32.0]})
+        second = pd.DataFrame({'Date': ['2003-03', '2003-04'], 'USD': [33.0, 34.0]})
+        self.assertEqual(self.load(first, 'append')['USD'].fillna(0).tolist(), [30.0, 0.0, 32.0])
+        self.assertEqual(len(self.load(first, 'append')), 6)
+        self.assertEqual(self.load(first, 'replace')['Date'].tolist(), ['2003-01', '2003-02', '2003-03'])
+        self.assertEqual(self.load(second, 'upsert', ['Date'])['USD'].fillna(0).tolist(), [30.0, 0.0, 33.0, 34.0])
+        with self.assertRaises(ValueError):
+            self.load(second, 'upsert')
+        with sqlite3.connect(os.path.join(self.directory.name, 'Vacancies.db')) as connection:
+            self.assertEqual(connection.execute('PRAGMA journal_mode').fetchone()[0], 'delete')
+
+    def test_indexes_deferred_only_for_empty_table(self):
+        statements = []
+        event.listen(self.engine, 'connect', lambda connection, record: connection.set_trace_callback(
+            statements.append))
+        frame = pd.DataFrame({'Date': ['2003-01', '2003-02'], 'USD': [30.0, 31.0]})
+        self.load(frame, 'replace')
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql('CREATE INDEX idx_currencies_usd ON currencies (USD)')
+        self.engine.dispose()
+        statements.clear()
+        self.load(frame, 'append')
+        self.assertFalse([statement for statement in statements if statement.startswith('DROP INDEX')])
+        self.engine.dispose()
+        statements.clear()
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql('DELETE FROM currencies')
+        self.load(frame, 'append')
+        self.assertIn('DROP INDEX "idx_currencies_usd"', statements)
+        self.assertIn('CREATE INDEX idx_currencies_usd ON currencies (USD)', statements)
+
+    def test_append_to_legacy_vacancies(self):
+        pd.read_csv('trimmed_vacancies_data.csv').to_sql('vacancies', self.engine, index=False)
+        loaded = interaction.load_csv(self.engine, 'trimmed_vacancies_data.csv', 'vacancies', 'append')
+        self.assertEqual(loaded['rows'], 100)
+        with self.engine.connect() as connection:
+            self.assertIn('year', interaction.table_columns(connection, 'vacancies'))
+            self.assertEqual(connection.exec_driver_sql('SELECT count(*) FROM vacancies').scalar(), 200)
+        self.assertEqual(interaction.read_from_sql(self.engine, 'Программист')[1]['cnt'].sum(), 72)
+
+    def test_vacancies_get_indexes(self):
+        loaded = interaction.load_csv(self.engine, 'trimmed_vacancies_data.csv', 'vacancies', 'replace')
+        self.assertEqual(loaded['rows'], 100)
+        with self.engine.connect() as connection:
+            indexes = {row[0] for row in connection.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'vacancies'")}
+        self.assertIn('idx_vacancies_year_name_salary', indexes)
+        self.assertEqual(interaction.read_from_sql(self.engine, 'Программист')[1]['cnt'].sum(), 36)
+
+
+class AggregatesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f'sqlite:///{os.path.join(self.directory.name, "Vacancies.db")}', echo=False)
+        interaction.load_csv(self.engine, 'trimmed_vacancies_data.csv', 'vacancies', 'replace')
+        interaction.create_aggregates(self.engine, ['Программист'])
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def assert_same_report(self, profession: str):
+        accumulator = statistics_creator.StatisticsAccumulator(profession)
+        for row in pd.read_sql('SELECT * FROM vacancies WHERE Salary NOT NULL', self.engine).itertuples():
+            accumulator.add(row.name, row.Salary, row.area_name, row.year)
+        self.assertEqual(vars(interaction.report_from_aggregates(self.engine, profession)),
+                         vars(accumulator.create_report()))
+
+    def test_incremental_insert_and_delete(self):
+        interaction.load_csv(self.engine, 'trimmed_vacancies_data.csv', 'vacancies', 'append')
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql('DELETE FROM vacancies WHERE rowid % 3 = 0')
+        self.assertEqual(interaction.check_aggregates(self.engine), [])
+        self.assert_same_report('Программист')
+        self.assert_same_report('Разработчик')
+
+    def test_upsert_and_update(self):
+        csv_file = os.path.join(self.directory.name, 'delta.csv')
+        rows = pd.DataFrame({'name': ['Программист 1С', 'Аналитик'], 'Salary': [100.0, 200.0],
+                             'area_name': ['Москва', 'Казань'],
+                             'published_at': ['2022-01-05T10:00:00+0300', '2022-02-05T10:00:00+0300']})
+        rows.to_csv(csv_file, index=False)
+        interaction.load_csv(self.engine, csv_file, 'vacancies', 'replace')
+        rows.assign(Salary=[500.0, None], name=['Программист 1С', 'Аналитик']).to_csv(csv_file, index=False)
+        interaction.load_csv(self.engine, csv_file, 'vacancies', 'upsert', ['name', 'published_at'])
+        self.assertEqual(interaction.check_aggregates(self.engine), [])
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql("UPDATE vacancies SET name = 'Программист', area_name = 'Омск', "
+                                       "published_at = '2021-01-01T10:00:00+0300' WHERE Salary = 500")
+        self.assertEqual(interaction.check_aggregates(self.engine), [])
+        self.assert_same_report('Программист')
+
+    def test_rebuild(self):
+        interaction.drop_aggregate_triggers(self.engine)
+        interaction.load_csv(self.engine, 'trimmed_vacancies_data.csv', 'vacancies', 'append')
+        self.assertEqual(interaction.check_aggregates(self.engine), ['agg_year', 'agg_town', 'agg_year_profession'])
+        interaction.rebuild_aggregates(self.engine)
+        self.assertEqual(interaction.check_aggregates(self.engine), [])
+        interaction.load_csv(self.engine, 'trimmed_vacancies_data.csv', 'vacancies', 'replace')
+        self.assertEqual(interaction.check_aggregates(self.engine), [])
+        self.assert_same_report('Программист')
+
+
+class RatesTest(unittest.TestCase):
+    currencies = pd.DataFrame({'Date': ['2003-01', '2003-02'], 'USD': [30.0, 31.0], 'EUR': [33.0, None]})
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f'sqlite:///{os.path.join(self.directory.name, "Vacancies.db")}', echo=False)
+        self.currencies.to_sql('currencies', self.engine, index=False)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def test_migrate_and_month(self):
+        self.assertEqual(interaction.migrate_currencies(self.engine), 3)
+        month = interaction.getCurrencyForMonth(self.engine, '2003-02')
+        self.assertEqual(month.columns.tolist(), ['Date', 'USD', 'EUR'])
+        self.assertEqual(month.fillna(-1).to_dict('records'), [{'Date': '2003-02', 'USD': 31.0, 'EUR': -1}])
+        self.assertEqual(len(interaction.getCurrencyForMonth(self.engine, "2003-01' or '1'='1")), 0)
+
+    def test_convert_like_pandas(self):
+        interaction.migrate_currencies(self.engine)
+        vacancies = pd.DataFrame({'name': ['a', 'b', 'c', 'd', 'e', 'f'], 'salary_from': [100.0, None, 100.0, 10.0,
+                                                                                         100.0, 100.0],
+                                  'salary_to': [300.0, 200.0, None, 20.0, 200.0, 200.0],
+                                  'salary_currency': ['USD', 'EUR', 'RUR', 'GEL', 'EUR', 'USD'],
+                                  'area_name': ['Москва'] * 6,
+                                  'published_at': ['2003-01-05T10:00:00+0300', '2003-01-06T10:00:00+0300',
+                                                   '2003-02-01T10:00:00+0300', '2003-02-01T10:00:00+0300',
+                                                   '2003-02-01T10:00:00+0300', '2004-01-01T10:00:00+0300']})
+        vacancies.to_sql('vacancies_dif_currencies', self.engine, index=False)
+        interaction.migrate_vacancies_schema(self.engine)
+        self.assertEqual(interaction.convert_salaries(self.engine, target='vacancies'), 4)
+        source = pd.read_sql('SELECT Salary FROM vacancies_dif_currencies', self.engine)['Salary'].fillna(-1)
+        self.assertEqual(source.tolist(), [6000.0, 6600.0, 100.0, 15.0, -1, -1])
+        converted = pd.read_sql('SELECT Salary FROM vacancies', self.engine)['Salary'].fillna(-1).tolist()
+        expected = currencty_convertator.fasterSalaryFromPositions(vacancies, ['USD', 'EUR'], self.currencies)
+        self.assertEqual(expected['Salary'].fillna(-1).tolist(), converted)
+
+    def test_rates_from_currencies_on_demand(self):
+        legacy = pd.read_sql("SELECT * FROM currencies WHERE Date = '2003-01'", self.engine)
+        pd.testing.assert_frame_equal(interaction.getCurrencyForMonth(self.engine, '2003-01'), legacy)
+        with self.engine.connect() as connection:
+            self.assertTrue(interaction.table_columns(connection, 'rates'))
+
+    def test_rates_follow_currency_upserts(self):
+        interaction.getCurrencyForMonth(self.engine, '2003-01')
+        csv_file = os.path.join(self.directory.name, 'currencies.csv')
+        pd.DataFrame({'Date': ['2003-02', '2003-03'], 'USD': [32.0, 33.0], 'EUR': [34.0, 35.0]}) \
+            .to_csv(csv_file, index=False)
+        interaction.load_csv(self.engine, csv_file, 'currencies', 'upsert', ['Date'])
+        self.assertEqual(interaction.getCurrencyForMonth(self.engine, '2003-03').to_dict('records'),
+                         [{'Date': '2003-03', 'USD': 33.0, 'EUR': 35.0}])
+        self.assertEqual(interaction.getCurrencyForMonth(self.engine, '2003-02')['USD'].tolist(), [32.0])
+        pd.DataFrame({'name': ['a'], 'salary_from': [100.0], 'salary_to': [None], 'salary_currency': ['EUR'],
+                      'area_name': ['Москва'], 'published_at': ['2003-03-01T10:00:00+0300']}) \
+            .to_sql('vacancies_dif_currencies', self.engine, index=False)
+        self.assertEqual(interaction.convert_salaries(self.engine), 1)
+        self.assertEqual(pd.read_sql('SELECT Salary FROM vacancies_dif_currencies', self.engine)['Salary'].tolist(),
+                         [3500.0])
+        pd.DataFrame({'Date': ['2004-01'], 'USD': [29.0]}).to_csv(csv_file, index=False)
+        interaction.load_csv(self.engine, csv_file, 'currencies', 'replace')
+        self.assertEqual(len(interaction.getCurrencyForMonth(self.engine, '2003-03')), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
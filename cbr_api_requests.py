@@ -1,5 +1,102 @@
+import io
+import sqlite3
+import time
+import xml.etree.ElementTree as ET
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+
+_cbr_url = 'https://www.cbr.ru/scripts/XML_daily_eng.asp'
+_retry_statuses = {429, 500, 502, 503, 504}
+
+
+class RateStore:
+    """
+    Локальное хранилище курсов ЦБ в SQLite: курсы за прошедшие месяцы не меняются, поэтому каждый месяц
+    запрашивается у ЦБ один раз
+
+    Attributes:
+        db_file (str): Имя файла базы данных
+        connection (sqlite3.Connection): Соединение с базой
+    """
+
+    def __init__(self, db_file='cbr_rates.db'):
+        """
+        Parameters:
+            db_file (str): Имя файла базы данных, ':memory:' - хранилище в памяти
+        """
+        self.db_file = db_file
+        self.connection = sqlite3.connect(db_file)
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS cbr_months (month TEXT PRIMARY KEY)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS cbr_rates (month TEXT, code TEXT, rate REAL, '
+                                    'PRIMARY KEY (month, code)) WITHOUT ROWID')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def months(self) -> set:
+        """
+        :return: множество месяцев YYYY-MM, курсы за которые уже сохранены
+        """
+        return {month for month, in self.connection.execute('SELECT month FROM cbr_months')}
+
+    def has_month(self, month: str) -> bool:
+        return self.connection.execute('SELECT 1 FROM cbr_months WHERE month = ?', (month,)).fetchone() is not None
+
+    def put_month(self, month: str, rates: dict):
+        """
+        Сохраняет (или перезаписывает) курсы всех валют за месяц
+
+        :param month: месяц в формате YYYY-MM
+        :param rates: словарь "код валюты - курс за единицу"
+        """
+        self.put_months([month], [rates])
+
+    def put_months(self, months: list, rates: list):
+        """
+        Сохраняет курсы за несколько месяцев одной транзакцией
+
+        :param months: месяцы в формате YYYY-MM
+        :param rates: словари "код валюты - курс" в том же порядке, что и months
+        """
+        with self.connection:
+            self.connection.executemany('DELETE FROM cbr_rates WHERE month = ?', [(month,) for month in months])
+            self.connection.executemany('INSERT INTO cbr_rates VALUES (?, ?, ?)',
+                                        [(month, code, rate) for month, month_rates in zip(months, rates)
+                                         for code, rate in month_rates.items()])
+            self.connection.executemany('INSERT OR IGNORE INTO cbr_months VALUES (?)', [(month,) for month in months])
+
+    def to_frame(self, months: list, codes: list) -> pd.DataFrame:
+        """
+        Собирает широкую таблицу курсов одним запросом
+
+        :param months: месяцы YYYY-MM (строки таблицы)
+        :param codes: коды валют; в таблицу попадают те, что встречаются хотя бы в одном месяце
+        :return: датафрейм с индексом date и столбцом на каждую валюту
+        """
+        self.connection.execute('CREATE TEMP TABLE IF NOT EXISTS wanted_months (month TEXT PRIMARY KEY)')
+        self.connection.execute('CREATE TEMP TABLE IF NOT EXISTS wanted_codes (code TEXT PRIMARY KEY)')
+        with self.connection:
+            self.connection.execute('DELETE FROM wanted_months')
+            self.connection.execute('DELETE FROM wanted_codes')
+            self.connection.executemany('INSERT OR IGNORE INTO wanted_months VALUES (?)', [(m,) for m in months])
+            self.connection.executemany('INSERT OR IGNORE INTO wanted_codes VALUES (?)', [(c,) for c in codes])
+        rows = self.connection.execute('SELECT month, code, rate FROM cbr_rates JOIN wanted_months USING (month) '
+                                       'JOIN wanted_codes USING (code)').fetchall()
+        frame = pd.DataFrame(rows, columns=['date', 'CharCode', 'curr'])
+        pivoted = frame.pivot(index='date', columns='CharCode', values='curr')
+        pivoted = pivoted.reindex([month for month in months if month in pivoted.index])
+        return pivoted
+
+    def close(self):
+        self.connection.close()
 
 
 def get_freqs(frame: pd.DataFrame):
@@ -38,23 +135,116 @@ def get_dates(frame: pd.DataFrame):
     return frame['published_at'].min()[0:10], frame['published_at'].max()[0:10]
 
 
-def request_sbr(date: str, most_freq_list: list):
+def create_session(pool_size=8) -> requests.Session:
+    """
+    Создаёт сессию с пулом соединений, общую для всех потоков загрузки
+
+    :param pool_size: число соединений, которые держит пул
+    :return: сессия requests
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def fetch_sbr_xml(session: requests.Session, date: str, base_url=_cbr_url, retries=3, backoff=0.5, timeout=30):
     """
-    Получает курсы валют за указанный месяц
+    Скачивает XML с курсами ЦБ за месяц, повторяя запрос с растущей паузой при сетевых ошибках и ответах 429/5xx
+
+    :param session: сессия requests
+    :param date: дата в формате YYYY-MM
+    :param base_url: адрес XML_daily_eng.asp
+    :param retries: число повторов после первой неудачной попытки
+    :param backoff: пауза перед первым повтором в секундах, дальше удваивается
+    :param timeout: таймаут одного запроса в секундах
+    :return: тело ответа в байтах
+    """
+    dates = date.split('-')
+    for attempt in range(retries + 1):
+        try:
+            r = session.get(f'{base_url}?date_req=13/{dates[1]}/{dates[0]}d&d=0', timeout=timeout)
+            if r.status_code not in _retry_statuses or attempt == retries:
+                r.raise_for_status()
+                return r.content
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == retries:
+                raise
+        time.sleep(backoff * 2 ** attempt)
+
+
+def parse_sbr(content: bytes) -> dict:
+    """
+    Разбирает ответ ЦБ
+
+    :param content: XML с курсами за день
+    :return: словарь "код валюты - курс за одну единицу валюты"
+    """
+    # Потоковый разбор: из каждого Valute берутся только CharCode, Nominal и Value, разобранные узлы освобождаются
+    codes, nominals, values = [], [], []
+    fields = {}
+    for event, element in ET.iterparse(io.BytesIO(content), events=('end',)):
+        if element.tag in ('CharCode', 'Nominal', 'Value'):
+            fields[element.tag] = element.text
+        elif element.tag == 'Valute':
+            if len(fields) == 3:
+                codes.append(fields['CharCode'])
+                nominals.append(fields['Nominal'])
+                values.append(fields['Value'])
+            fields = {}
+            element.clear()
+    rates = pd.Series(values, dtype=object).str.replace(',', '.', regex=False).to_numpy(dtype=np.float64) \
+        / np.array(nominals, dtype=np.float64)
+    return dict(zip(codes, rates.tolist()))
+
+
+def store_months(store: RateStore, months: list, max_workers=8, base_url=_cbr_url, retries=3, backoff=0.5) -> dict:
+    """
+    Скачивает курсы за несколько месяцев параллельно и сохраняет каждый месяц в хранилище сразу по получении,
+    так что сбой на одном месяце не теряет уже скачанные
+
+    :param store: хранилище курсов
+    :param months: месяцы в формате YYYY-MM
+    :param max_workers: наибольшее число одновременных запросов
+    :param base_url: адрес XML_daily_eng.asp
+    :param retries: число повторов запроса
+    :param backoff: начальная пауза между повторами в секундах
+    :return: словарь "месяц - ошибка" для месяцев, которые не удалось получить или разобрать
+    """
+    failed = {}
+    with create_session(max_workers) as session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetch_sbr_xml, session, month, base_url, retries, backoff): month
+                   for month in months}
+        for future in as_completed(futures):
+            try:
+                store.put_month(futures[future], parse_sbr(future.result()))
+            except (requests.RequestException, ET.ParseError) as error:
+                failed[futures[future]] = error
+    return failed
+
+
+def request_sbr(date: str, most_freq_list: list, store: RateStore = None, refresh=False, base_url=_cbr_url):
+    """
+    Получает курсы валют за указанный месяц. Если передано хранилище, месяц берётся из него,
+    а у ЦБ запрашивается только при отсутствии или при refresh
 
     :param date: дата в формате YYYY-MM
     :param most_freq_list: список самых встречающихся валют
+    :param store: хранилище уже полученных курсов
+    :param refresh: запросить месяц у ЦБ заново, даже если он есть в хранилище
+    :param base_url: адрес XML_daily_eng.asp
     :return: возвращает датафрейм с необходимыми валютами
     """
-    dates = date.split('-')
-    r = requests.get(f'https://www.cbr.ru/scripts/XML_daily_eng.asp?date_req=13/{dates[1]}/{dates[0]}d&d=0')
-    dataframe = pd.read_xml(r.text)
-    dataframe = dataframe[['CharCode','Nominal','Value']]
-    dataframe['curr'] = dataframe.apply(lambda row: float(row.Value.replace(',', '.')) / float(row.Nominal), axis=1)
-    dataframe = dataframe.drop(columns=['Nominal', 'Value'])
-    dataframe = dataframe[dataframe['CharCode'].isin(most_freq_list)]
-    dataframe['date'] = f'{dates[0]}-{dates[1]}'
-    pivoted = dataframe.pivot(index='date', columns='CharCode', values='curr')
+    if store is not None and not refresh and store.has_month(date):
+        return store.to_frame([date], most_freq_list)
+    with create_session(1) as session:
+        rates = parse_sbr(fetch_sbr_xml(session, date, base_url))
+    if store is not None:
+        store.put_month(date, rates)
+    pivoted = pd.DataFrame([{code: rates[code] for code in sorted(rates) if code in most_freq_list}],
+                           index=pd.Index([date], name='date'))
+    pivoted.columns.name = 'CharCode'
     return pivoted
 
 
@@ -66,15 +256,21 @@ def getDateRange(start: str, end: str):
     :param end: точка конца
     :return: Серия дат в формате YYYY-MM
     """
-    dateRange = pd.date_range(start, end, freq='M').strftime("%Y-%m").tolist()
+    dateRange = pd.date_range(start, end, freq=pd.offsets.MonthEnd()).strftime("%Y-%m").tolist()
     return dateRange
 
 
-def get_monthly_currencies(filename='vacancies_dif_currencies.csv', frequency_cap=5000):
+def get_monthly_currencies(filename='vacancies_dif_currencies.csv', frequency_cap=5000, store: RateStore = None,
+                           refresh=False, max_workers=8, base_url=_cbr_url):
     """
 
     :param filename: имя csv файла с выгрузкой вакансий
     :param frequency_cap: граница, после которой вакансия является часто встречающейся
+    :param store: хранилище курсов, по умолчанию cbr_rates.db; у ЦБ запрашиваются только недостающие месяцы
+    :param refresh: запросить у ЦБ заново все месяцы
+    :param max_workers: наибольшее число одновременных запросов к ЦБ
+    :param base_url: адрес XML_daily_eng.asp
+    :raises requests.RequestException: если часть месяцев получить не удалось; полученные месяцы уже сохранены
     :return:
      None, создает CSV файл с названием monthly_currencies.csv, содержащий курсы валют в каждый месяц в промежутке
      от самой старой вакансии до самой новой вакансии
@@ -82,17 +278,29 @@ def get_monthly_currencies(filename='vacancies_dif_currencies.csv', frequency_ca
     main_frame = pd.read_csv(filename)
     dates = get_dates(main_frame)
     freqs = get_freqs(main_frame)
-    filter_freqs = filter_frequencies(freqs, 5000, declude='RUR')
-    frames = []
-    final = pd.DataFrame()
-    for i in getDateRange(dates[0], '2022-12'):
-    #for i in ['2003-01', '2003-02']:
-        req = request_sbr(i, filter_freqs)
-        frames.append(req)
-    for i in frames:
-        final = pd.concat([final, i])
-
-    final.to_csv('monthly_currencies.csv', index_label='Date', index=True)
+    filter_freqs = filter_frequencies(freqs, frequency_cap, declude='RUR')
+    months = getDateRange(dates[0], '2022-12')
+    # Хранилище по умолчанию открывается здесь же и закрывается по выходу, переданное закрывает вызывающий
+    with RateStore() if store is None else nullcontext(store) as store:
+        stored = set() if refresh else store.months()
+        missing = [i for i in months if i not in stored]
+        failed = store_months(store, missing, max_workers, base_url)
+        if failed:
+            raise requests.RequestException(f'Не удалось получить курсы ЦБ за месяцы {", ".join(sorted(failed))}, '
+                                            f'остальные сохранены в хранилище') from next(iter(failed.values()))
+        write_monthly_currencies(store, months, filter_freqs)
+
+
+def write_monthly_currencies(store: RateStore, months: list, codes: list, filename='monthly_currencies.csv'):
+    """
+    Пересобирает CSV файл курсов из хранилища без обращений к ЦБ
+
+    :param store: хранилище курсов
+    :param months: месяцы YYYY-MM
+    :param codes: коды валют
+    :param filename: имя создаваемого CSV файла
+    """
+    store.to_frame(months, codes).to_csv(filename, index_label='Date', index=True)
 
 
 if __name__ == '__main__':
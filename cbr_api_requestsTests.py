@@ -0,0 +1,180 @@
+import os
+import tempfile
+import threading
+import unittest
+import xml.etree.ElementTree as ET
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pandas as pd
+import requests
+import cbr_api_requests
+
+
+def canned_xml(month: int, year: int) -> bytes:
+    """Ответ в формате XML_daily_eng.asp: курс доллара зависит от месяца, тенге указан за 100 единиц."""
+    return f'''<?xml version="1.0" encoding="windows-1251"?>
+<ValCurs Date="13.{month:02d}.{year}" name="Foreign Currency Market">
+<Valute ID="R01235"><NumCode>840</NumCode><CharCode>USD</CharCode><Nominal>1</Nominal><Name>US Dollar</Name>
+<Value>{30 + month},5</Value></Valute>
+<Valute ID="R01335"><NumCode>398</NumCode><CharCode>KZT</CharCode><Nominal>100</Nominal><Name>Kazakhstan Tenge</Name>
+<Value>20,4402</Value></Valute>
+</ValCurs>'''.encode('windows-1251')
+
+
+class RateStoreTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        with cbr_api_requests.RateStore(':memory:') as store:
+            store.put_months(['2003-01', '2003-02'], [{'USD': 31.5, 'KZT': 0.2}, {'USD': 32.5}])
+            frame = store.to_frame(['2003-01', '2003-02', '2003-03'], ['USD', 'KZT', 'EUR'])
+            self.assertEqual(frame.index.tolist(), ['2003-01', '2003-02'])
+            self.assertEqual(frame['USD'].tolist(), [31.5, 32.5])
+            self.assertEqual(frame['KZT'].fillna(-1).tolist(), [0.2, -1])
+            store.put_month('2003-02', {'USD': 33.5, 'KZT': 0.3})
+            store.put_month('2003-02', {'USD': 33.5, 'KZT': 0.3})
+            self.assertEqual(store.months(), {'2003-01', '2003-02'})
+            self.assertEqual(store.connection.execute('SELECT count(*) FROM cbr_rates').fetchone()[0], 4)
+            again = store.to_frame(['2003-01', '2003-02'], ['USD', 'KZT'])
+            self.assertEqual(again.loc['2003-02'].tolist(), [0.3, 33.5])
+
+
+class CBRHandler(BaseHTTPRequestHandler):
+    requests = []
+    failures = {}
+    malformed = set()
+
+    def do_GET(self):
+        day, month, year = parse_qs(urlparse(self.path).query)['date_req'][0].rstrip('d').split('/')
+        self.requests.append(f'{year}-{month}')
+        if self.failures.get(f'{year}-{month}', 0) > 0:
+            self.failures[f'{year}-{month}'] -= 1
+            self.send_response(503)
+            self.end_headers()
+            return
+        body = canned_xml(int(month), int(year))
+        if f'{year}-{month}' in self.malformed:
+            body = body[:len(body) // 2]
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/xml; charset=windows-1251')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ConcurrentFetchTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), CBRHandler)
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}/scripts/XML_daily_eng.asp'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        CBRHandler.requests.clear()
+        CBRHandler.failures.clear()
+        CBRHandler.malformed.clear()
+
+    def test_order_and_retries(self):
+        months = [f'2003-{month:02d}' for month in range(1, 13)]
+        CBRHandler.failures['2003-05'] = 2
+        store = cbr_api_requests.RateStore(':memory:')
+        failed = cbr_api_requests.store_months(store, months, max_workers=4, base_url=self.base_url, backoff=0.01)
+        self.assertEqual(failed, {})
+        rates = store.to_frame(months, ['USD', 'KZT'])
+        self.assertEqual(rates.index.tolist(), months)
+        self.assertEqual(rates['USD'].tolist(), [30.5 + month for month in range(1, 13)])
+        self.assertAlmostEqual(rates['KZT'].iloc[0], 0.204402)
+        self.assertEqual(CBRHandler.requests.count('2003-05'), 3)
+
+    def test_gives_up_after_retries(self):
+        CBRHandler.failures['2004-01'] = 5
+        store = cbr_api_requests.RateStore(':memory:')
+        failed = cbr_api_requests.store_months(store, ['2004-01'], base_url=self.base_url, retries=2, backoff=0.01)
+        self.assertIsInstance(failed['2004-01'], requests.HTTPError)
+        self.assertEqual(CBRHandler.requests.count('2004-01'), 3)
+        self.assertEqual(store.months(), set())
+
+    def test_malformed_month_keeps_others(self):
+        CBRHandler.malformed.add('2007-02')
+        store = cbr_api_requests.RateStore(':memory:')
+        failed = cbr_api_requests.store_months(store, ['2007-01', '2007-02', '2007-03'], base_url=self.base_url)
+        self.assertEqual(list(failed), ['2007-02'])
+        self.assertIsInstance(failed['2007-02'], ET.ParseError)
+        self.assertEqual(store.months(), {'2007-01', '2007-03'})
+
+    def test_request_sbr_uses_store(self):
+        store = cbr_api_requests.RateStore(':memory:')
+        first = cbr_api_requests.request_sbr('2005-03', ['USD'], store, base_url=self.base_url)
+        second = cbr_api_requests.request_sbr('2005-03', ['USD'], store, base_url=self.base_url)
+        pd.testing.assert_frame_equal(first, second)
+        self.assertEqual(CBRHandler.requests, ['2005-03'])
+
+    def test_monthly_currencies_only_missing(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = cbr_api_requests.RateStore(':memory:')
+            store.put_month('2022-10', {'USD': 60.0, 'KZT': 0.13})
+            vacancies = os.path.join(directory, 'vacancies.csv')
+            pd.DataFrame({'salary_currency': ['USD'] * 3 + ['RUR'] * 3,
+                          'published_at': ['2022-09-01T10:00:00+0300'] * 6}).to_csv(vacancies, index=False)
+            cwd = os.getcwd()
+            os.chdir(directory)
+            try:
+                cbr_api_requests.get_monthly_currencies(vacancies, frequency_cap=2, store=store,
+                                                        base_url=self.base_url)
+                result = pd.read_csv('monthly_currencies.csv')
+            finally:
+                os.chdir(cwd)
+        self.assertEqual(sorted(CBRHandler.requests), ['2022-09', '2022-11'])
+        self.assertEqual(result['Date'].tolist(), ['2022-09', '2022-10', '2022-11'])
+        self.assertEqual(result['USD'].tolist(), [39.5, 60.0, 41.5])
+
+    def test_failed_month_keeps_others(self):
+        CBRHandler.failures['2006-02'] = 10
+        store = cbr_api_requests.RateStore(':memory:')
+        failed = cbr_api_requests.store_months(store, ['2006-01', '2006-02', '2006-03'], base_url=self.base_url,
+                                               retries=1, backoff=0.01)
+        self.assertEqual(list(failed), ['2006-02'])
+        self.assertIsInstance(failed['2006-02'], requests.HTTPError)
+        self.assertEqual(store.months(), {'2006-01', '2006-03'})
+
+    def test_default_store_is_closed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            vacancies = os.path.join(directory, 'vacancies.csv')
+            pd.DataFrame({'salary_currency': ['USD'] * 3,
+                          'published_at': ['2022-11-01T10:00:00+0300'] * 3}).to_csv(vacancies, index=False)
+            cwd = os.getcwd()
+            os.chdir(directory)
+            close = cbr_api_requests.RateStore.close
+            try:
+                with mock.patch.object(cbr_api_requests.RateStore, 'close', autospec=True,
+                                       side_effect=close) as closed:
+                    cbr_api_requests.get_monthly_currencies(vacancies, frequency_cap=2, base_url=self.base_url)
+            finally:
+                os.chdir(cwd)
+        closed.assert_called_once()
+
+    def test_monthly_currencies_reports_failures(self):
+        CBRHandler.failures['2022-10'] = 10
+        with tempfile.TemporaryDirectory() as directory:
+            store = cbr_api_requests.RateStore(':memory:')
+            vacancies = os.path.join(directory, 'vacancies.csv')
+            pd.DataFrame({'salary_currency': ['USD'] * 3,
+                          'published_at': ['2022-09-01T10:00:00+0300'] * 3}).to_csv(vacancies, index=False)
+            with self.assertRaises(requests.RequestException) as context:
+                cbr_api_requests.get_monthly_currencies(vacancies, frequency_cap=2, store=store,
+                                                        base_url=self.base_url)
+        self.assertIsInstance(context.exception.__cause__, requests.HTTPError)
+        self.assertEqual(store.months(), {'2022-09', '2022-11'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Замер времени cooler_statistics_creator.getAllStatistics против прежних функций, обходивших группы в Python
+и фильтровавших весь фрейм заново для каждого города. Запуск: python cooler_statistics_benchmark.py [строк ...]
+"""
+import sys
+import time
+import numpy as np
+import pandas as pd
+import cooler_statistics_creator
+
+
+def legacy_salaries_year(prepared: pd.DataFrame):
+    salaries = {}
+    for n, g in prepared.groupby('published_at'):
+        salaries.update({g['published_at'].max(): round(g['Salary'].mean())})
+    return salaries
+
+
+def legacy_vaccounts_year(prepared: pd.DataFrame):
+    return prepared['published_at'].value_counts().sort_index().to_dict()
+
+
+def legacy_town_salaries(prepared: pd.DataFrame):
+    town_counts = prepared['area_name'].value_counts()
+    precentages_ = town_counts / town_counts.sum()
+    precentages_ = precentages_[precentages_ > 0.01]
+    townsalaries = precentages_.copy() * 0
+    for town in precentages_.keys().tolist():
+        townsalaries[town] = round(prepared[prepared['area_name'] == town]['Salary'].mean())
+    return townsalaries.sort_values(ascending=False)[0:10].to_dict()
+
+
+def legacy_town_vacancies(prepared: pd.DataFrame):
+    town_counts = prepared['area_name'].value_counts()
+    return (town_counts / town_counts.sum()).sort_values(ascending=False)[0:10].to_dict()
+
+
+def legacy_statistics(prepared: pd.DataFrame, profession: str) -> tuple:
+    """Шесть словарей отчёта так, как их считал __main__ cooler_statistics_creator до группировки за один проход."""
+    professional = prepared[prepared['name'].str.contains(profession, case=False)].copy()
+    return (legacy_salaries_year(prepared), legacy_vaccounts_year(prepared), legacy_salaries_year(professional),
+            legacy_vaccounts_year(professional), legacy_town_salaries(prepared), legacy_town_vacancies(prepared))
+
+
+def generate_frame(rows: int, seed=0) -> pd.DataFrame:
+    """Синтетический подготовленный фрейм: 20 лет, 60 городов с неравномерными долями, 8 названий вакансий."""
+    rnd = np.random.default_rng(seed)
+    names = np.array(['Программист', 'Python-программист', 'Менеджер', 'Аналитик', 'Бухгалтер', 'Водитель',
+                      'Продавец', 'Инженер'], dtype=object)
+    towns = np.array([f'Город {i}' for i in range(60)], dtype=object)
+    town_weights = 1 / np.arange(1, len(towns) + 1)
+    return pd.DataFrame({
+        'name': names[rnd.integers(0, len(names), rows)],
+        'Salary': rnd.integers(10, 300, rows) * 1000.0 + rnd.integers(0, 2, rows) * 500.0,
+        'area_name': towns[rnd.choice(len(towns), rows, p=town_weights / town_weights.sum())],
+        'published_at': rnd.integers(2003, 2023, rows)})
+
+
+def measure(function, *args) -> tuple:
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000_000, 10_000_000]
+    for rows in sizes:
+        prepared = generate_frame(rows)
+        legacy_time, expected = measure(legacy_statistics, prepared, 'программист')
+        grouped_time, result = measure(cooler_statistics_creator.getAllStatistics, prepared, 'программист')
+        assert result == expected, 'результаты расходятся'
+        print(f'{rows:>11,} строк: прежние функции {legacy_time:7.2f} с, getAllStatistics {grouped_time:6.2f} с, '
+              f'ускорение {legacy_time / grouped_time:5.1f}x')
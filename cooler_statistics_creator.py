@@ -1,22 +1,115 @@
+import hashlib
 import pandas as pd
 import numpy as np
+from pandas.api.types import union_categoricals
 import currencty_convertator
 import report
-
-
-def prepare_data(vac_file_path: str, currencies_file_path = '', noconvert = True, region_name = ''):
-
-    vacancies = pd.read_csv(vac_file_path, delimiter=',')
-    work_frame = None
-    if not noconvert:
-        currencies = pd.read_csv(currencies_file_path, delimiter=',').set_index('Date').transpose().to_dict(orient='dict')
-        work_frame = vacancies[['name', 'salary_from', 'salary_to', 'salary_currency', 'area_name', 'published_at']]
-        work_frame = currencty_convertator.addSalaryInFrame(work_frame, currencies)
-        work_frame = work_frame[work_frame['Salary'].notnull()]
-    work_frame = vacancies[vacancies['Salary'].notnull()]
-    if region_name == '':
-        return work_frame
-    return work_frame[work_frame['area_name'] == region_name]
+import vacancy_cache
+from profession_matcher import ProfessionMatcher
+
+
+# Столбцы, которые нужны для статистики, и их типы: города и валюты повторяются, поэтому хранятся категориями
+_prepared_columns = ['name', 'Salary', 'salary_currency', 'area_name', 'published_at']
+_prepared_dtypes = {'name': object, 'Salary': np.float64, 'salary_currency': 'category', 'area_name': 'category',
+                    'published_at': object}
+# Для перевода в рубли вместо Salary нужны границы вилки
+_convert_columns = ['name', 'salary_from', 'salary_to', 'salary_currency', 'area_name', 'published_at']
+_convert_dtypes = {'name': object, 'salary_from': np.float64, 'salary_to': np.float64,
+                   'salary_currency': 'category', 'area_name': 'category', 'published_at': object}
+
+
+def prepareChunk(chunk: pd.DataFrame, region_name=''):
+    """
+    Отбрасывает вакансии без зарплаты и из других регионов, оставляя от даты публикации только год
+
+    :param chunk: часть DataFrame с вакансиями
+    :param region_name: название региона, '' - все регионы
+    :return: отфильтрованная часть с годом типа int16 в published_at
+    """
+    chunk = chunk[chunk['Salary'].notnull()]
+    if region_name != '':
+        chunk = chunk[chunk['area_name'] == region_name]
+    for column in ('area_name', 'salary_currency'):
+        if column in chunk:
+            # После фильтра в словаре остаются только встретившиеся значения, как и при чтении из кэша
+            chunk = chunk.assign(**{column: chunk[column].astype('category').cat.remove_unused_categories()})
+    return chunk.assign(published_at=chunk['published_at'].str[0:4].astype(np.int16))
+
+
+def concatChunks(chunks: list) -> pd.DataFrame:
+    """
+    Склеивает отфильтрованные части, объединяя словари категорий вместо перевода столбцов в object
+
+    :param chunks: список частей от prepareChunk
+    :return: общий DataFrame
+    """
+    frame = pd.concat(chunks, ignore_index=True)
+    for column in frame.columns:
+        if isinstance(chunks[0][column].dtype, pd.CategoricalDtype):
+            frame[column] = union_categoricals([chunk[column] for chunk in chunks], sort_categories=True)
+    return frame
+
+
+def read_prepared_vacancies(vac_file_path: str, region_name='', chunksize=200_000,
+                            currencies: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Читает CSV файл вакансий частями по chunksize строк, сразу отбрасывая лишние столбцы и строки, так что
+    пиковая память зависит от размера части, а не файла
+
+    :param vac_file_path: имя CSV файла
+    :param region_name: название региона, '' - все регионы
+    :param chunksize: число строк в одной части
+    :param currencies: широкая таблица курсов (Date и по столбцу на валюту); если задана, Salary считается
+     из salary_from, salary_to и salary_currency каждой части через fasterSalaryFromPositions
+    :return: DataFrame со столбцами name, Salary, area_name, published_at (год) и salary_currency, если он есть
+    """
+    columns, dtypes = (_prepared_columns, _prepared_dtypes) if currencies is None else \
+        (_convert_columns, _convert_dtypes)
+    reader = pd.read_csv(vac_file_path, delimiter=',', usecols=lambda column: column in columns,
+                         dtype=dtypes, chunksize=chunksize)
+    if currencies is not None:
+        currs = [column for column in currencies.columns if column != 'Date']
+        reader_chunks = (currencty_convertator.fasterSalaryFromPositions(chunk, currs, currencies)
+                         for chunk in reader)
+    else:
+        reader_chunks = reader
+    with reader:
+        chunks = [prepareChunk(chunk, region_name) for chunk in reader_chunks]
+    if not chunks:
+        return pd.DataFrame({column: pd.Series(dtype=np.int16 if column == 'published_at' else object)
+                             for column in ['name', 'Salary', 'area_name', 'published_at']})
+    return concatChunks(chunks)
+
+
+def prepare_data(vac_file_path: str, currencies_file_path = '', noconvert = True, region_name = '', cache = None,
+                 chunksize = 200_000):
+    """
+    Подготавливает вакансии для статистики потоковым read_prepared_vacancies. С кэшем подготовленные колонки
+    сохраняются отдельно для региона и таблицы курсов, и повторный запуск не читает CSV
+
+    :param vac_file_path: имя CSV файла
+    :param currencies_file_path: CSV файл курсов по месяцам, нужен при noconvert=False
+    :param noconvert: в файле уже есть Salary в рублях
+    :param region_name: название региона, '' - все регионы
+    :param cache: дисковый кэш разобранных файлов
+    :param chunksize: число строк в одной части
+    :return: DataFrame с годом в published_at и категориями area_name и salary_currency
+    """
+    currencies = None if noconvert else pd.read_csv(currencies_file_path, delimiter=',')
+    if cache is None:
+        return read_prepared_vacancies(vac_file_path, region_name, chunksize, currencies)
+    kind = f'cooler_statistics_creator-prepared-{region_name}'
+    if currencies is not None:
+        kind += '-' + hashlib.blake2b(pd.util.hash_pandas_object(currencies).to_numpy().tobytes(),
+                                      digest_size=8).hexdigest()
+    columns = cache.load(vac_file_path, kind)
+    if columns is not None:
+        prepared = vacancy_cache.columns_to_frame(columns)
+        return prepared.astype({column: _prepared_dtypes[column] for column in prepared
+                                if column not in ('Salary', 'published_at')})
+    prepared = read_prepared_vacancies(vac_file_path, region_name, chunksize, currencies)
+    cache.store(vac_file_path, kind, vacancy_cache.frame_to_columns(prepared))
+    return prepared
 
 
 # if __name__ == '__main__':
@@ -25,83 +118,132 @@ def prepare_data(vac_file_path: str, currencies_file_path = '', noconvert = True
 
 # Фрейм для вообще всех вакансий из CSVшки(с зарпалатами
 
+def groupSalaries(frame: pd.DataFrame, by) -> pd.DataFrame:
+    """
+    Группирует вакансии за один проход, считая сумму и число зарплат в каждой группе
+
+    :param frame: DataFrame с вакансиями
+    :param by: столбец или список столбцов группировки
+    :return: DataFrame со столбцами sum, count и mean
+    """
+    groups = frame.groupby(by, sort=True, observed=True)['Salary'].agg(['sum', 'count'])
+    groups['mean'] = groups['sum'] / groups['count']
+    return groups
+
+
+def salariesFromGroups(groups: pd.DataFrame) -> dict:
+    # Средние зарплаты по группам, округлённые до целого
+    return {key: round(mean) for key, mean in zip(groups.index, groups['mean'])}
+
+
+def vaccountsFromGroups(groups: pd.DataFrame) -> dict:
+    # Число вакансий по группам
+    return {key: int(count) for key, count in zip(groups.index, groups['count'])}
+
+
 def getSalariesYear(prepared: pd.DataFrame):
-    groups = prepared.groupby('published_at')
-    salaries = {}
-    for n, g in groups:
-        salaries.update({g['published_at'].max(): round(g['Salary'].mean())})
-    return salaries
+    return salariesFromGroups(groupSalaries(prepared, 'published_at'))
 
 
 def getVaccountsYear(prepared: pd.DataFrame):
-    vaccounts = prepared['published_at'].value_counts()
-    vaccounts = vaccounts.sort_index()
-    vacDynamics = vaccounts.to_dict()
-    return vacDynamics
+    return vaccountsFromGroups(groupSalaries(prepared, 'published_at'))
 
 
 def getProfessionalSalary(professional: pd.DataFrame):
     # Динамика уровня зарплат по годам для выбранной профессии
-    prof_groups = professional.groupby('published_at')
-    prof_salaries = {}
-    for n, g in prof_groups:
-        prof_salaries.update({g['published_at'].max(): round(g['Salary'].mean())})
-    return prof_salaries
+    return salariesFromGroups(groupSalaries(professional, 'published_at'))
 
 
 def getProfessionalVaccounts(professional: pd.DataFrame):
     # Динамика количества вакансий по годам для выбранной профессии
-    prof_vaccounts = professional['published_at'].value_counts()
-    prof_vaccounts = prof_vaccounts.sort_index()
-    prof_vaccounts_dict = prof_vaccounts.to_dict()
-    return prof_vaccounts_dict
+    return vaccountsFromGroups(groupSalaries(professional, 'published_at'))
+
+
+def getProfessionsStatistics(prepared: pd.DataFrame, professions: list) -> dict:
+    """
+    Строит отчёты сразу для списка профессий. Каждое уникальное название проверяется автоматом Ахо-Корасик
+    один раз, затем строки размножаются по найденным профессиям и группируются за один проход; общая
+    статистика по годам и городам считается один раз для всех отчётов
+
+    :param prepared: подготовленный DataFrame с годом в published_at
+    :param professions: названия профессий (ищутся без учёта регистра)
+    :return: словарь {профессия: report.Report}
+    """
+    matcher = ProfessionMatcher(professions, case_sensitive=False)
+    name_codes, names = pd.factorize(prepared['name'])
+    pairs = [(code, index) for code, name in enumerate(names) for index in matcher.match(str(name))]
+    pairs = pd.DataFrame(pairs, columns=['name_code', 'profession'], dtype=np.int64)
+    rows = pd.DataFrame({'name_code': name_codes, 'published_at': prepared['published_at'].to_numpy(),
+                         'Salary': prepared['Salary'].to_numpy()})
+    grouped = rows.merge(pairs, on='name_code').groupby(['profession', 'published_at'])['Salary'] \
+        .agg(['mean', 'count'])
+    statistics = {profession: ({}, {}) for profession in professions}
+    for (index, year), mean, count in zip(grouped.index, grouped['mean'], grouped['count']):
+        statistics[professions[index]][0][year] = round(mean)
+        statistics[professions[index]][1][year] = int(count)
+    years = groupSalaries(prepared, 'published_at')
+    salYear, vacYear = salariesFromGroups(years), vaccountsFromGroups(years)
+    townSal, townVac = townsFromGroups(groupSalaries(prepared, 'area_name'))
+    return {profession: report.Report(profession, salYear, vacYear, profSal, profVac, townSal, townVac)
+            for profession, (profSal, profVac) in statistics.items()}
+
+
+def townsFromGroups(groups: pd.DataFrame) -> tuple:
+    """
+    Считает статистику по городам из сгруппированных по area_name сумм и количеств
+
+    :param groups: результат groupSalaries(prepared, 'area_name')
+    :return: уровень зарплат (> 1% вакансий, топ-10) и доля вакансий (топ-10) по городам
+    """
+    # Порядок городов как у value_counts: по убыванию числа вакансий
+    groups = groups.sort_values('count', ascending=False, kind='stable')
+    precentages = groups['count'] / groups['count'].sum()
+    townsalaries = groups['mean'][precentages > 0.01].round()
+    townsalaries = townsalaries.sort_values(ascending=False)[0:10]
+    return townsalaries.to_dict(), precentages.sort_values(ascending=False)[0:10].to_dict()
 
 
 def getTownSalaries(prepared: pd.DataFrame):
     # Уровень зарплат по городам (в порядке убывания) для городов с числом вакансий > 1%)
-    town_counts = prepared['area_name'].value_counts()  # подсчёт всех городов
-    total = town_counts.sum()  # подсчёт всего числа городов
-    precentages_ = town_counts / total  # процентовка содержания городов
-    precentages_ = precentages_[precentages_ > 0.01]  # фильтруем по правилу '>1%'
-    townnames = precentages_.keys().tolist()  # Получаем города, у которых надо учитывать значения
-    townsalaries = precentages_.copy() * 0
-    for town in townnames:
-        meantown = prepared[prepared['area_name'] == town]['Salary'].mean()
-        townsalaries[town] = round(meantown)
-    townsalaries = townsalaries.sort_values(ascending=False)[0:10]
-    return townsalaries.to_dict()
+    return townsFromGroups(groupSalaries(prepared, 'area_name'))[0]
 
 
 def getTownVacancies(prepared: pd.DataFrame):
     # Доля вакансий по городам (в порядке убывания, топ-10)
-    town_counts = prepared['area_name'].value_counts()  # подсчёт всех городов
-    total = town_counts.sum()  # подсчёт всего числа городов
-    town_counts.head(10)
-    precentages = town_counts / total
-    precentages = precentages.sort_values(ascending=False)
-    return precentages[0:10].to_dict()
-
-
-filename = input("Введите название файла: ")
-profession = input("Введите название профессии: ")
-region = input("Введите название региона: ")
-
-#использовать если нет сформированного фрейма с зарплатой
-#prepared = prepare_data(filename, 'monthly_currency.csv', noconvert=False)
-
-prepared = prepare_data(filename, noconvert=True, region_name=region)
-
-prepared['published_at'] = prepared['published_at'].apply(lambda x: int(str(x[0:4])))
-professional = prepared[prepared['name'].str.contains(profession, case=False)].copy()
-
-salYear = getSalariesYear(prepared)
-vacYear = getVaccountsYear(prepared)
-profSal = getProfessionalSalary(professional)
-profVac = getProfessionalVaccounts(professional)
-townSal = getTownSalaries(prepared)
-townVac = getTownVacancies(prepared)
-print(salYear, vacYear, profSal, profVac, townSal, townVac, sep='\n')
-reportCard = report.Report(profession, salYear, vacYear, profSal, profVac, townSal, townVac)
-reportCard.generate_excel()
-reportCard.generate_image()
-reportCard.generate_pdf()
+    return townsFromGroups(groupSalaries(prepared, 'area_name'))[1]
+
+
+def getAllStatistics(prepared: pd.DataFrame, profession: str) -> tuple:
+    """
+    Считает все шесть словарей отчёта за два сгруппированных прохода: по (году, признаку профессии) и по городу
+
+    :param prepared: подготовленный DataFrame с годом в published_at
+    :param profession: название профессии (ищется без учёта регистра)
+    :return: salYear, vacYear, profSal, profVac, townSal, townVac
+    """
+    is_profession = prepared['name'].str.contains(profession, case=False).fillna(False).astype(bool)
+    years = groupSalaries(prepared, ['published_at', is_profession.rename('is_profession')])
+    total = years.groupby(level='published_at')[['sum', 'count']].sum()
+    total['mean'] = total['sum'] / total['count']
+    professional = years[years.index.get_level_values('is_profession')].droplevel('is_profession')
+    townSal, townVac = townsFromGroups(groupSalaries(prepared, 'area_name'))
+    return (salariesFromGroups(total), vaccountsFromGroups(total), salariesFromGroups(professional),
+            vaccountsFromGroups(professional), townSal, townVac)
+
+
+if __name__ == '__main__':
+    filename = input("Введите название файла: ")
+    profession = input("Введите название профессии: ")
+    region = input("Введите название региона: ")
+
+    #использовать если нет сформированного фрейма с зарплатой
+    #prepared = prepare_data(filename, 'monthly_currencies.csv', noconvert=False, cache=vacancy_cache.VacancyCache())
+
+    prepared = prepare_data(filename, noconvert=True, region_name=region, cache=vacancy_cache.VacancyCache())
+
+    salYear, vacYear, profSal, profVac, townSal, townVac = getAllStatistics(prepared, profession)
+    print(salYear, vacYear, profSal, profVac, townSal, townVac, sep='\n')
+    reportCard = report.Report(profession, salYear, vacYear, profSal, profVac, townSal, townVac)
+    reportCard.generate_excel()
+    reportCard.generate_image()
+    reportCard.generate_pdf()
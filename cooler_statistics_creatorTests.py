@@ -0,0 +1,121 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import cooler_statistics_creator
+import report
+import vacancy_cache
+
+
+def make_vacancies(count: int, seed=0) -> pd.DataFrame:
+    """Вакансии в формате подготовленного CSV, у каждой пятой нет зарплаты."""
+    rnd = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'name': rnd.choice(['Программист', 'программист Python', 'Аналитик', 'Бухгалтер', 'Водитель'], count),
+        'salary_from': rnd.integers(10, 100, count) * 1000.0,
+        'salary_to': np.where(rnd.random(count) < 0.3, np.nan, rnd.integers(100, 200, count) * 1000.0),
+        'Salary': np.where(rnd.random(count) < 0.2, np.nan, rnd.integers(10, 300, count) * 1000.0),
+        'salary_currency': rnd.choice(['RUR', 'USD', 'KZT'], count),
+        'area_name': rnd.choice(['Москва', 'Казань', 'Омск', 'Алматы', 'Пермь'], count),
+        'published_at': [f'{year}-{month:02d}-01T10:00:00+0300' for year, month in
+                         zip(rnd.integers(2003, 2006, count), rnd.integers(1, 13, count))]})
+
+
+class PreparedVacanciesTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.file_name = os.path.join(cls.directory.name, 'vacancies.csv')
+        cls.vacancies = make_vacancies(5000)
+        cls.vacancies.to_csv(cls.file_name, index=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def legacy_frame(self, region_name='') -> pd.DataFrame:
+        """Подготовка так, как её делал prepare_data до чтения частями: весь файл и фильтр."""
+        frame = pd.read_csv(self.file_name)
+        frame = frame[frame['Salary'].notnull()]
+        if region_name != '':
+            frame = frame[frame['area_name'] == region_name]
+        frame = frame.assign(published_at=frame['published_at'].str[0:4].astype(int))
+        return frame[['name', 'Salary', 'salary_currency', 'area_name', 'published_at']].reset_index(drop=True)
+
+    def assert_same_as_legacy(self, prepared: pd.DataFrame, region_name=''):
+        expected = self.legacy_frame(region_name)
+        self.assertEqual(sorted(prepared.columns), sorted(expected.columns))
+        pd.testing.assert_frame_equal(prepared[expected.columns].astype(object), expected.astype(object))
+
+    def test_prepare_chunk(self):
+        chunk = cooler_statistics_creator.prepareChunk(self.vacancies[0:100], 'Москва')
+        self.assertTrue(chunk['Salary'].notnull().all())
+        self.assertEqual(set(chunk['area_name']), {'Москва'})
+        self.assertIsInstance(chunk['area_name'].dtype, pd.CategoricalDtype)
+        self.assertEqual(chunk['published_at'].dtype, np.int16)
+
+    def test_concat_chunks_unions_categories(self):
+        first = cooler_statistics_creator.prepareChunk(self.vacancies[self.vacancies['area_name'] == 'Омск'])
+        second = cooler_statistics_creator.prepareChunk(self.vacancies[self.vacancies['area_name'] == 'Казань'])
+        frame = cooler_statistics_creator.concatChunks([first, second])
+        self.assertIsInstance(frame['area_name'].dtype, pd.CategoricalDtype)
+        self.assertEqual(list(frame['area_name'].cat.categories), ['Казань', 'Омск'])
+        self.assertEqual(frame['area_name'].tolist(), first['area_name'].tolist() + second['area_name'].tolist())
+
+    def test_read_prepared_equals_legacy(self):
+        self.assert_same_as_legacy(cooler_statistics_creator.read_prepared_vacancies(self.file_name,
+                                                                                     chunksize=700))
+        self.assert_same_as_legacy(cooler_statistics_creator.read_prepared_vacancies(self.file_name, 'Омск',
+                                                                                     chunksize=700), 'Омск')
+
+    def test_prepare_data_fills_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = vacancy_cache.VacancyCache(cache_dir)
+            first = cooler_statistics_creator.prepare_data(self.file_name, region_name='Омск', cache=cache,
+                                                           chunksize=700)
+            second = cooler_statistics_creator.prepare_data(self.file_name, region_name='Омск', cache=cache)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+        pd.testing.assert_frame_equal(first, second)
+        self.assert_same_as_legacy(second, 'Омск')
+
+    def test_prepare_data_converts_in_chunks(self):
+        currencies_file = os.path.join(self.directory.name, 'monthly_currencies.csv')
+        months = [f'{year}-{month:02d}' for year in range(2003, 2006) for month in range(1, 13)]
+        pd.DataFrame({'Date': months, 'USD': np.linspace(30, 40, len(months)),
+                      'KZT': np.linspace(0.2, 0.3, len(months))}).to_csv(currencies_file, index=False)
+        prepared = cooler_statistics_creator.prepare_data(self.file_name, currencies_file, noconvert=False,
+                                                          chunksize=700)
+        self.assertEqual(len(prepared), len(self.vacancies))
+        rur = (self.vacancies['salary_currency'] == 'RUR').to_numpy()
+        salary = self.vacancies['salary_from'].where(self.vacancies['salary_to'].isna(),
+                                                     (self.vacancies['salary_from'] + self.vacancies['salary_to']) / 2)
+        np.testing.assert_allclose(prepared['Salary'].to_numpy()[rur], salary.to_numpy()[rur])
+        self.assertEqual(prepared['published_at'].tolist(),
+                         self.vacancies['published_at'].str[0:4].astype(int).tolist())
+
+
+class ProfessionsStatisticsTest(unittest.TestCase):
+
+    def test_same_as_single_profession(self):
+        prepared = cooler_statistics_creator.prepareChunk(make_vacancies(50_000, seed=7))
+        professions = ['Программист', 'python', 'АНАЛИТИК', 'Водитель', 'Повар']
+        reports = cooler_statistics_creator.getProfessionsStatistics(prepared, professions)
+        self.assertEqual(list(reports), professions)
+        for profession in professions:
+            card = reports[profession]
+            self.assertIsInstance(card, report.Report)
+            self.assertEqual(card.get_profession(), profession)
+            statistics = (card.get_salary_dynamic_by_year(), card.get_vacancy_dynamic_by_year(),
+                          card.get_salary_dynamic_profession(), card.get_vacancy_dynamic_profession(),
+                          card.get_salary_town(), card.get_vacancy_town())
+            expected = cooler_statistics_creator.getAllStatistics(prepared, profession)
+            self.assertEqual(statistics, expected, profession)
+            self.assertEqual([list(part) for part in statistics], [list(part) for part in expected])
+        self.assertEqual(reports['Повар'].get_salary_dynamic_profession(), {})
+        self.assertEqual(sum(reports['Программист'].get_vacancy_dynamic_profession().values()),
+                         prepared['name'].str.contains('программист', case=False).sum())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,32 +2,38 @@ import pandas as pd
 import numpy as np
 from sqlalchemy import create_engine
 
-def fasterSalaryFromPositions(df: pd.DataFrame, currs):
-    df['published_at'] = df['published_at'].str[0:7]
-    eng = create_engine('sqlite:///Vacancies.db', echo=False)
-    currencies = pd.read_sql('select * from currencies', eng)
-    currencies = currencies.rename(columns={'Date':'published_at'})
-
-    print(currencies.head(5))
-
-    
-    #Определяем, что у нас nullValues на зарплатах от и до
-    
-    null_sal_to = df['salary_to'].isnull()
-    null_sal_from = df['salary_from'].isnull()
-    corr_sals = ~(df['salary_from'].isnull() | df['salary_to'].isnull())
-
-    df.loc[null_sal_to, 'Salary'] = df.loc[null_sal_to, 'salary_from']
-    df.loc[null_sal_from, 'Salary'] = df.loc[null_sal_from, 'salary_to']
-    df.loc[corr_sals, 'Salary'] = (df.loc[corr_sals, 'salary_from'] + df.loc[corr_sals, 'salary_to']) / 2 
-    df = pd.merge(df, currencies, how='inner',on='published_at')
-    print(df.head(5))
-    bread = df.to_dict(orient='records')
-    for i in bread:
-        if i['salary_currency'] in currs:
-            i['Salary'] = i['Salary'] * i[i['salary_currency']]
-    ech = pd.DataFrame.from_records(bread)
-    ech = ech[['name','Salary','area_name','published_at']]
+def fasterSalaryFromPositions(df: pd.DataFrame, currs, currencies: pd.DataFrame = None):
+    """
+    Переводит зарплаты вакансий в рубли по курсу месяца публикации
+
+    :param df: фрейм вакансий со столбцами name, salary_from, salary_to, salary_currency, area_name, published_at
+    :param currs: валюты, которые нужно переводить; остальные (RUR и неизвестные) остаются как есть
+    :param currencies: широкая таблица курсов (Date и по столбцу на валюту), по умолчанию из Vacancies.db
+    :return: фрейм name, Salary, area_name, published_at (YYYY-MM) только по месяцам, для которых есть курсы
+    """
+    df = df.assign(published_at=df['published_at'].str[0:7])
+    if currencies is None:
+        eng = create_engine('sqlite:///Vacancies.db', echo=False)
+        currencies = pd.read_sql('select * from currencies', eng)
+    currencies = currencies.rename(columns={'Date': 'published_at'}).drop_duplicates('published_at')
+
+    #Зарплата - середина вилки, либо заданная граница, если другой нет
+    salary_from = df['salary_from'].to_numpy(dtype=np.float64)
+    salary_to = df['salary_to'].to_numpy(dtype=np.float64)
+    salary = np.where(np.isnan(salary_to), salary_from, np.where(np.isnan(salary_from), salary_to,
+                                                                 (salary_from + salary_to) / 2))
+
+    #Курс вакансии берётся из матрицы [месяц, валюта] по номерам месяца и валюты, без цикла по строкам.
+    #Вакансии за месяцы без курсов отбрасываются, как при inner join с таблицей курсов
+    month_index = pd.Index(currencies['published_at']).get_indexer(df['published_at'])
+    currs = [curr for curr in currs if curr in currencies.columns]
+    curr_index = pd.Index(currs, dtype=object).get_indexer(df['salary_currency'].astype(object))
+    rates = currencies[currs].to_numpy(dtype=np.float64)
+    known = (month_index >= 0) & (curr_index >= 0)
+    salary[known] *= rates[month_index[known], curr_index[known]]
+
+    ech = df.assign(Salary=salary)[month_index >= 0]
+    ech = ech[['name', 'Salary', 'area_name', 'published_at']].reset_index(drop=True)
     return ech
 
 
@@ -0,0 +1,52 @@
+import unittest
+import numpy as np
+import pandas as pd
+import currencty_convertator
+
+
+def legacy_salary_from_positions(df: pd.DataFrame, currs, currencies: pd.DataFrame) -> pd.DataFrame:
+    """Перевод так, как его делал fasterSalaryFromPositions до векторизации: merge и цикл по записям."""
+    df = df.copy()
+    df['published_at'] = df['published_at'].str[0:7]
+    currencies = currencies.rename(columns={'Date': 'published_at'})
+    null_sal_to = df['salary_to'].isnull()
+    null_sal_from = df['salary_from'].isnull()
+    corr_sals = ~(df['salary_from'].isnull() | df['salary_to'].isnull())
+    df.loc[null_sal_to, 'Salary'] = df.loc[null_sal_to, 'salary_from']
+    df.loc[null_sal_from, 'Salary'] = df.loc[null_sal_from, 'salary_to']
+    df.loc[corr_sals, 'Salary'] = (df.loc[corr_sals, 'salary_from'] + df.loc[corr_sals, 'salary_to']) / 2
+    df = pd.merge(df, currencies, how='inner', on='published_at')
+    bread = df.to_dict(orient='records')
+    for i in bread:
+        if i['salary_currency'] in currs:
+            i['Salary'] = i['Salary'] * i[i['salary_currency']]
+    ech = pd.DataFrame.from_records(bread)
+    return ech[['name', 'Salary', 'area_name', 'published_at']]
+
+
+class FasterSalaryFromPositionsTest(unittest.TestCase):
+    currencies = pd.DataFrame({'Date': ['2003-01', '2003-02', '2003-03'], 'USD': [30.0, 31.0, 32.0],
+                               'EUR': [33.0, np.nan, 35.0]})
+
+    def test_same_as_records_loop(self):
+        vacancies = pd.DataFrame({
+            'name': [f'Вакансия {number}' for number in range(8)],
+            'salary_from': [100.0, np.nan, 100.0, 10.0, 100.0, 100.0, np.nan, 50.0],
+            'salary_to': [300.0, 200.0, np.nan, 20.0, 200.0, 200.0, 70.0, np.nan],
+            'salary_currency': ['USD', 'EUR', 'RUR', 'GEL', 'EUR', 'USD', 'RUR', 'EUR'],
+            'area_name': ['Москва'] * 8,
+            'published_at': ['2003-01-05T10:00:00+0300', '2003-01-06T10:00:00+0300', '2003-02-01T10:00:00+0300',
+                             '2003-02-01T10:00:00+0300', '2003-02-01T10:00:00+0300', '2004-01-01T10:00:00+0300',
+                             '2003-03-01T10:00:00+0300', '2003-03-01T10:00:00+0300']})
+        original = vacancies.copy()
+        result = currencty_convertator.fasterSalaryFromPositions(vacancies, ['USD', 'EUR'], self.currencies)
+        expected = legacy_salary_from_positions(vacancies, ['USD', 'EUR'], self.currencies)
+        # Старый merge группировал строки по месяцам, новая версия сохраняет порядок файла
+        expected = expected.sort_values('name').reset_index(drop=True)
+        pd.testing.assert_frame_equal(result.astype(object), expected.astype(object))
+        self.assertEqual(result['Salary'].fillna(-1).tolist(), [6000.0, 6600.0, 100.0, 15.0, -1, 70.0, 1750.0])
+        pd.testing.assert_frame_equal(vacancies, original)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+"""
+Модуль с плотной таблицей курсов ЦБ по месяцам для перевода зарплат в рубли по дате публикации вакансии.
+"""
+import hashlib
+import math
+import sqlite3
+import numpy as np
+import pandas as pd
+
+
+class RateIndex:
+    """Курсы валют в массиве numpy [номер месяца от first_month, код валюты].
+
+    Attributes:
+        first_month (int): Первый месяц таблицы в виде год * 12 + (месяц - 1).
+        codes (list): Коды валют, столбцы таблицы. RUR всегда есть и равен 1.
+        rates (numpy.ndarray): Курсы за единицу валюты, NaN - курса за месяц нет.
+    """
+
+    def __init__(self, first_month: int, codes: list, rates: np.ndarray):
+        """
+        Parameters:
+            first_month (int): Первый месяц таблицы в виде год * 12 + (месяц - 1).
+            codes (list): Коды валют в порядке столбцов rates.
+            rates (numpy.ndarray): Двумерный массив курсов.
+        """
+        rates = np.asarray(rates, dtype=np.float64)
+        if 'RUR' not in codes:
+            codes = list(codes) + ['RUR']
+            rates = np.hstack([rates, np.ones((rates.shape[0], 1))])
+        self.first_month = first_month
+        self.codes = list(codes)
+        self.rates = rates
+        self._code_index = {code: index for index, code in enumerate(self.codes)}
+
+    def __reduce__(self):
+        # В дочерний процесс уходят только номер месяца, список кодов и байты массива
+        return RateIndex, (self.first_month, self.codes, self.rates)
+
+    @staticmethod
+    def month_number(date: str) -> int:
+        """
+        Переводит дату вида YYYY-MM... в номер месяца год * 12 + (месяц - 1)
+
+        :param date: дата или месяц публикации
+        :return: номер месяца
+        """
+        return int(date[0:4]) * 12 + int(date[5:7]) - 1
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame):
+        """
+        Создает индекс из широкой таблицы курсов: столбец Date (YYYY-MM) и по столбцу на валюту
+
+        :param frame: таблица курсов
+        :return: RateIndex
+        """
+        months = np.array([cls.month_number(date) for date in frame['Date']], dtype=np.int64)
+        codes = [column for column in frame.columns if column != 'Date']
+        if len(months) == 0:
+            return cls(0, codes, np.empty((0, len(codes))))
+        rates = np.full((months.max() - months.min() + 1, len(codes)), np.nan)
+        rates[months - months.min()] = frame[codes].to_numpy(dtype=np.float64)
+        return cls(int(months.min()), codes, rates)
+
+    @classmethod
+    def from_csv(cls, file_name='monthly_currencies.csv'):
+        """
+        Создает индекс из CSV файла, который строит cbr_api_requests.get_monthly_currencies
+
+        :param file_name: имя CSV файла
+        :return: RateIndex
+        """
+        return cls.from_frame(pd.read_csv(file_name))
+
+    @classmethod
+    def from_database(cls, db_file='Vacancies.db', table='currencies'):
+        """
+        Создает индекс из таблицы курсов SQLite базы
+
+        :param db_file: имя файла базы
+        :param table: имя широкой таблицы курсов
+        :return: RateIndex
+        """
+        with sqlite3.connect(db_file) as connection:
+            return cls.from_frame(pd.read_sql(f'SELECT * FROM "{table}"', connection))
+
+    def digest(self) -> str:
+        """
+        :return: короткий отпечаток курсов, меняется вместе с ними
+        """
+        hasher = hashlib.blake2b(digest_size=8)
+        hasher.update(repr((self.first_month, self.codes)).encode('utf-8'))
+        hasher.update(np.ascontiguousarray(self.rates).tobytes())
+        return hasher.hexdigest()
+
+    def rate(self, currency: str, date: str) -> float:
+        """
+        Возвращает курс валюты в месяц публикации
+
+        :param currency: код валюты
+        :param date: дата публикации вида YYYY-MM...
+        :return: курс за единицу валюты или NaN, если валюты или месяца нет в таблице
+        """
+        code = self._code_index.get(currency)
+        if code is None:
+            return math.nan
+        if currency == 'RUR':
+            return 1.0
+        month = self.month_number(date) - self.first_month
+        if month < 0 or month >= len(self.rates):
+            return math.nan
+        return float(self.rates[month, code])
+
+    def code_numbers(self, currencies) -> np.ndarray:
+        """
+        Переводит коды валют в номера столбцов таблицы
+
+        :param currencies: коды валют
+        :return: массив номеров столбцов, -1 - валюты нет в таблице
+        """
+        return np.fromiter((self._code_index.get(currency, -1) for currency in currencies), dtype=np.int64,
+                           count=len(currencies))
+
+    def rates_for_months(self, codes: np.ndarray, months: np.ndarray) -> np.ndarray:
+        """
+        Возвращает курсы по номерам столбцов и номерам месяцев одной выборкой из массива, без разбора строк
+
+        :param codes: номера столбцов из code_numbers
+        :param months: номера месяцев вида год * 12 + (месяц - 1)
+        :return: массив курсов, NaN - валюты или месяца нет в таблице
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        months = np.asarray(months, dtype=np.int64) - self.first_month
+        found = (codes >= 0) & (months >= 0) & (months < len(self.rates))
+        result = np.full(len(codes), np.nan)
+        result[found] = self.rates[months[found], codes[found]]
+        result[codes == self._code_index['RUR']] = 1.0
+        return result
+
+    def rates_for(self, currencies, dates) -> np.ndarray:
+        """
+        Возвращает курсы сразу для набора вакансий
+
+        :param currencies: коды валют
+        :param dates: даты публикации вида YYYY-MM...
+        :return: массив курсов, NaN - валюты или месяца нет в таблице
+        """
+        months = np.fromiter((self.month_number(date) for date in dates), dtype=np.int64)
+        return self.rates_for_months(self.code_numbers(list(currencies)), months)
@@ -0,0 +1,91 @@
+import math
+import os
+import pickle
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import statistics_creator
+import table_creator
+from currency_rate_index import RateIndex
+
+
+class RateIndexTest(unittest.TestCase):
+    frame = pd.DataFrame({'Date': ['2003-01', '2003-02', '2003-04'], 'USD': [31.0, 32.0, 34.0],
+                          'EUR': [33.0, np.nan, 35.0]})
+
+    def test_single_lookup(self):
+        index = RateIndex.from_frame(self.frame)
+        self.assertEqual(index.rate('USD', '2003-02-10T10:00:00+0300'), 32.0)
+        self.assertEqual(index.rate('RUR', '1999-01-01'), 1.0)
+        self.assertTrue(math.isnan(index.rate('EUR', '2003-02-10')))
+        self.assertTrue(math.isnan(index.rate('USD', '2003-03-01')))
+        self.assertTrue(math.isnan(index.rate('USD', '2004-01-01')))
+        self.assertTrue(math.isnan(index.rate('GEL', '2003-01-01')))
+
+    def test_batch_lookup(self):
+        index = RateIndex.from_frame(self.frame)
+        rates = index.rates_for(['USD', 'EUR', 'RUR', 'GEL', 'USD'],
+                                ['2003-04-01', '2003-01-01', '2003-01-01', '2003-01-01', '2002-12-31'])
+        np.testing.assert_array_equal(rates, [34.0, 33.0, 1.0, np.nan, np.nan])
+
+    def test_pickle(self):
+        index = RateIndex.from_frame(self.frame)
+        restored = pickle.loads(pickle.dumps(index))
+        self.assertEqual(restored.rate('USD', '2003-04-01'), 34.0)
+        self.assertEqual(restored.digest(), index.digest())
+
+    def test_database_and_csv(self):
+        index = RateIndex.from_database('Vacancies.db')
+        self.assertAlmostEqual(index.rate('USD', '2003-01-15'), 31.8327)
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, 'monthly_currencies.csv')
+            self.frame.to_csv(file_name, index=False)
+            self.assertEqual(RateIndex.from_csv(file_name).rate('EUR', '2003-04-01'), 35.0)
+
+    def test_statistics_by_month(self):
+        index = RateIndex.from_frame(self.frame)
+        vacancy = statistics_creator.Vacancy({'name': 'Программист', 'salary_from': '100', 'salary_to': '300',
+                                              'salary_currency': 'USD', 'area_name': 'Москва',
+                                              'published_at': '2003-02-10T10:00:00+0300'}, index)
+        self.assertEqual(vacancy.salary_middle_in_rub, 200 * 32.0)
+        vacancy = statistics_creator.Vacancy({'name': 'Программист', 'salary_from': '100', 'salary_to': '300',
+                                              'salary_currency': 'EUR', 'area_name': 'Москва',
+                                              'published_at': '2003-02-10T10:00:00+0300'}, index)
+        self.assertEqual(vacancy.salary_middle_in_rub, 200 * statistics_creator.DataSet.currency_to_rub['EUR'])
+
+
+    def test_columnar_dataset_by_month(self):
+        index = RateIndex.from_frame(self.frame)
+        rows = [['Программист', '100', '300', 'USD', 'Москва', '2003-02-10T10:00:00+0300'],
+                ['Программист', '100', '300', 'EUR', 'Москва', '2003-02-10T10:00:00+0300'],
+                ['Аналитик', '100', '300', 'EUR', 'Казань', '2003-04-10T10:00:00+0300'],
+                ['Аналитик', '1000', '3000', 'RUR', 'Казань', '2003-04-10T10:00:00+0300'],
+                ['Аналитик', '100', '300', 'KZT', 'Омск', '2003-01-10T10:00:00+0300']]
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, 'vacancies.csv')
+            pd.DataFrame(rows, columns=['name', 'salary_from', 'salary_to', 'salary_currency', 'area_name',
+                                        'published_at']).to_csv(file_name, index=False)
+            parser = statistics_creator.CSVParser(file_name, 'Программист', index)
+            dataset = parser.create_columnar_dataset()
+            streamed = [vacancy.salary_middle_in_rub for vacancy in parser.stream_vacancies(file_name, index)]
+        self.assertEqual(list(dataset.salaries), streamed)
+        self.assertEqual(streamed[0:4], [200 * 32.0, 200 * statistics_creator.DataSet.currency_to_rub['EUR'],
+                                         200 * 35.0, 2000.0])
+
+    def test_table_sort_by_month(self):
+        def vacancy(currency: str, date: str) -> table_creator.Vacancy:
+            return table_creator.Vacancy({'name': currency, 'description': '', 'key_skills': '', 'experience_id': '',
+                                          'premium': '', 'employer_name': '', 'salary_from': '100',
+                                          'salary_to': '300', 'salary_gross': 'true', 'salary_currency': currency,
+                                          'area_name': 'Москва', 'published_at': date})
+        vacancies = [vacancy('USD', '2003-01-10T10:00:00+0300'), vacancy('EUR', '2003-04-10T10:00:00+0300'),
+                     vacancy('RUR', '2003-04-10T10:00:00+0300'), vacancy('USD', '2003-04-10T10:00:00+0300')]
+        parser = table_creator.CSVParser(rate_index=RateIndex.from_frame(self.frame))
+        self.assertEqual([item.name for item in parser.sort_by_salary(vacancies, '', True)],
+                         ['EUR', 'USD', 'USD', 'RUR'])
+        self.assertEqual([item.published_at[0:7] for item in vacancies[1:3]], ['2003-04', '2003-01'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,23 @@
+import bisect
+import json
+import os
+import threading
+from array import array
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+import numpy as np
 import requests
 import pandas as pd
+from requests.adapters import HTTPAdapter
+
+_hh_url = 'https://api.hh.ru/vacancies'
+_retry_statuses = {429, 500, 502, 503, 504}
+# API отдаёт не больше 2000 вакансий на один поиск, как бы ни были заданы страницы
+_depth_limit = 2000
+_per_page = 100
+_window_format = '%Y-%m-%dT%H:%M:%S'
 
 
 def request_vacancies(request=''):
@@ -14,21 +32,47 @@ def request_vacancies(request=''):
         conn = requests.get("https://api.hh.ru/vacancies?specialization=1&date_from=2022-12-28&date_to=2022-12-28")
     else:
         conn = requests.get(request)
+    return vacancies_from_json(conn.json())
+
+
+def vacancies_from_json(data: dict):
+    """
+    Функция, превращающая ответ api.hh.ru в DataFrame
 
-    vacancies_dict = pd.DataFrame.from_dict(conn.json())
-    records_df = pd.DataFrame.from_records(vacancies_dict['items'])
-    try:
-        first_step = records_df[['name', 'salary', 'area', 'published_at']]
-    except KeyError:
+    :param data: разобранный JSON ответа
+    :return: Dataframe с форматированными вакансиями
+    """
+    if not data.get('items'):
         return pd.DataFrame()
-    first_step = pd.concat([first_step.drop(['salary'], axis=1), first_step['salary'].apply(pd.Series)], axis=1)
-    first_step = pd.concat([first_step.drop(['area'], axis=1), first_step['area'].apply(pd.Series)], axis=1)
-    first_step.columns.values[7] = "area_name"
-    experimental = first_step[['name', 'from', 'to', 'currency', 'area_name', 'published_at']]
-    experimental.columns.values[1] = 'salary_from'
-    experimental.columns.values[2] = 'salary_to'
-    experimental.columns.values[3] = 'salary_currency'
-    return experimental
+    return flatten_vacancies(data['items'])
+
+
+def flatten_vacancies(items: list, with_id=False):
+    """
+    Функция, за один проход раскладывающая вакансии из JSON по типизированным столбцам
+
+    :param items: список вакансий из поля items ответа API
+    :param with_id: добавить первым столбец id вакансии
+    :return: Dataframe со столбцами name, salary_from, salary_to, salary_currency, area_name, published_at;
+     у вакансий без зарплаты её поля пустые
+    """
+    count = len(items)
+    ids, names, salaries_from, salaries_to, currencies, area_names, published = ([None] * count for _ in range(7))
+    for i, item in enumerate(items):
+        salary = item.get('salary') or {}
+        area = item.get('area') or {}
+        ids[i] = item.get('id')
+        names[i] = item.get('name')
+        salaries_from[i] = salary.get('from')
+        salaries_to[i] = salary.get('to')
+        currencies[i] = salary.get('currency')
+        area_names[i] = area.get('name')
+        published[i] = item.get('published_at')
+    columns = {'id': ids} if with_id else {}
+    columns.update({'name': names, 'salary_from': np.array(salaries_from, dtype=np.float64),
+                    'salary_to': np.array(salaries_to, dtype=np.float64), 'salary_currency': currencies,
+                    'area_name': area_names, 'published_at': published})
+    return pd.DataFrame(columns)
 
 
 """
@@ -39,11 +83,12 @@ https://api.hh.ru/vacancies?specialization=1&date_from=2022-12-28&date_to=2022-1
 """
 
 
-def get_requests_for_day(date: str):
+def get_requests_for_day(date: str, base_url=_hh_url):
     """
     Функция, составляющая список запросов на день для последующего обращения на api.hh.ru
 
     :param date: Дата в формате YYYY-MM-DD
+    :param base_url: адрес метода /vacancies
     :return: Список запросов на день в промежутках между ['00:00','04:00','08:00','12:00','16:00','20:00','23:59']
     """
     # дата в формате YYYY-MM-DD
@@ -56,11 +101,48 @@ def get_requests_for_day(date: str):
         segment_request = []
         for i in range(1, 19):
             segment_request.append(
-                f'https://api.hh.ru/vacancies?specialization=1&date_from={date}T{segment[0]}&date_to={date}T{segment[1]}&per_page=100&page={i}')
+                f'{base_url}?specialization=1&date_from={date}T{segment[0]}&date_to={date}T{segment[1]}&per_page=100&page={i}')
         daily_requests.append(segment_request)
     return daily_requests
 
 
+def window_request(window: tuple, page: int, base_url=_hh_url, per_page=_per_page) -> str:
+    """
+    Функция, составляющая запрос одной страницы вакансий за промежуток времени
+
+    :param window: промежуток (date_from, date_to) в формате YYYY-MM-DDTHH:MM:SS, границы включаются
+    :param page: номер страницы, считая с нуля
+    :param base_url: адрес метода /vacancies
+    :param per_page: число вакансий на странице
+    :return: строка запроса к API
+    """
+    return f'{base_url}?specialization=1&date_from={window[0]}&date_to={window[1]}&per_page={per_page}&page={page}'
+
+
+def day_window(date: str) -> tuple:
+    """
+    :param date: Дата в формате YYYY-MM-DD
+    :return: промежуток, покрывающий весь день
+    """
+    return f'{date}T00:00:00', f'{date}T23:59:59'
+
+
+def split_window(window: tuple) -> list:
+    """
+    Функция, делящая промежуток времени пополам без пересечения границ
+
+    :param window: промежуток (date_from, date_to)
+    :return: список из двух промежутков или из исходного, если он короче двух секунд
+    """
+    start, end = (datetime.strptime(bound, _window_format) for bound in window)
+    if end - start < timedelta(seconds=1):
+        return [window]
+    middle = start + (end - start) // 2
+    middle = middle.replace(microsecond=0)
+    return [(window[0], middle.strftime(_window_format)),
+            ((middle + timedelta(seconds=1)).strftime(_window_format), window[1])]
+
+
 def get_stats_in_request_list(subrequests: list, queue=None):
     """
     Функция, которая должна была обращаться в многопроцессе к api.hh.ru
@@ -90,6 +172,431 @@ def get_stats_mono(request_list: list):
     return result
 
 
+class HostRateLimiter:
+    """
+    Ограничитель частоты запросов: к одному хосту уходит не больше requests_per_second запросов в секунду,
+    сколько бы потоков их ни отправляло
+
+    Attributes:
+        interval (float): Наименьший промежуток между запросами к одному хосту в секундах
+    """
+
+    def __init__(self, requests_per_second: float):
+        """
+        Parameters:
+            requests_per_second (float): Допустимое число запросов в секунду к одному хосту
+        """
+        self.interval = 1 / requests_per_second if requests_per_second else 0
+        self._next_slots = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host: str):
+        """
+        Ждёт, пока к хосту можно будет отправить следующий запрос
+
+        :param host: имя хоста
+        """
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slots.get(host, now))
+            self._next_slots[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class HHCrawler:
+    """
+    Загрузчик вакансий с api.hh.ru: общий пул соединений, ограниченное число одновременных запросов,
+    ограничение частоты по хосту и повтор запросов с растущей паузой
+
+    Attributes:
+        max_workers (int): Наибольшее число одновременных запросов
+        retries (int): Число повторов после первой неудачной попытки
+        backoff (float): Пауза перед первым повтором в секундах, дальше удваивается
+        timeout (float): Таймаут одного запроса в секундах
+        session (requests.Session): Сессия с пулом соединений
+        limiter (HostRateLimiter): Ограничитель частоты запросов
+    """
+
+    def __init__(self, max_workers=6, requests_per_second=10, retries=3, backoff=0.5, timeout=30):
+        """
+        Parameters:
+            max_workers (int): Наибольшее число одновременных запросов
+            requests_per_second (float): Допустимое число запросов в секунду к одному хосту, 0 - без ограничения
+            retries (int): Число повторов после первой неудачной попытки
+            backoff (float): Пауза перед первым повтором в секундах
+            timeout (float): Таймаут одного запроса в секундах
+        """
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = 'Veliullaev-vacancies-crawler'
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.limiter = HostRateLimiter(requests_per_second)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def fetch_json(self, url: str) -> dict:
+        """
+        Выполняет запрос к API, повторяя его при сетевых ошибках и ответах 429/5xx
+
+        :param url: строка запроса к API
+        :return: разобранный JSON ответа; при прочих ошибках клиента - пустой словарь
+        """
+        host = urlsplit(url).netloc
+        for attempt in range(self.retries + 1):
+            self.limiter.wait(host)
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+                if response.status_code not in _retry_statuses or attempt == self.retries:
+                    if 400 <= response.status_code < 500 and response.status_code != 429:
+                        return {}
+                    response.raise_for_status()
+                    return response.json()
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+            time.sleep(self.backoff * 2 ** attempt)
+
+    def fetch_frames(self, urls: list) -> list:
+        """
+        Выполняет запросы в пуле потоков
+
+        :param urls: строки запросов к API
+        :return: датафреймы вакансий в том же порядке, что и urls
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(lambda url: vacancies_from_json(self.fetch_json(url)), urls))
+
+    def _map(self, function, items: list) -> list:
+        """Выполняет function для всех items в пуле потоков, сохраняя порядок."""
+        if len(items) == 0:
+            return []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(function, items))
+
+    def iter_window_pages(self, windows: list, base_url=_hh_url, checkpoint=None):
+        """
+        Обходит страницы промежутков времени. Число страниц берётся из полей pages/found первой страницы,
+        а промежуток, в котором найдено больше, чем API отдаёт на один поиск, делится пополам
+
+        :param windows: промежутки (date_from, date_to)
+        :param base_url: адрес метода /vacancies
+        :param checkpoint: CrawlCheckpoint; записанные в нём страницы не запрашиваются повторно
+        :return: генератор (промежуток, номер страницы, JSON ответа) по мере загрузки
+        """
+        tasks = [(window, 0) for window in windows]
+        while tasks:
+            missing = [task for task in tasks if checkpoint is None or not checkpoint.is_done(*task)]
+            fetched = dict(zip(missing, self._map(lambda task: self.fetch_json(window_request(*task, base_url)),
+                                                  missing)))
+            next_tasks = []
+            for window, page in tasks:
+                data = fetched[(window, page)] if (window, page) in fetched else checkpoint.get(window, page)
+                if page == 0:
+                    halves = split_window(window) if data.get('found', 0) > _depth_limit else [window]
+                    if len(halves) > 1:
+                        next_tasks.extend((half, 0) for half in halves)
+                        if checkpoint is not None and (window, page) in fetched:
+                            checkpoint.mark(window, page, data)
+                        continue
+                    pages = min(data.get('pages', 0), _depth_limit // _per_page)
+                    next_tasks.extend((window, next_page) for next_page in range(1, pages))
+                if (window, page) in fetched:
+                    yield window, page, data
+            tasks = next_tasks
+
+    def crawl_windows(self, windows: list, base_url=_hh_url, collector=None, checkpoint=None, seen=None):
+        """
+        Загружает все вакансии за промежутки времени минимальным числом запросов.
+        Страница отмечается в checkpoint только после того, как её вакансии переданы collector и записаны в seen,
+        поэтому после перезапуска догружается лишь недостающее. Collector отбрасывает повторно пришедшую страницу
+        по ключу (промежуток, страница), так что сбой между записью в collector и в seen не даёт дублей
+
+        :param windows: промежутки (date_from, date_to)
+        :param base_url: адрес метода /vacancies
+        :param collector: VacancyCollector, куда складываются страницы; None - собрать в памяти
+        :param checkpoint: CrawlCheckpoint с уже загруженными страницами
+        :param seen: SeenIds; вакансии с уже встречавшимся id отбрасываются
+        :return: Dataframe с вакансиями по возрастанию промежутков и страниц, столбцы как у request_vacancies;
+         если передан collector - он сам
+        """
+        target = collector or VacancyCollector()
+        for window, page, data in self.iter_window_pages(windows, base_url, checkpoint):
+            if seen is None:
+                frame = vacancies_from_json(data)
+            else:
+                frame = flatten_vacancies(data.get('items') or [], with_id=True)
+                is_new = np.array([seen.add(vacancy_id) for vacancy_id in frame['id']], dtype=bool)
+                frame = frame[is_new].drop(columns='id')
+            target.add(frame, key=(window, page))
+            if seen is not None:
+                seen.flush()
+            if checkpoint is not None:
+                checkpoint.mark(window, page, data)
+        return target.result() if collector is None else collector
+
+    def crawl_day(self, date: str, base_url=_hh_url, collector=None, checkpoint=None, seen=None):
+        """
+        Загружает все вакансии за день
+
+        :param date: Дата в формате YYYY-MM-DD
+        :param base_url: адрес метода /vacancies
+        :param collector: VacancyCollector, куда складываются страницы; None - собрать в памяти
+        :param checkpoint: CrawlCheckpoint с уже загруженными страницами
+        :param seen: SeenIds для отбрасывания повторяющихся вакансий
+        :return: Dataframe с вакансиями или collector
+        """
+        return self.crawl_windows([day_window(date)], base_url, collector, checkpoint, seen)
+
+    def crawl(self, request_list: list) -> pd.DataFrame:
+        """
+        Загружает все запросы, например результат get_requests_for_day
+
+        :param request_list: список запросов или список списков запросов по промежуткам времени
+        :return: Dataframe с вакансиями в порядке запросов, столбцы как у request_vacancies
+        """
+        urls = [url for item in request_list for url in (item if isinstance(item, list) else [item])]
+        return unite_frames(self.fetch_frames(urls))
+
+
+class VacancyCollector:
+    """
+    Накопитель страниц вакансий: в памяти хранится список фреймов, который склеивается один раз в конце,
+    либо каждая страница сразу дописывается в CSV файл. Время и память линейны по числу страниц.
+    Страница с уже добавленным ключом повторно не добавляется; при записи в файл ключи и размер файла после
+    каждой страницы ведутся в журнале file_name + '.pages', по которому при дозаписи отрезается недописанный хвост
+
+    Attributes:
+        file_name (str): CSV файл для дозаписи, None - накопление в памяти
+        rows (int): Число собранных вакансий
+    """
+
+    def __init__(self, file_name: str = None, append=False):
+        """
+        Parameters:
+            file_name (str): CSV файл для дозаписи, None - накопление в памяти
+            append (bool): дописывать в существующий файл, иначе он перезаписывается
+        """
+        self.file_name = file_name
+        self.rows = 0
+        self._frames = []
+        self._keys = set()
+        self._write_header = True
+        if file_name is not None:
+            self._journal = file_name + '.pages'
+            if append and os.path.exists(file_name):
+                self._restore()
+            else:
+                open(file_name, 'w').close()
+                if os.path.exists(self._journal):
+                    os.remove(self._journal)
+            if os.path.getsize(file_name) > 0:
+                self._write_header = False
+            if not os.path.exists(self._journal):
+                self._log(None)
+
+    def _restore(self):
+        """Читает журнал страниц и отрезает от CSV файла всё, что было дописано после последней записи журнала."""
+        if not os.path.exists(self._journal):
+            return
+        size = None
+        with open(self._journal, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    unit = json.loads(line)
+                except json.JSONDecodeError:
+                    # строка, недописанная при аварийном завершении
+                    continue
+                if unit['key'] is not None:
+                    self._keys.add(json.dumps(unit['key']))
+                size = unit['size']
+        if size is not None and os.path.getsize(self.file_name) > size:
+            with open(self.file_name, 'r+b') as file:
+                file.truncate(size)
+
+    def _log(self, key):
+        with open(self._journal, 'a', encoding='utf-8') as file:
+            file.write(json.dumps({'key': key, 'size': os.path.getsize(self.file_name)}) + '\n')
+
+    def add(self, frame: pd.DataFrame, key=None):
+        """
+        Добавляет страницу вакансий; пустые страницы и страницы с уже добавленным ключом пропускаются
+
+        :param frame: Dataframe страницы
+        :param key: ключ страницы, например (промежуток, номер страницы): по нему упорядочивается итоговый фрейм
+         и отбрасываются повторы (в файл страницы пишутся по мере поступления)
+        """
+        if key is not None:
+            if json.dumps(key) in self._keys:
+                return
+            self._keys.add(json.dumps(key))
+        if self.file_name is None:
+            if not frame.empty:
+                self.rows += len(frame)
+                self._frames.append((key, len(self._frames), frame))
+            return
+        if not frame.empty:
+            self.rows += len(frame)
+            frame.to_csv(self.file_name, mode='a', header=self._write_header, index=False)
+            self._write_header = False
+        if key is not None:
+            self._log(key)
+
+    def result(self) -> pd.DataFrame:
+        """
+        :return: все собранные вакансии одним фреймом
+        """
+        if self.file_name is not None:
+            return pd.read_csv(self.file_name) if self.rows or not self._write_header else pd.DataFrame()
+        if all(key is not None for key, _, _ in self._frames):
+            self._frames.sort(key=lambda item: (item[0], item[1]))
+        return unite_frames([frame for _, _, frame in self._frames])
+
+    def finish(self):
+        """Удаляет журнал страниц после успешного завершения обхода."""
+        self._keys.clear()
+        if self.file_name is not None and os.path.exists(self._journal):
+            os.remove(self._journal)
+
+
+class CrawlCheckpoint:
+    """
+    Журнал загруженных страниц в формате JSON lines: по строке на (промежуток, страницу) с полями found и pages,
+    которых достаточно, чтобы после перезапуска восстановить план обхода без повторных запросов
+
+    Attributes:
+        file_name (str): Имя файла журнала
+        resumed (bool): Журнал уже существовал при открытии
+    """
+
+    def __init__(self, file_name: str):
+        """
+        Parameters:
+            file_name (str): Имя файла журнала
+        """
+        self.file_name = file_name
+        self.resumed = os.path.exists(file_name)
+        self._done = {}
+        if self.resumed:
+            with open(file_name, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        unit = json.loads(line)
+                    except json.JSONDecodeError:
+                        # строка, недописанная при аварийном завершении
+                        continue
+                    self._done[(tuple(unit['window']), unit['page'])] = {'found': unit['found'],
+                                                                         'pages': unit['pages']}
+
+    def is_done(self, window: tuple, page: int) -> bool:
+        return (tuple(window), page) in self._done
+
+    def get(self, window: tuple, page: int) -> dict:
+        """
+        :return: сохранённые поля found и pages страницы
+        """
+        return self._done[(tuple(window), page)]
+
+    def mark(self, window: tuple, page: int, data: dict):
+        """
+        Отмечает страницу загруженной, сразу дописывая её в файл
+
+        :param window: промежуток (date_from, date_to)
+        :param page: номер страницы
+        :param data: JSON ответа
+        """
+        unit = {'found': data.get('found', 0), 'pages': data.get('pages', 0)}
+        self._done[(tuple(window), page)] = unit
+        with open(self.file_name, 'a', encoding='utf-8') as file:
+            file.write(json.dumps({'window': list(window), 'page': page, **unit}) + '\n')
+
+    def finish(self):
+        """Удаляет журнал после успешного завершения обхода."""
+        self._done.clear()
+        if os.path.exists(self.file_name):
+            os.remove(self.file_name)
+
+
+class SeenIds:
+    """
+    Множество уже собранных id вакансий. На диске - дописываемый файл 8-байтовых чисел, в памяти -
+    отсортированный array('Q') с двоичным поиском и небольшое множество новых id
+
+    Attributes:
+        file_name (str): Имя файла с id
+    """
+
+    _merge_threshold = 100000
+
+    def __init__(self, file_name: str):
+        """
+        Parameters:
+            file_name (str): Имя файла с id
+        """
+        self.file_name = file_name
+        ids = array('Q')
+        if os.path.exists(file_name):
+            with open(file_name, 'rb') as file:
+                data = file.read()
+            ids.frombytes(data[:len(data) - len(data) % ids.itemsize])
+        self._sorted = array('Q', sorted(set(ids)))
+        self._pending = set()
+        self._unflushed = []
+
+    def __len__(self):
+        return len(self._sorted) + len(self._pending)
+
+    def __contains__(self, vacancy_id) -> bool:
+        vacancy_id = int(vacancy_id)
+        if vacancy_id in self._pending:
+            return True
+        index = bisect.bisect_left(self._sorted, vacancy_id)
+        return index < len(self._sorted) and self._sorted[index] == vacancy_id
+
+    def add(self, vacancy_id) -> bool:
+        """
+        Добавляет id вакансии
+
+        :param vacancy_id: id вакансии hh.ru
+        :return: True, если такой id встретился впервые
+        """
+        if vacancy_id in self:
+            return False
+        self._pending.add(int(vacancy_id))
+        self._unflushed.append(int(vacancy_id))
+        if len(self._pending) >= self._merge_threshold:
+            self._sorted = array('Q', sorted(self._sorted + array('Q', self._pending)))
+            self._pending.clear()
+        return True
+
+    def flush(self):
+        """Дописывает в файл id, добавленные после прошлого сохранения."""
+        if self._unflushed:
+            with open(self.file_name, 'ab') as file:
+                array('Q', self._unflushed).tofile(file)
+            self._unflushed.clear()
+
+    def compact(self):
+        """Перезаписывает файл отсортированными id без повторов."""
+        self.flush()
+        ids = array('Q', sorted(self._sorted + array('Q', self._pending)))
+        with open(self.file_name + '.tmp', 'wb') as file:
+            ids.tofile(file)
+        os.replace(self.file_name + '.tmp', self.file_name)
+
+
 def unite_frames(framelist: list):
     """
     Функция, объединяющая фреймы и отсеивающая те, которые пустые.
@@ -97,21 +604,21 @@ def unite_frames(framelist: list):
     :param framelist: список датафреймов вакансий
     :return: объединенный фрейм
     """
-    fin_frame = pd.DataFrame()
     filtered_frames = list(filter(lambda x: x.empty == False, framelist))
-    for i in filtered_frames:
-        fin_frame = pd.concat([fin_frame, i], ignore_index=True)
-    return fin_frame
+    if len(filtered_frames) == 0:
+        return pd.DataFrame()
+    return pd.concat(filtered_frames, ignore_index=True)
 
 
 if __name__ == '__main__':
-    stats = get_stats_mono(get_requests_for_day('2022-12-28'))
-    frames_ = []
-    for segment in stats:
-        frames_.append(unite_frames(segment))
-
-    filtered_frames = list(filter(lambda x: x.empty == False, frames_))
-    final_frame_yay = pd.DataFrame()
-    for i in filtered_frames:
-        final_frame_yay = pd.concat([final_frame_yay, i])
-    final_frame_yay.to_csv('vacancies_recent.csv', index=False)
+    # Вакансии дописываются в vacancies_recent.csv, повторно встреченные id отбрасываются,
+    # а после сбоя обход продолжается с недостающих страниц
+    checkpoint = CrawlCheckpoint('vacancies_recent.checkpoint')
+    seen = SeenIds('vacancies_recent.ids')
+    with HHCrawler() as crawler:
+        collector = crawler.crawl_day('2022-12-28', collector=VacancyCollector('vacancies_recent.csv', append=True),
+                                      checkpoint=checkpoint, seen=seen)
+    checkpoint.finish()
+    collector.finish()
+    seen.compact()
+    print(f'Собрано новых вакансий: {collector.rows}')
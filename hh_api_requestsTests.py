@@ -0,0 +1,243 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pandas as pd
+import hh_api_requests
+
+
+def make_item(number: int, published_at: str) -> dict:
+    """Вакансия в формате api.hh.ru; у каждой третьей нет зарплаты."""
+    salary = None if number % 3 == 0 else {'from': 1000 * number, 'to': None if number % 2 else 2000 * number,
+                                           'currency': 'RUR', 'gross': True}
+    return {'id': str(number), 'name': f'Программист {number}', 'salary': salary,
+            'area': {'id': '1', 'name': 'Москва', 'url': 'https://api.hh.ru/areas/1'},
+            'published_at': published_at, 'employer': {'name': 'Компания'}}
+
+
+def published_times(per_day: int) -> list:
+    """Время публикации вакансий заглушки: per_day вакансий 2022-12-28, равномерно по дню."""
+    start = datetime(2022, 12, 28)
+    return [start + timedelta(seconds=number * 86400 // per_day) for number in range(per_day)]
+
+
+def found_in_window(per_day: int, date_from: str, date_to: str) -> list:
+    """Номера вакансий заглушки, опубликованных в промежутке, границы включаются."""
+    date_from, date_to = datetime.fromisoformat(date_from), datetime.fromisoformat(date_to)
+    return [number for number, published in enumerate(published_times(per_day)) if date_from <= published <= date_to]
+
+
+class VacanciesHandler(BaseHTTPRequestHandler):
+    """Заглушка метода /vacancies: поиск по промежутку, постраничная выдача и ограничение в 2000 вакансий."""
+    per_day = 1500
+    requests = []
+    failures = {}
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        cls = VacanciesHandler
+        query = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+        with cls.lock:
+            cls.requests.append(query)
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+            failed = cls.failures.get(query['page'], 0) > 0
+            if failed:
+                cls.failures[query['page']] -= 1
+        time.sleep(0.01)
+        page, per_page = int(query['page']), int(query['per_page'])
+        if failed:
+            self.send_json(503, {'errors': [{'type': 'unavailable'}]})
+        elif (page + 1) * per_page > 2000:
+            self.send_json(400, {'errors': [{'type': 'bad_argument', 'value': 'page'}]})
+        else:
+            found = found_in_window(cls.per_day, query['date_from'], query['date_to'])
+            times = published_times(cls.per_day)
+            self.send_json(200, {'items': [make_item(number, times[number].strftime('%Y-%m-%dT%H:%M:%S+0300'))
+                                           for number in found[page * per_page:(page + 1) * per_page]],
+                                 'found': len(found), 'pages': min(-(-len(found) // per_page), 2000 // per_page),
+                                 'page': page, 'per_page': per_page})
+        with cls.lock:
+            cls.in_flight -= 1
+
+    def send_json(self, status: int, data: dict):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FlattenVacanciesTest(unittest.TestCase):
+
+    def test_typed_columns(self):
+        frame = hh_api_requests.flatten_vacancies([make_item(number, '2022-12-28T10:00:00+0300')
+                                                   for number in range(4)], with_id=True)
+        self.assertEqual(list(frame.columns), ['id', 'name', 'salary_from', 'salary_to', 'salary_currency',
+                                               'area_name', 'published_at'])
+        self.assertEqual(frame['salary_from'].dtype, 'float64')
+        self.assertEqual(frame['salary_from'].fillna(-1).tolist(), [-1, 1000, 2000, -1])
+        self.assertEqual(frame['salary_to'].fillna(-1).tolist(), [-1, -1, 4000, -1])
+        self.assertEqual(frame['salary_currency'].fillna('').tolist(), ['', 'RUR', 'RUR', ''])
+        self.assertEqual(frame['area_name'].tolist(), ['Москва'] * 4)
+
+    def test_all_without_salary(self):
+        frame = hh_api_requests.vacancies_from_json({'items': [make_item(0, '2022-12-28T10:00:00+0300')]})
+        self.assertEqual(len(frame), 1)
+        self.assertTrue(frame['salary_from'].isna().all())
+
+
+class HHMockServerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), VacanciesHandler)
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}/vacancies'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        VacanciesHandler.requests.clear()
+        VacanciesHandler.failures.clear()
+        VacanciesHandler.max_in_flight = 0
+        VacanciesHandler.per_day = 1500
+
+
+class HHCrawlerTest(HHMockServerTest):
+
+    def test_same_frame_as_request_vacancies(self):
+        urls = [url for segment in hh_api_requests.get_requests_for_day('2022-12-28', self.base_url)
+                for url in segment[0:3]]
+        expected = pd.concat([frame for frame in map(hh_api_requests.request_vacancies, urls) if not frame.empty],
+                             ignore_index=True)
+        with hh_api_requests.HHCrawler(max_workers=4, requests_per_second=0) as crawler:
+            result = crawler.crawl(urls)
+        pd.testing.assert_frame_equal(result, expected)
+        self.assertLessEqual(VacanciesHandler.max_in_flight, 4)
+
+    def test_retries_and_rate_limit(self):
+        VacanciesHandler.failures['1'] = 2
+        urls = hh_api_requests.get_requests_for_day('2022-12-28', self.base_url)[0][0:4]
+        start = time.monotonic()
+        with hh_api_requests.HHCrawler(max_workers=4, requests_per_second=20, backoff=0.01) as crawler:
+            frames = crawler.fetch_frames(urls)
+        self.assertGreaterEqual(time.monotonic() - start, 5 / 20)
+        found = len(found_in_window(1500, '2022-12-28T00:00', '2022-12-28T04:00'))
+        self.assertEqual([len(frame) for frame in frames], [100, found - 200, 0, 0])
+        self.assertEqual(len(VacanciesHandler.requests), 6)
+
+
+class AdaptivePaginationTest(HHMockServerTest):
+
+    def crawl_day(self) -> pd.DataFrame:
+        with hh_api_requests.HHCrawler(max_workers=4, requests_per_second=0) as crawler:
+            return crawler.crawl_day('2022-12-28', self.base_url)
+
+    def test_quiet_day(self):
+        VacanciesHandler.per_day = 40
+        self.assertEqual(len(self.crawl_day()), 40)
+        self.assertEqual(len(VacanciesHandler.requests), 1)
+
+    def test_pages_from_first_response(self):
+        VacanciesHandler.per_day = 1450
+        frame = self.crawl_day()
+        self.assertEqual(len(frame), 1450)
+        self.assertEqual(sorted(int(query['page']) for query in VacanciesHandler.requests), list(range(15)))
+
+    def test_busy_day_is_split(self):
+        VacanciesHandler.per_day = 5000
+        frame = self.crawl_day()
+        self.assertEqual(len(frame), 5000)
+        self.assertEqual(frame['name'].nunique(), 5000)
+        self.assertTrue(frame['published_at'].is_monotonic_increasing)
+        self.assertLess(len(VacanciesHandler.requests), 5000 / 100 + 10)
+
+    def test_csv_collector(self):
+        VacanciesHandler.per_day = 2500
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, 'vacancies_recent.csv')
+            with hh_api_requests.HHCrawler(max_workers=4, requests_per_second=0) as crawler:
+                collector = crawler.crawl_day('2022-12-28', self.base_url,
+                                              hh_api_requests.VacancyCollector(file_name))
+            written = pd.read_csv(file_name)
+        self.assertEqual(collector.rows, 2500)
+        self.assertEqual(sorted(written['name']), sorted(self.crawl_day()['name']))
+
+
+class ResumableCrawlTest(HHMockServerTest):
+
+    def crawl(self, directory: str, retries=3):
+        checkpoint = hh_api_requests.CrawlCheckpoint(os.path.join(directory, 'crawl.checkpoint'))
+        seen = hh_api_requests.SeenIds(os.path.join(directory, 'crawl.ids'))
+        collector = hh_api_requests.VacancyCollector(os.path.join(directory, 'vacancies.csv'), append=True)
+        with hh_api_requests.HHCrawler(max_workers=4, requests_per_second=0, retries=retries,
+                                       backoff=0.01) as crawler:
+            crawler.crawl_windows([('2022-12-28T00:00:00', '2022-12-28T11:59:59'),
+                                   ('2022-12-28T06:00:00', '2022-12-28T23:59:59')], self.base_url,
+                                  collector, checkpoint, seen)
+        return checkpoint, seen, collector
+
+    def test_resume_and_deduplicate(self):
+        VacanciesHandler.per_day = 3000
+        with tempfile.TemporaryDirectory() as directory:
+            VacanciesHandler.failures['3'] = 100
+            with self.assertRaises(Exception):
+                self.crawl(directory, retries=0)
+            VacanciesHandler.failures.clear()
+            checkpoint, seen, collector = self.crawl(directory)
+            self.assertTrue(checkpoint.resumed)
+            first_pages = [query for query in VacanciesHandler.requests if query['page'] == '0']
+            self.assertEqual(len(first_pages), len({(q['date_from'], q['date_to']) for q in first_pages}))
+            written = pd.read_csv(os.path.join(directory, 'vacancies.csv'))
+            self.assertEqual(len(written), 3000)
+            self.assertEqual(written['name'].nunique(), 3000)
+            checkpoint.finish()
+            seen.compact()
+            self.assertEqual(len(hh_api_requests.SeenIds(os.path.join(directory, 'crawl.ids'))), 3000)
+            self.assertEqual(os.path.getsize(os.path.join(directory, 'crawl.ids')), 3000 * 8)
+            self.assertEqual(self.crawl(directory)[2].rows, 0)
+
+    def test_crash_between_collector_and_seen(self):
+        VacanciesHandler.per_day = 3000
+        flush = hh_api_requests.SeenIds.flush
+        calls = []
+
+        def crashing_flush(seen):
+            calls.append(1)
+            if len(calls) == 5:
+                raise KeyboardInterrupt
+            flush(seen)
+
+        with tempfile.TemporaryDirectory() as directory:
+            hh_api_requests.SeenIds.flush = crashing_flush
+            try:
+                with self.assertRaises(KeyboardInterrupt):
+                    self.crawl(directory)
+            finally:
+                hh_api_requests.SeenIds.flush = flush
+            # страница, записанная в CSV лишь частично
+            with open(os.path.join(directory, 'vacancies.csv'), 'a', encoding='utf-8') as file:
+                file.write('Программист 1,1000')
+            self.crawl(directory)
+            written = pd.read_csv(os.path.join(directory, 'vacancies.csv'))
+        self.assertEqual(len(written), 3000)
+        self.assertEqual(written['name'].nunique(), 3000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+"""
+Замер hh_api_requests.flatten_vacancies против прежнего разбора ответа через .apply(pd.Series).
+Вакансии собраны по образцу ответов api.hh.ru, часть из них без зарплаты. Запуск: python hh_flatten_benchmark.py [число]
+"""
+import random
+import sys
+import timeit
+import pandas as pd
+import hh_api_requests
+
+
+def legacy_request_vacancies(data: dict) -> pd.DataFrame:
+    """Разбор ответа так, как его делал request_vacancies до flatten_vacancies."""
+    vacancies_dict = pd.DataFrame.from_dict(data)
+    records_df = pd.DataFrame.from_records(vacancies_dict['items'])
+    first_step = records_df[['name', 'salary', 'area', 'published_at']]
+    first_step = pd.concat([first_step.drop(['salary'], axis=1), first_step['salary'].apply(pd.Series)], axis=1)
+    first_step = pd.concat([first_step.drop(['area'], axis=1), first_step['area'].apply(pd.Series)], axis=1)
+    first_step.columns.values[7] = "area_name"
+    experimental = first_step[['name', 'from', 'to', 'currency', 'area_name', 'published_at']]
+    experimental.columns.values[1] = 'salary_from'
+    experimental.columns.values[2] = 'salary_to'
+    experimental.columns.values[3] = 'salary_currency'
+    return experimental
+
+
+def generate_items(count: int, seed=0) -> list:
+    """Вакансии в формате items ответа /vacancies."""
+    rnd = random.Random(seed)
+    items = []
+    for number in range(count):
+        salary_from = rnd.choice([None, rnd.randint(20, 300) * 1000])
+        salary = None if rnd.random() < 0.4 else {'from': salary_from, 'to': rnd.choice([None, 350000]),
+                                                   'currency': rnd.choice(['RUR', 'USD', 'KZT']), 'gross': False}
+        items.append({'id': str(70000000 + number), 'premium': False, 'name': f'Программист {rnd.randint(0, 500)}',
+                      'department': None, 'has_test': False, 'salary': salary,
+                      'area': {'id': '1', 'name': rnd.choice(['Москва', 'Казань', 'Алматы']),
+                               'url': 'https://api.hh.ru/areas/1'},
+                      'type': {'id': 'open', 'name': 'Открытая'}, 'address': None,
+                      'published_at': f'2022-12-28T{rnd.randint(0, 23):02d}:00:00+0300',
+                      'employer': {'id': str(rnd.randint(1, 10000)), 'name': 'Компания'},
+                      'snippet': {'requirement': 'Python', 'responsibility': 'Разработка'}})
+    return items
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    data = {'items': generate_items(count), 'found': count, 'pages': 1, 'page': 0, 'per_page': count}
+    legacy, flattened = legacy_request_vacancies(data), hh_api_requests.vacancies_from_json(data)
+    pd.testing.assert_frame_equal(legacy.astype(object).fillna(0), flattened.astype(object).fillna(0))
+    repeat = 5
+    legacy_time = min(timeit.repeat(lambda: legacy_request_vacancies(data), number=1, repeat=repeat))
+    flat_time = min(timeit.repeat(lambda: hh_api_requests.vacancies_from_json(data), number=1, repeat=repeat))
+    print(f'{count} вакансий: .apply(pd.Series) {legacy_time * 1000:8.1f} мс, '
+          f'flatten_vacancies {flat_time * 1000:6.1f} мс, ускорение {legacy_time / flat_time:5.1f}x')
@@ -0,0 +1,47 @@
+"""
+Замер времени multiprocessing_csv_reader.scan_files_parallel на 1/2/4/8 процессах.
+Годы в синтетической выгрузке сильно различаются по размеру, как в настоящих данных: 2022 год намного больше 2003.
+"""
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+import multiprocessing_csv_reader
+
+_header = ['name', 'salary_from', 'salary_to', 'salary_currency', 'area_name', 'published_at']
+
+
+def write_year_files(directory: str, rows: int, seed=0) -> list:
+    """Записывает по CSV файлу на год, число вакансий растёт с годом экспоненциально."""
+    rnd = random.Random(seed)
+    years = list(range(2003, 2023))
+    weights = [1.4 ** i for i in range(len(years))]
+    file_names = []
+    for year, weight in zip(years, weights):
+        file_names.append(os.path.join(directory, f'{year}.csv'))
+        with open(file_names[-1], 'w', encoding='utf-8-sig', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(_header)
+            for _ in range(max(int(rows * weight / sum(weights)), 1)):
+                salary_from = rnd.randint(10, 300) * 1000
+                writer.writerow([rnd.choice(['Программист', 'Менеджер', 'Аналитик']), salary_from,
+                                 salary_from + 20000, rnd.choice(['RUR', 'USD', 'EUR']),
+                                 rnd.choice(['Москва', 'Казань', 'Пермь']), f'{year}-05-10T10:00:00+0300'])
+    return file_names
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as directory:
+        file_names = write_year_files(directory, rows)
+        sizes = [os.path.getsize(file_name) for file_name in file_names]
+        print(f'Вакансий: {rows}, процессоров: {os.cpu_count()}, самый большой год: {max(sizes) / sum(sizes):.0%}')
+        baseline = None
+        for workers in (1, 2, 4, 8):
+            start = time.perf_counter()
+            multiprocessing_csv_reader.scan_files_parallel(file_names, 'Программист', workers=workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f'{workers} процесс(ов): {elapsed:7.2f} с, ускорение {baseline / elapsed:4.2f}x')
@@ -5,78 +5,239 @@
 # Python program to illustrate the concept
 # of threading
 # importing the threading module
+import functools
+import io
+import mmap
 import multiprocessing
 import os
+from csv import reader
 import statistics_creator
 import report
 import cProfile
 import queue
 
+_block_size = 16 * 1024 * 1024
 
-def create_report_card(isConsoleInput: bool, file_name: str, profession_name: str,
-                       res: list, queue: multiprocessing.Queue) -> report.Report:
-    result = statistics_creator.create_report_card(isConsoleInput=isConsoleInput, file_name=file_name,
-                                                   profession_name=profession_name, results=res)
-    global results
-    queue.put(result)
 
-
-def compile_result(queue: multiprocessing.Queue, profession: str) -> report.Report:
+def compile_result(partials, profession: str) -> report.Report:
     """
-    Собирает результат со множества процессоров в один
+    Собирает результат со множества процессоров в один.
+    Частичные результаты хранят суммы и число вакансий, поэтому средние значения, порог в 1% для городов и
+    сортировка городов считаются только после слияния всех частей.
 
     Arguments:
-        queue(multiprocessing.Queue): очередь результатов исполнения программы
+        partials: частичные результаты StatisticsAccumulator в порядке следования данных в исходном файле
         profession(str): название профессии
 
     Returns:
         Report, готовый для дальнейшей обработки в файл.
     """
-    salary_dynamic_by_year = {}
-    salary_dynamic_profession = {}
-    vacancy_dynamic_by_year = {}
-    vacancy_dynamic_profession = {}
-    global count
-    for other in iter(queue.get, None):
-        count -= 1
-        salary_dynamic_by_year.update(other.get_salary_dynamic_by_year())
-        salary_dynamic_profession.update(other.get_salary_dynamic_profession())
-        vacancy_dynamic_by_year.update(other.get_vacancy_dynamic_by_year())
-        vacancy_dynamic_profession.update(other.get_vacancy_dynamic_profession())
-        if count == 0:
-            break
-
-    final = report.Report(profession=profession,
-                          salary_dynamic_profession=salary_dynamic_profession,
-                          salary_town={}, salary_dynamic_by_year=salary_dynamic_by_year,
-                          vacancy_town={}, vacancy_dynamic_profession=vacancy_dynamic_profession,
-                          vacancy_dynamic_by_year=vacancy_dynamic_by_year)
-    return final
+    final = statistics_creator.StatisticsAccumulator(profession)
+    for other in partials:
+        final.merge(other)
+    return final.create_report()
+
+def count_quotes(mm: mmap.mmap, start: int, end: int) -> int:
+    """
+    Считает кавычки в диапазоне байт файла блоками, не копируя весь диапазон в память
+
+    Arguments:
+        mm(mmap.mmap): отображённый в память файл
+        start(int): начало диапазона
+        end(int): конец диапазона (не включительно)
+
+    Returns:
+        Число байт '"' в диапазоне.
+    """
+    count = 0
+    for position in range(start, end, _block_size):
+        count += mm[position:min(position + _block_size, end)].count(b'"')
+    return count
+
+
+def find_record_end(mm: mmap.mmap, position: int, quotes: int) -> int:
+    """
+    Ищет первый конец записи CSV начиная с position. Перевод строки завершает запись, только если
+    число кавычек до него чётное, то есть он не находится внутри многострочного поля в кавычках.
+
+    Arguments:
+        mm(mmap.mmap): отображённый в память файл
+        position(int): позиция, с которой начинается поиск
+        quotes(int): число кавычек от начала записи, внутри которой находится position
+
+    Returns:
+        Позиция сразу после найденного перевода строки или размер файла.
+    """
+    while True:
+        newline = mm.find(b'\n', position)
+        if newline == -1:
+            return len(mm)
+        quotes += count_quotes(mm, position, newline)
+        position = newline + 1
+        if quotes % 2 == 0:
+            return position
+
+
+def split_byte_ranges(file_name: str, parts: int) -> (list, list):
+    """
+    Делит CSV файл на диапазоны байт примерно одинакового размера, выровненные по границам записей,
+    в том числе многострочных полей в кавычках
+
+    Arguments:
+        file_name(str): имя CSV файла
+        parts(int): желаемое число диапазонов
+
+    Returns:
+        Заголовочный список c именами столбцов и список диапазонов (начало, конец).
+    """
+    with open(file_name, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return [], []
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header_end = find_record_end(mm, 0, 0)
+            header = next(reader(io.StringIO(mm[:header_end].decode('utf-8-sig'), newline=None)), [])
+            size = len(mm)
+            bounds = [header_end]
+            position = header_end
+            quotes = 0
+            for part in range(1, parts):
+                target = header_end + (size - header_end) * part // parts
+                if target <= bounds[-1]:
+                    continue
+                quotes += count_quotes(mm, position, target)
+                position = find_record_end(mm, target, quotes)
+                quotes = 0
+                if position >= size:
+                    break
+                bounds.append(position)
+            bounds.append(size)
+    return header, [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+
+def scan_byte_range(file_name: str, start: int, end: int, header: list, profession: str,
+                    rate_index=None) -> statistics_creator.StatisticsAccumulator:
+    """
+    Считает частичную статистику по диапазону байт CSV файла
+
+    Arguments:
+        file_name(str): имя CSV файла
+        start(int): начало диапазона, совпадающее с началом записи
+        end(int): конец диапазона, совпадающий с концом записи
+        header(list): список столбцов CSV файла
+        profession(str): название профессии
+        rate_index(RateIndex): помесячные курсы ЦБ для перевода зарплат в рубли
+
+    Returns:
+        StatisticsAccumulator с суммами и числом вакансий по диапазону.
+    """
+    with open(file_name, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        text = mm[start:end].decode('utf-8')
+    accumulator = statistics_creator.StatisticsAccumulator(profession)
+    rows = reader(io.StringIO(text, newline=None))
+    for vacancy in statistics_creator.CSVParser.vacancies_from_rows(rows, header, rate_index):
+        accumulator.add_vacancy(vacancy)
+    return accumulator
+
+
+def split_tasks(file_names: list, workers: int, tasks_per_worker=4) -> list:
+    """
+    Делит файлы на задачи примерно одинакового размера в байтах, независимо от того, сколько файлов и
+    насколько они различаются по размеру
+
+    Arguments:
+        file_names(list): имена CSV файлов
+        workers(int): число процессов
+        tasks_per_worker(int): сколько задач в среднем приходится на один процесс
+
+    Returns:
+        Список задач (имя файла, начало, конец, заголовок) в порядке следования данных.
+    """
+    sizes = [os.path.getsize(file_name) for file_name in file_names]
+    task_size = max(sum(sizes) // max(workers * tasks_per_worker, 1), 1)
+    tasks = []
+    for file_name, size in zip(file_names, sizes):
+        header, ranges = split_byte_ranges(file_name, max(round(size / task_size), 1))
+        tasks.extend((file_name, start, end, header) for start, end in ranges)
+    return tasks
+
+
+def _scan_task(task: tuple, profession: str, rate_index=None) -> statistics_creator.StatisticsAccumulator:
+    """Выполняет одну задачу из split_tasks в процессе пула."""
+    return scan_byte_range(*task, profession, rate_index)
+
+
+def iter_partials(file_names: list, profession: str, workers=None, tasks_per_worker=4, rate_index=None):
+    """
+    Считает частичную статистику по задачам в ограниченном пуле процессов.
+    Свободный процесс сразу забирает следующую задачу, поэтому один большой год не задерживает остальные.
+
+    Arguments:
+        file_names(list): имена CSV файлов
+        profession(str): название профессии
+        workers(int): число процессов, по умолчанию число процессоров
+        tasks_per_worker(int): сколько задач в среднем приходится на один процесс
+        rate_index(RateIndex): помесячные курсы ЦБ, передаются в процессы вместе с задачей
+
+    Returns:
+        Генератор StatisticsAccumulator в порядке следования данных.
+    """
+    workers = workers or os.cpu_count() or 1
+    tasks = split_tasks(file_names, workers, tasks_per_worker)
+    if len(tasks) == 0:
+        return
+    with multiprocessing.Pool(processes=min(workers, len(tasks))) as pool:
+        yield from pool.imap(functools.partial(_scan_task, profession=profession, rate_index=rate_index), tasks,
+                             chunksize=1)
+
+
+def scan_files_parallel(file_names: list, profession: str, workers=None, tasks_per_worker=4,
+                        rate_index=None) -> statistics_creator.StatisticsAccumulator:
+    """
+    Считает статистику по нескольким CSV файлам в ограниченном пуле процессов
+
+    Arguments:
+        file_names(list): имена CSV файлов
+        profession(str): название профессии
+        workers(int): число процессов, по умолчанию число процессоров
+        tasks_per_worker(int): сколько задач в среднем приходится на один процесс
+        rate_index(RateIndex): помесячные курсы ЦБ для перевода зарплат в рубли
+
+    Returns:
+        StatisticsAccumulator со статистикой по всем файлам.
+    """
+    result = statistics_creator.StatisticsAccumulator(profession)
+    for partial in iter_partials(file_names, profession, workers, tasks_per_worker, rate_index):
+        result.merge(partial)
+    return result
+
+
+def scan_csv_parallel(file_name: str, profession: str, workers=None,
+                      rate_index=None) -> statistics_creator.StatisticsAccumulator:
+    """
+    Считает статистику по исходному CSV файлу в пуле процессов без предварительного разделения по годам
+
+    Arguments:
+        file_name(str): имя CSV файла
+        profession(str): название профессии
+        workers(int): число процессов, по умолчанию число процессоров
+        rate_index(RateIndex): помесячные курсы ЦБ для перевода зарплат в рубли
+
+    Returns:
+        StatisticsAccumulator со статистикой по всему файлу.
+    """
+    return scan_files_parallel([file_name], profession, workers, rate_index=rate_index)
 
 
 if __name__ == "__main__":
+    path = input("Введите название файла или папки с файлами: ")
+    profName = input("Введите название профессии: ")
+    workers = input("Введите число процессов (пустая строка - по числу процессоров): ")
     profiler = cProfile.Profile()
     profiler.enable()
-    currpath = os.path.dirname(__file__)  # получаем директорию, где запущен скрипт
-    splittedDir = currpath + "/year_splitted_files/"
-    csvList = os.listdir(splittedDir)
-    profName = "Программист"
-
-    threads = []
-    results = []
-    q = multiprocessing.Queue(maxsize=20)
-    count = len(csvList)
-    for i in csvList:
-        t = multiprocessing.Process(target=create_report_card,
-                                    args=(False, splittedDir + i, profName,
-                                          results, q,))
-        t.start()
-        threads.append(t)
-
-    for i in threads:
-        t.join()
-
-    finalRes = compile_result(queue=q, profession=profName)
+    csvList = [os.path.join(path, i) for i in sorted(os.listdir(path))] if os.path.isdir(path) else [path]
+
+    finalRes = compile_result(partials=iter_partials(csvList, profName, int(workers) if workers else None),
+                              profession=profName)
 
     print("Анализ данных завершен!")
     profiler.disable()
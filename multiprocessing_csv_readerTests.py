@@ -0,0 +1,84 @@
+import csv
+import os
+import unittest
+import multiprocessing_csv_reader
+import statistics_creator
+from statistics_creatorTests import VacanciesFileTest, legacy_statistics, accumulated_statistics
+
+
+class ByteRangeScannerTest(VacanciesFileTest):
+    count = 2000
+    seed = 2
+
+    def test_ranges_cover_file(self):
+        header, ranges = multiprocessing_csv_reader.split_byte_ranges(self.file_name, 7)
+        self.assertEqual(header[0], 'name')
+        self.assertEqual(ranges[-1][1], os.path.getsize(self.file_name))
+        for previous, current in zip(ranges, ranges[1:]):
+            self.assertEqual(previous[1], current[0])
+
+    def test_ranges_start_at_records(self):
+        header, ranges = multiprocessing_csv_reader.split_byte_ranges(self.file_name, 50)
+        total = 0
+        for start, end in ranges:
+            partial = multiprocessing_csv_reader.scan_byte_range(self.file_name, start, end, header, 'Программист')
+            total += partial.total
+        self.assertEqual(total, sum(legacy_statistics(self.file_name, 'Программист')[1].values()))
+
+    def test_parallel_statistics(self):
+        accumulator = multiprocessing_csv_reader.scan_csv_parallel(self.file_name, 'Программист', workers=3)
+        self.assertEqual(accumulated_statistics(accumulator), legacy_statistics(self.file_name, 'Программист'))
+
+    def test_empty_file(self):
+        file_name = os.path.join(self.directory.name, 'empty.csv')
+        open(file_name, 'w').close()
+        self.assertEqual(multiprocessing_csv_reader.scan_csv_parallel(file_name, 'Программист', workers=2).total, 0)
+
+
+class CompileResultTest(VacanciesFileTest):
+    seed = 4
+
+    @classmethod
+    def split_by_year(cls) -> list:
+        """Делит файл по годам, как file_splitter, и возвращает имена файлов по возрастанию года."""
+        with open(cls.file_name, 'r', encoding='utf-8-sig', newline='') as file:
+            rows = list(csv.reader(file))
+        years = {}
+        for row in rows[1:]:
+            years.setdefault(row[-1][0:4], []).append(row)
+        file_names = []
+        for year in sorted(years):
+            file_names.append(os.path.join(cls.directory.name, f'{year}.csv'))
+            with open(file_names[-1], 'w', encoding='utf-8-sig', newline='') as file:
+                csv.writer(file).writerows([rows[0]] + years[year])
+        return file_names
+
+    def test_same_report_as_single_process(self):
+        partials = [statistics_creator.CSVParser(file_name, 'Программист').create_statistics_accumulator()
+                    for file_name in self.split_by_year()]
+        result = multiprocessing_csv_reader.compile_result(partials, 'Программист')
+        expected = legacy_statistics(self.file_name, 'Программист')
+        self.assertEqual((result.get_salary_dynamic_by_year(), result.get_vacancy_dynamic_by_year(),
+                          result.get_salary_dynamic_profession(), result.get_vacancy_dynamic_profession(),
+                          result.get_salary_town(), result.get_vacancy_town()), expected)
+        self.assertNotEqual(result.get_salary_town(), {})
+
+    def test_pool_over_year_files(self):
+        file_names = self.split_by_year()
+        tasks = multiprocessing_csv_reader.split_tasks(file_names, workers=4)
+        sizes = [end - start for _, start, end, _ in tasks]
+        self.assertLess(max(sizes), 2 * sum(sizes) / (4 * 4))
+        accumulator = multiprocessing_csv_reader.scan_files_parallel(file_names, 'Программист', workers=2)
+        self.assertEqual(accumulator.get_vacancy_dynamic_by_year(),
+                         legacy_statistics(self.file_name, 'Программист')[1])
+
+    def test_overlapping_shards(self):
+        half = statistics_creator.CSVParser(self.file_name, 'Программист').create_statistics_accumulator()
+        doubled = multiprocessing_csv_reader.compile_result([half, half], 'Программист')
+        self.assertEqual(doubled.get_salary_dynamic_by_year(), half.get_salary_dynamic_by_year())
+        self.assertEqual(doubled.get_vacancy_dynamic_by_year(),
+                         {year: 2 * count for year, count in half.get_vacancy_dynamic_by_year().items()})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Модуль для поиска сразу нескольких профессий в названиях вакансий за один проход по строке (алгоритм Ахо-Корасик).
+"""
+
+
+class ProfessionMatcher:
+    """Автомат Ахо-Корасик для поиска вхождений списка профессий в названия вакансий.
+
+    Attributes:
+        professions (list): Список искомых профессий.
+        case_sensitive (bool): Учитывать ли регистр при поиске.
+    """
+
+    def __init__(self, professions: list, case_sensitive=True):
+        """
+        Parameters:
+            professions (list): Список искомых профессий.
+            case_sensitive (bool): Учитывать ли регистр при поиске.
+        """
+        self.professions = list(professions)
+        self.case_sensitive = case_sensitive
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [set()]
+        for index, profession in enumerate(self.professions):
+            node = 0
+            for char in self._normalize(profession):
+                if char not in self._goto[node]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(set())
+                    self._goto[node][char] = len(self._goto) - 1
+                node = self._goto[node][char]
+            self._output[node].add(index)
+        self._build_failure_links()
+
+    def _normalize(self, text: str) -> str:
+        """Приводит строку к нижнему регистру, если регистр не учитывается."""
+        return text if self.case_sensitive else text.lower()
+
+    def _build_failure_links(self):
+        """Строит суффиксные ссылки обходом бора в ширину и объединяет выходы узлов."""
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail][char] if char in self._goto[fail] else 0
+                self._output[child] |= self._output[self._fail[child]]
+                queue.append(child)
+
+    def match(self, text: str) -> list:
+        """
+        Ищет профессии, входящие в строку
+
+        :param text: название вакансии
+        :return: отсортированный список номеров найденных профессий в professions
+        """
+        found = set(self._output[0])
+        node = 0
+        for char in self._normalize(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            if self._output[node]:
+                found |= self._output[node]
+        return sorted(found)
+
+    def match_names(self, text: str) -> list:
+        """
+        Ищет профессии, входящие в строку
+
+        :param text: название вакансии
+        :return: список названий найденных профессий
+        """
+        return [self.professions[index] for index in self.match(text)]
@@ -0,0 +1,92 @@
+"""
+Замер запросов отчёта SQLite_vacancies_interaction до и после migrate_vacancies_schema.
+Таблица vacancies прежней схемы заполняется синтетическими вакансиями во временной базе, затем
+одни и те же отчёты считаются шестью запросами по substr(published_at) и двумя запросами
+read_from_sql по столбцу year с индексами. В конце таблица выгружается в csv и загружается обратно
+прежним insert_table (read_csv + to_sql) и потоковым load_csv, а отчёт собирается из сводных таблиц.
+Запуск: python sqlite_benchmark.py [число строк]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import pandas as pd
+from sqlalchemy import create_engine
+import SQLite_vacancies_interaction as interaction
+
+_towns = ['Москва', 'Санкт-Петербург', 'Казань', 'Екатеринбург', 'Новосибирск', 'Алматы', 'Минск', 'Самара',
+          'Уфа', 'Пермь', 'Воронеж', 'Омск'] + [f'Город {number}' for number in range(300)]
+_names = ['Программист', 'Программист Python', 'Аналитик', 'Менеджер по продажам', 'Бухгалтер', 'Водитель']
+
+
+def legacy_read_from_sql(engine, profession=''):
+    """Отчёт так, как его считал read_from_sql: шесть запросов по substr(published_at) без индексов."""
+    df = pd.read_sql("Select substr(published_at,1,4) as date, round(avg(Salary),3) as average from vacancies "
+                     "where salary not null group by substr(published_at,1,4);", engine)
+    df1 = pd.read_sql("Select substr(published_at,1,4) as date, count(Salary) as cnt from vacancies "
+                      "where salary not null group by substr(published_at,1,4);", engine)
+    df2 = pd.read_sql(f"Select substr(published_at,1,4) as date, round(avg(Salary),3) as average from vacancies "
+                      f"where (salary not null and name like '{profession}') group by substr(published_at,1,4);",
+                      engine)
+    df3 = pd.read_sql("Select substr(published_at,1,4) as date, count(Salary) as cnt from vacancies "
+                      "where (salary not null and name = 'Программист') group by substr(published_at,1,4);", engine)
+    df4 = pd.read_sql("Select area_name, round(avg(Salary),3) as average from vacancies where (salary not null) "
+                      "group by area_name having 1.0 * count(*) / (select count(*) from vacancies "
+                      "where (salary not null)) > 0.01 order by average DESC LIMIT 10;", engine)
+    df5 = pd.read_sql("Select area_name, round(1.0 * count(*) / (SELECT COUNT(*) FROM vacancies "
+                      "where (salary not null)),4) as percentage from vacancies where (salary not null) "
+                      "group by area_name order by percentage DESC LIMIT 10;", engine)
+    return df, df1, df2, df3, df4, df5
+
+
+def fill_legacy_table(db_file: str, count: int, seed=0):
+    """Таблица vacancies в прежнем виде: без year, month и индексов."""
+    rnd = random.Random(seed)
+    with sqlite3.connect(db_file) as connection:
+        connection.execute('CREATE TABLE vacancies (name TEXT, Salary REAL, area_name TEXT, published_at TEXT)')
+        batch = 100_000
+        for start in range(0, count, batch):
+            connection.executemany('INSERT INTO vacancies VALUES (?, ?, ?, ?)', [
+                (rnd.choice(_names), None if rnd.random() < 0.1 else float(rnd.randint(10, 400) * 1000),
+                 _towns[min(int(rnd.expovariate(0.3)), len(_towns) - 1)],
+                 f'{rnd.randint(2003, 2022)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}T10:00:00+0300')
+                for _ in range(start, min(start + batch, count))])
+
+
+def legacy_insert_table(engine, filename: str, table: str):
+    """Загрузка так, как её делал insert_table до load_csv: весь файл в памяти и to_sql."""
+    pd.read_csv(filename, delimiter=',').to_sql(table, con=engine, index=False)
+
+
+def timed(function, *args) -> tuple:
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 3_000_000
+    with tempfile.TemporaryDirectory() as directory:
+        db_file = os.path.join(directory, 'Vacancies.db')
+        fill_legacy_table(db_file, count)
+        engine = create_engine(f'sqlite:///{db_file}', echo=False)
+        legacy, legacy_time = timed(legacy_read_from_sql, engine, 'Программист')
+        _, migrate_time = timed(interaction.migrate_vacancies_schema, engine)
+        managed, managed_time = timed(interaction.read_from_sql, engine, 'Программист')
+        for old, new in zip(legacy, managed):
+            pd.testing.assert_frame_equal(old, new)
+        csv_file = os.path.join(directory, 'vacancies.csv')
+        pd.read_sql('SELECT name, Salary, area_name, published_at FROM vacancies', engine).to_csv(csv_file,
+                                                                                                  index=False)
+        _, to_sql_time = timed(legacy_insert_table, engine, csv_file, 'vacancies_to_sql')
+        loaded = interaction.load_csv(engine, csv_file, 'vacancies_loaded')
+        _, aggregates_time = timed(interaction.create_aggregates, engine, ['Программист'])
+        _, report_time = timed(interaction.report_from_aggregates, engine, 'Программист')
+        engine.dispose()
+    print(f'{count} строк: substr(published_at) {legacy_time:6.2f} с, миграция {migrate_time:6.2f} с, '
+          f'year и индексы {managed_time:6.2f} с, ускорение {legacy_time / managed_time:5.1f}x')
+    print(f'загрузка csv: to_sql {count / to_sql_time:9.0f} строк/с, '
+          f'load_csv {loaded["rows_per_second"]:9.0f} строк/с')
+    print(f'сводные таблицы: построение {aggregates_time:6.2f} с, отчёт из них {report_time * 1000:6.1f} мс')
@@ -1,6 +1,14 @@
+from array import array
 from csv import reader
 from datetime import datetime
+import json
+import math
+import os
+import numpy as np
 import report
+from currency_rate_index import RateIndex
+from profession_matcher import ProfessionMatcher
+from vacancy_cache import VacancyCache
 import doctest
 
 """OUTDATED: Новая версия на Pandas в cooler_statistics_creator"""
@@ -59,6 +67,26 @@ class DataSet:
         #return datetime.strptime(date, DataSet.original_date_format).strftime(DataSet.date_format)
         return date[0:4]
 
+    @staticmethod
+    def rub_rate(currency: str, date: str, rate_index: RateIndex = None) -> float:
+        """
+        Метод, возвращающий курс валюты к рублю: по месяцу публикации из rate_index, а если его нет
+        или в нём нет курса - из currency_to_rub. Курс одной вакансии нужен потоковым накопителям,
+        колоночный датасет переводит зарплаты сразу всех вакансий через ColumnarDataSet.apply_rates.
+
+        Arguments:
+            currency (str): код валюты.
+            date (str): оригинальная дата публикации.
+            rate_index (RateIndex): помесячные курсы ЦБ.
+        Returns:
+            Курс за единицу валюты.
+        """
+        if rate_index is not None:
+            rate = rate_index.rate(currency, date)
+            if not math.isnan(rate):
+                return rate
+        return DataSet.currency_to_rub[currency]
+
 
 class Vacancy:
     """Класс для представления вакансии.
@@ -72,6 +100,8 @@ class Vacancy:
         area_name (str): Название региона вакансии.
         published_at (int): Дата публикации вакансии, год.
     """
+    __slots__ = ('name', 'salary_from', 'salary_to', 'salary_currency', 'salary_middle_in_rub', 'area_name',
+                 'published_at')
     name: str
     salary_from: float
     salary_to: float
@@ -80,10 +110,11 @@ class Vacancy:
     area_name: str
     published_at: int
 
-    def __init__(self, vac_dict: dict):
+    def __init__(self, vac_dict: dict, rate_index: RateIndex = None):
         """
         Parameters:
             vac_dict (dict): Словарь, храняющий в себе данные для вставки в поля класса Vacancy.
+            rate_index (RateIndex): Помесячные курсы ЦБ, без них используется DataSet.currency_to_rub.
         """
         self.name = vac_dict['name']
         self.salary_from = float(vac_dict['salary_from'])
@@ -92,7 +123,505 @@ class Vacancy:
         self.area_name = vac_dict['area_name']
         self.published_at = int(DataSet.format_date(vac_dict['published_at']))
         self.salary_middle_in_rub = (self.salary_from + self.salary_to) / 2 \
-                                    * DataSet.currency_to_rub[self.salary_currency]
+                                    * DataSet.rub_rate(self.salary_currency, vac_dict['published_at'], rate_index)
+
+
+class StatisticsAccumulator:
+    """Класс для накопления статистики по вакансиям за один проход по файлу.
+    Хранит только суммы зарплат и число вакансий, поэтому занимаемая память не зависит от размера файла.
+
+    Attributes:
+        profession (str): Название профессии.
+        total (int): Общее число учтённых вакансий.
+        year_sums (dict): Словарь сумм зарплат по годам.
+        year_counts (dict): Словарь числа вакансий по годам.
+        profession_sums (dict): Словарь сумм зарплат по годам для конкретной профессии.
+        profession_counts (dict): Словарь числа вакансий по годам для конкретной профессии.
+        town_sums (dict): Словарь сумм зарплат по городам.
+        town_counts (dict): Словарь числа вакансий по городам.
+    """
+
+    def __init__(self, profession: str):
+        """
+        Parameters:
+            profession (str): Название профессии.
+        """
+        self.profession = profession
+        self.total = 0
+        self.year_sums = {}
+        self.year_counts = {}
+        self.profession_sums = {}
+        self.profession_counts = {}
+        self.town_sums = {}
+        self.town_counts = {}
+
+    def add(self, name: str, salary: float, area_name: str, year: int):
+        """Учитывает одну вакансию в накопленных суммах.
+
+        Parameters:
+            name (str): Название вакансии.
+            salary (float): Средняя зарплата в рублях.
+            area_name (str): Название региона вакансии.
+            year (int): Год публикации вакансии.
+        """
+        self._add_totals(salary, area_name, year)
+        if self.profession in name:
+            self.profession_sums[year] = self.profession_sums.get(year, 0) + salary
+            self.profession_counts[year] = self.profession_counts.get(year, 0) + 1
+
+    def _add_totals(self, salary: float, area_name: str, year: int):
+        """Учитывает вакансию в общих суммах по годам и городам."""
+        self.total += 1
+        self.year_sums[year] = self.year_sums.get(year, 0) + salary
+        self.year_counts[year] = self.year_counts.get(year, 0) + 1
+        self.town_sums[area_name] = self.town_sums.get(area_name, 0) + salary
+        self.town_counts[area_name] = self.town_counts.get(area_name, 0) + 1
+
+    def add_vacancy(self, vacancy: Vacancy):
+        """Учитывает объект Vacancy в накопленных суммах.
+
+        Parameters:
+            vacancy (Vacancy): Вакансия.
+        """
+        self.add(vacancy.name, vacancy.salary_middle_in_rub, vacancy.area_name, vacancy.published_at)
+
+    def merge(self, other):
+        """Добавляет к накопленным суммам суммы другого накопителя той же профессии.
+        Ключи, которых ещё не было, добавляются в конец, поэтому слияние частей файла по порядку сохраняет порядок
+        первого появления годов и городов.
+
+        Parameters:
+            other (StatisticsAccumulator): Накопитель, посчитанный по другой части данных.
+        Returns:
+            Этот же накопитель.
+        """
+        self.total += other.total
+        for own, others in ((self.year_sums, other.year_sums), (self.year_counts, other.year_counts),
+                            (self.profession_sums, other.profession_sums),
+                            (self.profession_counts, other.profession_counts),
+                            (self.town_sums, other.town_sums), (self.town_counts, other.town_counts)):
+            self._merge_dict(own, others)
+        return self
+
+    @staticmethod
+    def _merge_dict(own: dict, others: dict):
+        """Прибавляет значения одного словаря сумм к другому."""
+        for key, value in others.items():
+            own[key] = own.get(key, 0) + value
+
+    _state_fields = ('year_sums', 'year_counts', 'profession_sums', 'profession_counts', 'town_sums', 'town_counts')
+
+    def to_state(self) -> dict:
+        """Возвращает накопленные суммы в виде, пригодном для JSON.
+        Словари хранятся списками пар, чтобы годы оставались числами, а порядок ключей сохранялся."""
+        state = {'profession': self.profession, 'total': self.total}
+        for field in self._state_fields:
+            state[field] = list(getattr(self, field).items())
+        return state
+
+    @staticmethod
+    def from_state(state: dict):
+        """Восстанавливает накопитель из словаря, полученного через to_state
+
+        Parameters:
+            state (dict): Сохранённое состояние.
+        Returns:
+            Объект класса StatisticsAccumulator или BatchStatisticsAccumulator.
+        """
+        if 'professions' in state:
+            accumulator = BatchStatisticsAccumulator(state['professions'])
+            accumulator.professions_sums = [dict(pairs) for pairs in state['professions_sums']]
+            accumulator.professions_counts = [dict(pairs) for pairs in state['professions_counts']]
+        else:
+            accumulator = StatisticsAccumulator(state['profession'])
+        accumulator.total = state['total']
+        for field in StatisticsAccumulator._state_fields:
+            setattr(accumulator, field, dict(state[field]))
+        return accumulator
+
+    def save(self, file_name: str):
+        """Сохраняет накопленные суммы в JSON файл состояния. Запись атомарная: сначала во временный файл.
+
+        Parameters:
+            file_name (str): Имя файла состояния.
+        """
+        with open(file_name + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(self.to_state(), file, ensure_ascii=False)
+        os.replace(file_name + '.tmp', file_name)
+
+    @staticmethod
+    def load(file_name: str):
+        """Загружает накопитель из JSON файла состояния
+
+        Parameters:
+            file_name (str): Имя файла состояния.
+        Returns:
+            Объект класса StatisticsAccumulator или BatchStatisticsAccumulator.
+        """
+        with open(file_name, 'r', encoding='utf-8') as file:
+            return StatisticsAccumulator.from_state(json.load(file))
+
+    def get_salary_dynamic_by_year(self) -> dict:
+        """Возвращает словарь динамики зарплат по годам вида {год: средняя зарплата}"""
+        return {year: int(self.year_sums[year] / self.year_counts[year]) for year in self.year_sums}
+
+    def get_vacancy_dynamic_by_year(self) -> dict:
+        """Возвращает словарь динамики вакансий по годам вида {год: число вакансий}"""
+        return dict(self.year_counts)
+
+    def get_salary_dynamic_profession(self) -> dict:
+        """Возвращает словарь динамики зарплат по годам для конкретной профессии.
+        Годы без вакансий профессии заполняются нулями.
+        """
+        return {year: int(self.profession_sums[year] / self.profession_counts[year])
+                if self.profession_counts.get(year, 0) != 0 else 0 for year in self.year_sums}
+
+    def get_vacancy_dynamic_profession(self) -> dict:
+        """Возвращает словарь динамики числа вакансий по годам для конкретной профессии"""
+        return {year: self.profession_counts.get(year, 0) for year in self.year_sums}
+
+    def _get_frequent_towns(self) -> list:
+        """Возвращает города, число вакансий которых составляет более и равно 1%"""
+        return [town for town in self.town_counts if self.town_counts[town] >= self.total / 100]
+
+    def get_salary_towns_levels(self) -> dict:
+        """Возвращает отсортированный словарь средних зарплат по городам, число вакансий которых составляет более
+        и равно 1%
+        """
+        town_salaries = {town: int(self.town_sums[town] / self.town_counts[town])
+                         for town in self._get_frequent_towns()}
+        return dict(sorted(town_salaries.items(), key=lambda x: x[1], reverse=True))
+
+    def get_vacancies_towns_levels(self) -> dict:
+        """Возвращает отсортированный словарь долей вакансий по городам с обрезанными значениями до четвертого знака"""
+        town_counts = sorted(((town, self.town_counts[town]) for town in self._get_frequent_towns()),
+                             key=lambda x: (-x[1]))
+        return {town: round(count / self.total, 4) for town, count in town_counts}
+
+    def create_report(self) -> report.Report:
+        """Создает карточку отчёта класса Report из накопленных сумм
+
+        Returns:
+            Объект класса Report с готовыми данными для статистики.
+        """
+        return report.Report(self.profession, self.get_salary_dynamic_by_year(), self.get_vacancy_dynamic_by_year(),
+                             self.get_salary_dynamic_profession(), self.get_vacancy_dynamic_profession(),
+                             self.get_salary_towns_levels(), self.get_vacancies_towns_levels())
+
+
+class BatchStatisticsAccumulator(StatisticsAccumulator):
+    """Класс для накопления статистики сразу по списку профессий за один проход по файлу.
+    Профессии ищутся в названии вакансии одним проходом автомата ProfessionMatcher, результат поиска
+    запоминается для каждого названия.
+
+    Attributes:
+        professions (list): Список профессий.
+        professions_sums (list): Словари сумм зарплат по годам для каждой профессии.
+        professions_counts (list): Словари числа вакансий по годам для каждой профессии.
+        matcher (ProfessionMatcher): Автомат поиска профессий в названиях вакансий.
+    """
+
+    _max_cached_names = 100000
+
+    def __init__(self, professions: list):
+        """
+        Parameters:
+            professions (list): Список профессий.
+        """
+        super().__init__(None)
+        self.professions = list(professions)
+        self.professions_sums = [{} for _ in self.professions]
+        self.professions_counts = [{} for _ in self.professions]
+        self.matcher = ProfessionMatcher(self.professions)
+        self._name_matches = {}
+
+    def add(self, name: str, salary: float, area_name: str, year: int):
+        """Учитывает одну вакансию в общих суммах и в суммах всех профессий, входящих в её название.
+
+        Parameters:
+            name (str): Название вакансии.
+            salary (float): Средняя зарплата в рублях.
+            area_name (str): Название региона вакансии.
+            year (int): Год публикации вакансии.
+        """
+        self._add_totals(salary, area_name, year)
+        matches = self._name_matches.get(name)
+        if matches is None:
+            if len(self._name_matches) >= self._max_cached_names:
+                self._name_matches.clear()
+            matches = self._name_matches[name] = self.matcher.match(name)
+        for index in matches:
+            sums = self.professions_sums[index]
+            counts = self.professions_counts[index]
+            sums[year] = sums.get(year, 0) + salary
+            counts[year] = counts.get(year, 0) + 1
+
+    def merge(self, other):
+        """Добавляет к накопленным суммам суммы другого накопителя с тем же списком профессий.
+
+        Parameters:
+            other (BatchStatisticsAccumulator): Накопитель, посчитанный по другой части данных.
+        Returns:
+            Этот же накопитель.
+        """
+        super().merge(other)
+        for index in range(len(self.professions)):
+            self._merge_dict(self.professions_sums[index], other.professions_sums[index])
+            self._merge_dict(self.professions_counts[index], other.professions_counts[index])
+        return self
+
+    def to_state(self) -> dict:
+        """Возвращает накопленные суммы вместе с суммами всех профессий в виде, пригодном для JSON."""
+        state = super().to_state()
+        state['professions'] = self.professions
+        state['professions_sums'] = [list(sums.items()) for sums in self.professions_sums]
+        state['professions_counts'] = [list(counts.items()) for counts in self.professions_counts]
+        return state
+
+    def get_accumulator(self, profession: str) -> StatisticsAccumulator:
+        """Возвращает накопитель одной профессии, разделяющий с этим накопителем общие суммы.
+
+        Parameters:
+            profession (str): Название профессии из professions.
+        Returns:
+            Объект класса StatisticsAccumulator.
+        """
+        index = self.professions.index(profession)
+        accumulator = StatisticsAccumulator(profession)
+        accumulator.total = self.total
+        accumulator.year_sums, accumulator.year_counts = self.year_sums, self.year_counts
+        accumulator.town_sums, accumulator.town_counts = self.town_sums, self.town_counts
+        accumulator.profession_sums = self.professions_sums[index]
+        accumulator.profession_counts = self.professions_counts[index]
+        return accumulator
+
+    def create_reports(self) -> dict:
+        """Создает карточки отчётов для всех профессий
+
+        Returns:
+            Словарь вида {профессия: Report}.
+        """
+        return {profession: self.get_accumulator(profession).create_report() for profession in self.professions}
+
+
+class ColumnarDataSet(DataSet):
+    """Компактное колоночное представление датасета.
+    Зарплаты и годы хранятся в массивах array, а названия, регионы и валюты - в виде целочисленных кодов словаря.
+    Поле vacancies_objects остается последовательностью объектов Vacancy, которые создаются по требованию.
+    Датасет, загруженный из кэша через from_columns, хранит колонки в numpy-массивах и доступен только для чтения.
+
+    Attributes:
+        salaries_from (array): Нижние границы окладов.
+        salaries_to (array): Верхние границы окладов.
+        salaries (array): Средние значения окладов в рублях.
+        years (array): Годы публикации.
+        months (array): Месяцы публикации вида год * 12 + (месяц - 1).
+        name_codes (array): Коды названий вакансий в names.
+        area_codes (array): Коды регионов в area_names.
+        currency_codes (array): Коды валют в currencies.
+        names (list): Словарь названий вакансий.
+        area_names (list): Словарь регионов.
+        currencies (list): Словарь валют.
+    """
+
+    def __init__(self, file_name: str):
+        """
+        Args:
+            file_name (str): имя обрабатываемого файла.
+        """
+        self.salaries_from = array('d')
+        self.salaries_to = array('d')
+        self.salaries = array('d')
+        self.years = array('H')
+        self.months = array('I')
+        self.name_codes = array('I')
+        self.area_codes = array('I')
+        self.currency_codes = array('I')
+        self.names = []
+        self.area_names = []
+        self.currencies = []
+        self.__name_index = {}
+        self.__area_index = {}
+        self.__currency_index = {}
+        super().__init__(file_name, _ColumnarVacancies(self))
+
+    @staticmethod
+    def _encode(value: str, values: list, index: dict) -> int:
+        """Возвращает код значения в словаре, добавляя значение при первом появлении."""
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(values)
+            values.append(value)
+        return code
+
+    def append(self, vacancy: Vacancy, month: int = None):
+        """Добавляет вакансию в колонки датасета.
+
+        Parameters:
+            vacancy (Vacancy): Вакансия.
+            month (int): Месяц публикации вида год * 12 + (месяц - 1), по умолчанию январь года вакансии.
+        """
+        self.salaries_from.append(vacancy.salary_from)
+        self.salaries_to.append(vacancy.salary_to)
+        self.salaries.append(vacancy.salary_middle_in_rub)
+        self.years.append(vacancy.published_at)
+        self.months.append(vacancy.published_at * 12 if month is None else month)
+        self.name_codes.append(self._encode(vacancy.name, self.names, self.__name_index))
+        self.area_codes.append(self._encode(vacancy.area_name, self.area_names, self.__area_index))
+        self.currency_codes.append(self._encode(vacancy.salary_currency, self.currencies, self.__currency_index))
+
+    def __len__(self):
+        return len(self.salaries)
+
+    def apply_rates(self, rate_index: RateIndex):
+        """Переводит зарплаты всех вакансий в рубли по курсам месяца публикации одной выборкой из rate_index.
+        Вакансии, для валюты и месяца которых курса нет, сохраняют перевод по DataSet.currency_to_rub.
+
+        Parameters:
+            rate_index (RateIndex): Помесячные курсы ЦБ.
+        """
+        if rate_index is None or len(self) == 0:
+            return
+        codes = rate_index.code_numbers(self.currencies)[np.asarray(self.currency_codes, dtype=np.uint32)]
+        rates = rate_index.rates_for_months(codes, np.asarray(self.months, dtype=np.int64))
+        middle = (np.asarray(self.salaries_from, dtype=np.float64) + np.asarray(self.salaries_to,
+                                                                                dtype=np.float64)) / 2
+        salaries = np.where(np.isnan(rates), np.asarray(self.salaries, dtype=np.float64), middle * rates)
+        if isinstance(self.salaries, array):
+            self.salaries = array('d')
+            self.salaries.frombytes(salaries.tobytes())
+        else:
+            self.salaries = salaries
+
+    def to_columns(self) -> dict:
+        """Возвращает колонки датасета в виде, пригодном для VacancyCache.store"""
+        return {'salary_from': np.asarray(self.salaries_from, dtype=np.float64),
+                'salary_to': np.asarray(self.salaries_to, dtype=np.float64),
+                'salary': np.asarray(self.salaries, dtype=np.float64),
+                'year': np.asarray(self.years, dtype=np.uint16),
+                'month': np.asarray(self.months, dtype=np.uint32),
+                'name': (np.asarray(self.name_codes, dtype=np.uint32), self.names),
+                'area_name': (np.asarray(self.area_codes, dtype=np.uint32), self.area_names),
+                'salary_currency': (np.asarray(self.currency_codes, dtype=np.uint32), self.currencies)}
+
+    @classmethod
+    def from_columns(cls, file_name: str, columns: dict):
+        """Создает датасет из колонок, полученных через VacancyCache.load
+
+        Args:
+            file_name (str): имя обрабатываемого файла.
+            columns (dict): колонки датасета.
+        Returns:
+            Объект класса ColumnarDataSet.
+        """
+        dataSet = cls(file_name)
+        dataSet.salaries_from = columns['salary_from']
+        dataSet.salaries_to = columns['salary_to']
+        dataSet.salaries = columns['salary']
+        dataSet.years = columns['year']
+        dataSet.months = columns['month']
+        dataSet.name_codes, dataSet.names = columns['name']
+        dataSet.area_codes, dataSet.area_names = columns['area_name']
+        dataSet.currency_codes, dataSet.currencies = columns['salary_currency']
+        return dataSet
+
+    def get_vacancy(self, index: int) -> Vacancy:
+        """Собирает объект Vacancy из колонок по номеру строки."""
+        vacancy = Vacancy.__new__(Vacancy)
+        vacancy.name = self.names[self.name_codes[index]]
+        vacancy.salary_from = float(self.salaries_from[index])
+        vacancy.salary_to = float(self.salaries_to[index])
+        vacancy.salary_currency = self.currencies[self.currency_codes[index]]
+        vacancy.salary_middle_in_rub = float(self.salaries[index])
+        vacancy.area_name = self.area_names[self.area_codes[index]]
+        vacancy.published_at = int(self.years[index])
+        return vacancy
+
+    @staticmethod
+    def _grouped_sums(codes: np.ndarray, salaries: np.ndarray) -> (np.ndarray, np.ndarray, np.ndarray):
+        """Векторно считает суммы и число вакансий по кодам.
+
+        Returns:
+            Коды в порядке первого появления, суммы зарплат и число вакансий для этих кодов.
+        """
+        if len(codes) == 0:
+            return codes, salaries, codes
+        unique, first_index = np.unique(codes, return_index=True)
+        unique = unique[np.argsort(first_index, kind='stable')]
+        sums = np.bincount(codes, weights=salaries)
+        counts = np.bincount(codes)
+        return unique, sums[unique], counts[unique]
+
+    def _fill_grouped(self, codes: np.ndarray, salaries: np.ndarray, sums: dict, counts: dict, decode):
+        """Записывает векторно посчитанные суммы и число вакансий по кодам в словари накопителя."""
+        for code, salary_sum, count in zip(*self._grouped_sums(codes, salaries)):
+            sums[decode(code)] = float(salary_sum)
+            counts[decode(code)] = int(count)
+
+    def _fill_accumulator(self, accumulator: StatisticsAccumulator, profession_masks: list, sums: list, counts: list):
+        """Векторно заполняет общие суммы накопителя и суммы профессий по маскам строк."""
+        salaries = np.asarray(self.salaries, dtype=np.float64)
+        years = np.asarray(self.years, dtype=np.uint16)
+        accumulator.total = len(salaries)
+        self._fill_grouped(years, salaries, accumulator.year_sums, accumulator.year_counts, int)
+        self._fill_grouped(np.asarray(self.area_codes, dtype=np.uint32), salaries, accumulator.town_sums,
+                           accumulator.town_counts, lambda code: self.area_names[code])
+        for mask, profession_sums, profession_counts in zip(profession_masks, sums, counts):
+            self._fill_grouped(years[mask], salaries[mask], profession_sums, profession_counts, int)
+
+    def create_accumulator(self, profession: str) -> StatisticsAccumulator:
+        """Векторно заполняет StatisticsAccumulator по колонкам датасета.
+
+        Parameters:
+            profession (str): Название профессии.
+        Returns:
+            Объект класса StatisticsAccumulator.
+        """
+        accumulator = StatisticsAccumulator(profession)
+        name_matches = np.array([profession in name for name in self.names], dtype=bool)
+        profession_mask = name_matches[np.asarray(self.name_codes, dtype=np.uint32)]
+        self._fill_accumulator(accumulator, [profession_mask], [accumulator.profession_sums],
+                               [accumulator.profession_counts])
+        return accumulator
+
+    def create_batch_accumulator(self, professions: list) -> BatchStatisticsAccumulator:
+        """Векторно заполняет BatchStatisticsAccumulator по колонкам датасета.
+        Каждое уникальное название вакансии проверяется автоматом ProfessionMatcher один раз.
+
+        Parameters:
+            professions (list): Список профессий.
+        Returns:
+            Объект класса BatchStatisticsAccumulator.
+        """
+        accumulator = BatchStatisticsAccumulator(professions)
+        name_matches = np.zeros((len(accumulator.professions), len(self.names)), dtype=bool)
+        for code, name in enumerate(self.names):
+            name_matches[accumulator.matcher.match(name), code] = True
+        name_codes = np.asarray(self.name_codes, dtype=np.uint32)
+        self._fill_accumulator(accumulator, [matches[name_codes] for matches in name_matches],
+                               accumulator.professions_sums, accumulator.professions_counts)
+        return accumulator
+
+
+class _ColumnarVacancies:
+    """Последовательность объектов Vacancy поверх колонок ColumnarDataSet."""
+
+    def __init__(self, dataset: ColumnarDataSet):
+        self._dataset = dataset
+
+    def __len__(self):
+        return len(self._dataset)
+
+    def __getitem__(self, index: int) -> Vacancy:
+        if index < 0:
+            index += len(self._dataset)
+        if not 0 <= index < len(self._dataset):
+            raise IndexError('vacancy index out of range')
+        return self._dataset.get_vacancy(index)
+
+    def __iter__(self):
+        for index in range(len(self._dataset)):
+            yield self._dataset.get_vacancy(index)
 
 
 class CSVParser:
@@ -123,6 +652,67 @@ class CSVParser:
                                               and not list(x).__contains__('') and list(x) != data[0], data))
             return data[0], vacancies
 
+    @staticmethod
+    def stream_dicts(file_name: str):
+        """Генератор, построчно считывающий файл и возвращающий вакансии словарями с фильтрацией csv_reader.
+        Parameters:
+            file_name (str): Имя файла.
+        Returns:
+            Генератор словарей вакансий.
+        """
+        with open(file_name, 'r', encoding="utf-8-sig") as file:
+            rows = reader(file)
+            header = next(rows, None)
+            if header is None:
+                return
+            for row in rows:
+                if len(row) == len(header) and '' not in row and row != header:
+                    yield CSVParser.convert_list_to_dict(row, header)
+
+    @staticmethod
+    def stream_vacancies(file_name: str, rate_index: RateIndex = None):
+        """Генератор, построчно считывающий файл и возвращающий вакансии по одной, без загрузки файла в память.
+        Фильтрация строк совпадает с csv_reader.
+        Parameters:
+            file_name (str): Имя файла.
+            rate_index (RateIndex): Помесячные курсы ЦБ.
+        Returns:
+            Генератор объектов Vacancy.
+        """
+        for vac_dict in CSVParser.stream_dicts(file_name):
+            yield Vacancy(vac_dict, rate_index)
+
+    @staticmethod
+    def vacancies_from_frame(frame, rate_index: RateIndex = None):
+        """Генератор, превращающий DataFrame из hh_api_requests.request_vacancies в вакансии.
+        Строки с пропусками и с валютами, которых нет в DataSet.currency_to_rub, пропускаются.
+        Parameters:
+            frame (pandas.DataFrame): Фрейм со столбцами name, salary_from, salary_to, salary_currency, area_name,
+                published_at.
+            rate_index (RateIndex): Помесячные курсы ЦБ.
+        Returns:
+            Генератор объектов Vacancy.
+        """
+        columns = ['name', 'salary_from', 'salary_to', 'salary_currency', 'area_name', 'published_at']
+        frame = frame[columns].dropna()
+        frame = frame[frame['salary_currency'].isin(list(DataSet.currency_to_rub.keys()))]
+        for row in frame.itertuples(index=False):
+            yield Vacancy(dict(zip(columns, row)), rate_index)
+
+    @staticmethod
+    def vacancies_from_rows(rows, header: list, rate_index: RateIndex = None):
+        """Генератор, превращающий строки CSV в вакансии с той же фильтрацией, что и в csv_reader.
+        Parameters:
+            rows: Итерируемый объект со строками CSV в виде списков.
+            header (list): Список столбцов CSV файла.
+            rate_index (RateIndex): Помесячные курсы ЦБ.
+        Returns:
+            Генератор объектов Vacancy.
+        """
+        for row in rows:
+            if len(row) == len(header) and '' not in row and row != header:
+                yield Vacancy(CSVParser.convert_list_to_dict(row, header), rate_index)
+
     def csv_filer(self, header_list: list, list_naming: list):
         """Данный метод преобразует список вакансий в виде подсписков в список вакансий в виде словарей
         Parameters:
@@ -156,14 +746,16 @@ class CSVParser:
         """
         raise message
 
-    def __init__(self, filename, profession):
+    def __init__(self, filename, profession, rate_index: RateIndex = None):
         """Инициализация CSV-Парсера
         Parameters:
             filename (str): Название файла
             profession (str): Имя профессии
+            rate_index (RateIndex): Помесячные курсы ЦБ, без них используется DataSet.currency_to_rub
         """
         self._profession = profession
         self.__filename = filename
+        self.__rate_index = rate_index
         self.__dataset = None
         self.__salary_dynamic = {}
         self.__vacancy_dynamic = {}
@@ -216,12 +808,62 @@ class CSVParser:
         """Получаем заголовок - список столбцов и вакансии в виде списка списков"""
         filedCsv = self.csv_filer(headerAndVacs[0], headerAndVacs[1])
         """Формируем список словарей-вакансий"""
-        vacancies_objects = list(map(lambda x: Vacancy(x), filedCsv))
+        vacancies_objects = list(map(lambda x: Vacancy(x, self.__rate_index), filedCsv))
         """Преобразуем список словарей в список Vacancy"""
         dataSet = DataSet(self.__filename, vacancies_objects)
         self.__dataset = dataSet
         return dataSet
 
+    def create_statistics_accumulator(self) -> StatisticsAccumulator:
+        """Данный метод читает файл ровно один раз, накапливая суммы и число вакансий для всей статистики отчёта.
+        Список вакансий в памяти не создается.
+
+        Returns:
+            Объект класса StatisticsAccumulator.
+        """
+        accumulator = StatisticsAccumulator(self._profession)
+        for vacancy in self.stream_vacancies(self.__filename, self.__rate_index):
+            accumulator.add_vacancy(vacancy)
+        return accumulator
+
+    def create_batch_accumulator(self, professions: list) -> BatchStatisticsAccumulator:
+        """Данный метод читает файл ровно один раз, накапливая статистику сразу для списка профессий.
+
+        Parameters:
+            professions (list): Список профессий.
+        Returns:
+            Объект класса BatchStatisticsAccumulator.
+        """
+        accumulator = BatchStatisticsAccumulator(professions)
+        for vacancy in self.stream_vacancies(self.__filename, self.__rate_index):
+            accumulator.add_vacancy(vacancy)
+        return accumulator
+
+    def create_columnar_dataset(self, cache: VacancyCache = None) -> ColumnarDataSet:
+        """Данный метод создает компактный колоночный датасет, читая файл построчно.
+        Если передан кэш, колонки берутся из него, а после разбора файла сохраняются в него.
+
+        Parameters:
+            cache (VacancyCache): Дисковый кэш разобранных файлов.
+        Returns:
+            Объект класса ColumnarDataSet.
+        """
+        # В кэше зарплаты переведены по статической таблице, курсы ЦБ применяются после загрузки,
+        # поэтому одна запись кэша годится для любых курсов
+        kind = 'statistics_creator-months'
+        columns = cache.load(self.__filename, kind) if cache is not None else None
+        if columns is not None:
+            dataSet = ColumnarDataSet.from_columns(self.__filename, columns)
+        else:
+            dataSet = ColumnarDataSet(self.__filename)
+            for vac_dict in self.stream_dicts(self.__filename):
+                dataSet.append(Vacancy(vac_dict), RateIndex.month_number(vac_dict['published_at']))
+            if cache is not None:
+                cache.store(self.__filename, kind, dataSet.to_columns())
+        dataSet.apply_rates(self.__rate_index)
+        self.__dataset = dataSet
+        return dataSet
+
     def get_salary_dynamic_by_year(self) -> dict:
         """Данный метод создает словарь динамики зарплат по годам вида {год: средняя зарплата}
 
@@ -259,8 +901,8 @@ class CSVParser:
         filtered = list(
             filter(lambda x: x.name.__contains__(self._profession), self.__dataset.vacancies_objects))
         """Создаем словари по годовому распределению из общих данных (забираем ключи-года)"""
-        self.__salary_profession_dynamic = dict(zip(self.__salary_dynamic.keys(), [0]))
-        self.__vacancy_profession_dynamic = dict(zip(self.__salary_dynamic.keys(), [0]))
+        self.__salary_profession_dynamic = dict.fromkeys(self.__salary_dynamic.keys(), 0)
+        self.__vacancy_profession_dynamic = dict.fromkeys(self.__salary_dynamic.keys(), 0)
 
         """Заполняем словари __salary_profession_dynamic и __vacancy_profession_dynamic"""
         for vacancy in filtered:
@@ -330,7 +972,7 @@ class ConsoleInput:
 
 
 def create_report_card(isConsoleInput: bool, file_name = None, profession_name = None,
-                       results= []) -> report.Report:
+                       results= [], streaming=False, columnar=False, cache=None, rate_index=None) -> report.Report:
     """Метод, создающий карточку отчёта класса Report
 
     Arguments:
@@ -338,6 +980,10 @@ def create_report_card(isConsoleInput: bool, file_name = None, profession_name =
         file_name(str): имя файла если не нужно вводить с консоли
         profession_name(str): название профессии
         results(list): quick hack для мультитрединга
+        streaming(bool): считать статистику за один проход по файлу, не загружая его в память
+        columnar(bool): считать статистику векторно по колоночному датасету
+        cache(VacancyCache): дисковый кэш разобранных файлов, включает колоночный режим
+        rate_index(RateIndex): помесячные курсы ЦБ для перевода зарплат в рубли
 
     Returns:
         Объект класса Report с готовыми данными для статистики.
@@ -345,7 +991,15 @@ def create_report_card(isConsoleInput: bool, file_name = None, profession_name =
     if isConsoleInput:
         file_name = input("Введите название файла: ")
         profession_name = input("Введите название профессии: ")
-    csvParser = CSVParser(filename=file_name, profession=profession_name)
+    csvParser = CSVParser(filename=file_name, profession=profession_name, rate_index=rate_index)
+    if streaming or columnar or cache is not None:
+        if columnar or cache is not None:
+            accumulator = csvParser.create_columnar_dataset(cache).create_accumulator(profession_name)
+        else:
+            accumulator = csvParser.create_statistics_accumulator()
+        result = accumulator.create_report()
+        results.append(result)
+        return result
     csvParser.createDataSet()
     salary_dynamic_by_year = csvParser.get_salary_dynamic_by_year()
     vacancy_dynamic_by_year = csvParser.get_vacancy_dynamic_by_year()
@@ -362,6 +1016,63 @@ def create_report_card(isConsoleInput: bool, file_name = None, profession_name =
     return result
 
 
+def create_report_cards(file_name: str, professions: list, cache=None, rate_index=None) -> dict:
+    """Метод, создающий карточки отчётов сразу для списка профессий за один проход по данным
+
+    Arguments:
+        file_name(str): имя файла
+        professions(list): список профессий
+        cache(VacancyCache): дисковый кэш разобранных файлов, включает колоночный режим
+        rate_index(RateIndex): помесячные курсы ЦБ для перевода зарплат в рубли
+
+    Returns:
+        Словарь вида {профессия: Report}.
+    """
+    csvParser = CSVParser(filename=file_name, profession=None, rate_index=rate_index)
+    if cache is not None:
+        return csvParser.create_columnar_dataset(cache).create_batch_accumulator(professions).create_reports()
+    return csvParser.create_batch_accumulator(professions).create_reports()
+
+
+def update_statistics_state(state_file: str, source, professions=None, rate_index=None) -> StatisticsAccumulator:
+    """Метод, дописывающий новые вакансии в сохранённое состояние статистики.
+    Время работы пропорционально числу новых вакансий, а не всей истории.
+
+    Arguments:
+        state_file(str): имя JSON файла состояния, создается при первом запуске
+        source: имя CSV файла с новыми вакансиями или DataFrame из hh_api_requests.request_vacancies
+        professions: профессия или список профессий; обязательны при создании нового состояния, для
+            сохранённого состояния могут не указываться, а указанные должны совпадать с сохранёнными
+        rate_index(RateIndex): помесячные курсы ЦБ для перевода зарплат в рубли
+
+    Returns:
+        Обновлённый накопитель, отчёт получается через create_report или create_reports.
+
+    Raises:
+        ValueError: если профессии не указаны для нового состояния или не совпадают с сохранёнными.
+    """
+    if os.path.exists(state_file):
+        accumulator = StatisticsAccumulator.load(state_file)
+        saved = accumulator.professions if isinstance(accumulator, BatchStatisticsAccumulator) \
+            else accumulator.profession
+        if professions is not None and professions != saved:
+            raise ValueError(f'Состояние {state_file} сохранено для профессий {saved}, а не {professions}')
+    elif professions is None:
+        raise ValueError('Для нового состояния статистики нужно указать профессию')
+    elif isinstance(professions, list):
+        accumulator = BatchStatisticsAccumulator(professions)
+    else:
+        accumulator = StatisticsAccumulator(professions)
+    if isinstance(source, str):
+        vacancies = CSVParser.stream_vacancies(source, rate_index)
+    else:
+        vacancies = CSVParser.vacancies_from_frame(source, rate_index)
+    for vacancy in vacancies:
+        accumulator.add_vacancy(vacancy)
+    accumulator.save(state_file)
+    return accumulator
+
+
 def generate_statistics():
     """Метод, генерирующий Excel файл, графики и pdf файл со статистикой из полученных данных в ходе
     работы create_report_card
@@ -369,7 +1080,7 @@ def generate_statistics():
     import cProfile
     profiler = cProfile.Profile()
     profiler.enable()
-    reportCard = create_report_card(True)
+    reportCard = create_report_card(True, cache=VacancyCache())
     profiler.disable()
     profiler.dump_stats("example.stats")
     import pstats
@@ -384,4 +1095,5 @@ def generate_statistics():
     # генерация pdf'ки
     reportCard.generate_pdf()
 
-generate_statistics()
\ No newline at end of file
+if __name__ == '__main__':
+    generate_statistics()
\ No newline at end of file
@@ -0,0 +1,187 @@
+import csv
+import os
+import random
+import tempfile
+import unittest
+import pandas as pd
+from profession_matcher import ProfessionMatcher
+from statistics_creator import CSVParser, StatisticsAccumulator, update_statistics_state
+
+_header = ['name', 'salary_from', 'salary_to', 'salary_currency', 'area_name', 'published_at']
+_names = ['Программист', 'Старший программист', 'Программист Python', 'Менеджер', 'Аналитик\nданных', 'Тестировщик']
+_towns = ['Москва', 'Санкт-Петербург', 'Екатеринбург', 'Казань', 'Новосибирск', 'Кибердянск']
+_currencies = ['RUR', 'RUR', 'RUR', 'USD', 'EUR', 'KZT']
+
+
+def write_vacancies_csv(file_name: str, count: int, seed=0):
+    """Записывает CSV файл со случайными вакансиями, включая строки с пустыми полями."""
+    rnd = random.Random(seed)
+    with open(file_name, 'w', encoding='utf-8-sig', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(_header)
+        for i in range(count):
+            salary_from = rnd.randint(10, 200) * 1000
+            row = [rnd.choice(_names), salary_from, salary_from + rnd.randint(0, 50) * 1000,
+                   rnd.choice(_currencies), rnd.choices(_towns, weights=[50, 30, 10, 5, 4, 1])[0],
+                   f'{rnd.randint(2007, 2022)}-0{rnd.randint(1, 9)}-1{rnd.randint(0, 9)}T10:00:00+0300']
+            if i % 17 == 0:
+                row[rnd.randint(0, 5)] = ''
+            writer.writerow(row)
+
+
+def legacy_statistics(file_name: str, profession: str):
+    """Статистика, посчитанная через список объектов Vacancy."""
+    parser = CSVParser(file_name, profession)
+    parser.createDataSet()
+    return (parser.get_salary_dynamic_by_year(), parser.get_vacancy_dynamic_by_year(),
+            parser.get_salary_dynamic_profession(), parser.get_vacancy_dynamic_profession(),
+            parser.get_salary_towns_levels(), parser.get_vacancies_towns_levels())
+
+
+def accumulated_statistics(accumulator: StatisticsAccumulator):
+    return (accumulator.get_salary_dynamic_by_year(), accumulator.get_vacancy_dynamic_by_year(),
+            accumulator.get_salary_dynamic_profession(), accumulator.get_vacancy_dynamic_profession(),
+            accumulator.get_salary_towns_levels(), accumulator.get_vacancies_towns_levels())
+
+
+class VacanciesFileTest(unittest.TestCase):
+    """Общий для класса тестов CSV файл со случайными вакансиями во временной папке."""
+    count = 3000
+    seed = 0
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.file_name = os.path.join(cls.directory.name, 'vacancies.csv')
+        write_vacancies_csv(cls.file_name, cls.count, cls.seed)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+
+class StreamingStatisticsTest(VacanciesFileTest):
+
+    def test_stream_skips_incomplete_rows(self):
+        streamed = list(CSVParser.stream_vacancies(self.file_name))
+        self.assertEqual(len(streamed), len(CSVParser.csv_reader(self.file_name)[1]))
+
+    def test_same_statistics(self):
+        accumulator = CSVParser(self.file_name, 'Программист').create_statistics_accumulator()
+        self.assertEqual(accumulated_statistics(accumulator), legacy_statistics(self.file_name, 'Программист'))
+
+    def test_dict_order(self):
+        accumulator = CSVParser(self.file_name, 'Программист').create_statistics_accumulator()
+        for streamed, legacy in zip(accumulated_statistics(accumulator),
+                                    legacy_statistics(self.file_name, 'Программист')):
+            self.assertEqual(list(streamed.keys()), list(legacy.keys()))
+
+    def test_missing_profession(self):
+        accumulator = CSVParser(self.file_name, 'Водитель').create_statistics_accumulator()
+        self.assertEqual(set(accumulator.get_salary_dynamic_profession().values()), {0})
+        self.assertEqual(set(accumulator.get_vacancy_dynamic_profession().values()), {0})
+
+
+class ColumnarDataSetTest(VacanciesFileTest):
+    seed = 1
+
+    def test_vacancies_objects(self):
+        columnar = CSVParser(self.file_name, 'Программист').create_columnar_dataset()
+        legacy = CSVParser(self.file_name, 'Программист').createDataSet()
+        self.assertEqual(len(columnar.vacancies_objects), len(legacy.vacancies_objects))
+        self.assertEqual(columnar.vacancies_objects[-1].name, legacy.vacancies_objects[-1].name)
+        for new, old in zip(columnar.vacancies_objects, legacy.vacancies_objects):
+            self.assertEqual((new.name, new.salary_middle_in_rub, new.area_name, new.published_at),
+                             (old.name, old.salary_middle_in_rub, old.area_name, old.published_at))
+
+    def test_same_statistics(self):
+        accumulator = CSVParser(self.file_name, 'Программист').create_columnar_dataset() \
+            .create_accumulator('Программист')
+        self.assertEqual(accumulated_statistics(accumulator), legacy_statistics(self.file_name, 'Программист'))
+
+    def test_legacy_getters(self):
+        parser = CSVParser(self.file_name, 'Программист')
+        parser.create_columnar_dataset()
+        self.assertEqual(parser.get_salary_dynamic_by_year(),
+                         legacy_statistics(self.file_name, 'Программист')[0])
+
+
+class BatchStatisticsTest(VacanciesFileTest):
+    seed = 5
+    professions = ['Программист', 'программист', 'Python', 'Аналитик', 'Водитель']
+
+    def test_matcher(self):
+        matcher = ProfessionMatcher(['he', 'she', 'his', 'hers'])
+        self.assertEqual(matcher.match_names('ushers'), ['he', 'she', 'hers'])
+        self.assertEqual(matcher.match('ahishe'), [0, 1, 2])
+        self.assertEqual(ProfessionMatcher(['ПРОГ'], case_sensitive=False).match('Старший программист'), [0])
+
+    def test_same_statistics(self):
+        batch = CSVParser(self.file_name, None).create_batch_accumulator(self.professions)
+        for profession in self.professions:
+            self.assertEqual(accumulated_statistics(batch.get_accumulator(profession)),
+                             legacy_statistics(self.file_name, profession))
+
+    def test_columnar(self):
+        batch = CSVParser(self.file_name, None).create_columnar_dataset().create_batch_accumulator(self.professions)
+        for profession in self.professions:
+            self.assertEqual(accumulated_statistics(batch.get_accumulator(profession)),
+                             legacy_statistics(self.file_name, profession))
+
+    def test_merge(self):
+        batch = CSVParser(self.file_name, None).create_batch_accumulator(self.professions)
+        merged = CSVParser(self.file_name, None).create_batch_accumulator(self.professions).merge(batch)
+        self.assertEqual(merged.get_accumulator('Python').get_salary_dynamic_profession(),
+                         batch.get_accumulator('Python').get_salary_dynamic_profession())
+        self.assertEqual(set(merged.create_reports().keys()), set(self.professions))
+
+
+class StatisticsStateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.state_file = os.path.join(self.directory.name, 'state.json')
+        self.full = os.path.join(self.directory.name, 'full.csv')
+        write_vacancies_csv(self.full, 2000, seed=6)
+        with open(self.full, 'r', encoding='utf-8-sig', newline='') as file:
+            rows = list(csv.reader(file))
+        self.parts = []
+        for number, part in enumerate((rows[1:1200], rows[1200:])):
+            self.parts.append(os.path.join(self.directory.name, f'part{number}.csv'))
+            with open(self.parts[-1], 'w', encoding='utf-8-sig', newline='') as file:
+                csv.writer(file).writerows([rows[0]] + part)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_append_csv(self):
+        update_statistics_state(self.state_file, self.parts[0], 'Программист')
+        accumulator = update_statistics_state(self.state_file, self.parts[1])
+        self.assertEqual(accumulated_statistics(accumulator), legacy_statistics(self.full, 'Программист'))
+        self.assertEqual(accumulated_statistics(StatisticsAccumulator.load(self.state_file)),
+                         accumulated_statistics(accumulator))
+
+    def test_append_frame(self):
+        update_statistics_state(self.state_file, self.parts[0], ['Программист', 'Python'])
+        frame = pd.read_csv(self.parts[1], encoding='utf-8-sig')
+        accumulator = update_statistics_state(self.state_file, frame)
+        self.assertEqual(accumulated_statistics(accumulator.get_accumulator('Python')),
+                         legacy_statistics(self.full, 'Python'))
+
+    def test_professions_must_match_state(self):
+        update_statistics_state(self.state_file, self.parts[0], ['Программист', 'Python'])
+        accumulator = update_statistics_state(self.state_file, self.parts[1], ['Программист', 'Python'])
+        self.assertEqual(accumulated_statistics(accumulator.get_accumulator('Python')),
+                         legacy_statistics(self.full, 'Python'))
+        with self.assertRaises(ValueError):
+            update_statistics_state(self.state_file, self.parts[1], ['Python'])
+        with self.assertRaises(ValueError):
+            update_statistics_state(self.state_file, self.parts[1], 'Программист')
+
+    def test_new_state_needs_profession(self):
+        with self.assertRaises(ValueError):
+            update_statistics_state(self.state_file, self.parts[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
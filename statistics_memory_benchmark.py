@@ -0,0 +1,59 @@
+"""
+Замер памяти для списка объектов Vacancy и колоночного ColumnarDataSet из statistics_creator.
+"""
+import random
+import sys
+import tracemalloc
+from statistics_creator import ColumnarDataSet, DataSet, Vacancy
+
+
+class DictVacancy(Vacancy):
+    """Вакансия с __dict__ у каждого объекта, как до введения __slots__."""
+
+
+def generate_rows(count: int, seed=0):
+    """Генерирует словари вакансий, похожие на строки выгрузки: строки у каждой вакансии свои, как после csv.reader."""
+    rnd = random.Random(seed)
+    names = [f'Программист {i}' for i in range(2000)] + [f'Менеджер {i}' for i in range(2000)]
+    towns = [f'Город {i}' for i in range(300)]
+    currencies = list(DataSet.currency_to_rub.keys())
+    for _ in range(count):
+        salary_from = rnd.randint(10, 300) * 1000
+        yield {'name': ''.join(rnd.choice(names)), 'salary_from': str(salary_from),
+               'salary_to': str(salary_from + rnd.randint(0, 100) * 1000),
+               'salary_currency': rnd.choice(currencies), 'area_name': ''.join(rnd.choice(towns)),
+               'published_at': f'{rnd.randint(2003, 2022)}-05-10T10:00:00+0300'}
+
+
+def measure(build, count: int):
+    """Возвращает число байт на вакансию, занятых построенным хранилищем."""
+    tracemalloc.start()
+    store = build(generate_rows(count))
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del store
+    return size / count
+
+
+def build_dict_list(rows):
+    return [DictVacancy(row) for row in rows]
+
+
+def build_slots_list(rows):
+    return [Vacancy(row) for row in rows]
+
+
+def build_columnar(rows):
+    dataset = ColumnarDataSet('benchmark')
+    for row in rows:
+        dataset.append(Vacancy(row))
+    return dataset
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    print(f'Вакансий: {count}')
+    for title, build in (('Список Vacancy с __dict__', build_dict_list),
+                         ('Список Vacancy с __slots__', build_slots_list),
+                         ('ColumnarDataSet', build_columnar)):
+        print(f'{title:28} {measure(build, count):8.1f} байт/вакансия')
@@ -5,6 +5,9 @@ from typing import Dict, Any, Pattern
 from prettytable import PrettyTable
 import prettytable
 from datetime import datetime
+import numpy as np
+from vacancy_cache import VacancyCache, encode_strings
+from currency_rate_index import RateIndex
 import unittest
 import doctest
 
@@ -202,6 +205,8 @@ class CSVParser:
         "UZS": 0.0055,
     }
 
+    __rate_index: RateIndex = None
+
     __cleaner: Pattern[str] = re.compile('<.*?>')
 
     __date_format: str = '%d.%m.%Y'
@@ -550,6 +555,41 @@ class CSVParser:
             vacancies_objects.sort(key=lambda x: x.__dict__[paramName], reverse=isSortReversed)
             return vacancies_objects
 
+    def rub_rates(self, vacancies_objects: list) -> list:
+        """
+        Возвращает курсы валют окладов к рублю для всего списка: по месяцу публикации одной выборкой
+        из курсов ЦБ, если они переданы парсеру, а где курса нет - из статической таблицы.
+
+        Parameters:
+            vacancies_objects (list): Список вакансий.
+
+        Returns:
+            list: Курсы за единицу валюты в порядке вакансий
+        """
+        currencies = [vacancy.salary.__dict__['salary_currency'] for vacancy in vacancies_objects]
+        rates = [self.__currency_to_rub[currency] for currency in currencies]
+        if self.__rate_index is None:
+            return rates
+        index_rates = self.__rate_index.rates_for(currencies, [vacancy.published_at for vacancy in vacancies_objects])
+        return np.where(np.isnan(index_rates), rates, index_rates).tolist()
+
+    @staticmethod
+    def sort_by_keys(vacancies_objects: list, keys: list, isSortReversed: bool) -> list:
+        """
+        Сортирует список вакансий на месте по заранее посчитанным ключам, как list.sort.
+
+        Parameters:
+            vacancies_objects (list): Список вакансий.
+            keys (list): Ключи сортировки в порядке вакансий.
+            isSortReversed (bool): Определяет, совершать ли обратную сортировку.
+
+        Returns:
+            list: Отсортированный список
+        """
+        order = sorted(range(len(vacancies_objects)), key=keys.__getitem__, reverse=isSortReversed)
+        vacancies_objects[:] = [vacancies_objects[index] for index in order]
+        return vacancies_objects
+
     def sort_by_salary(self, vacancies_objects: list, paramName: str, isSortReversed: bool) -> list:
         """
         Сортирует список вакансий по вилке оклада.
@@ -562,11 +602,9 @@ class CSVParser:
         Returns:
             list: Отсортированный список
         """
-        vacancies_objects.sort(key=lambda x: float(
-            (float(x.salary.__dict__['salary_from']) + float(x.salary.__dict__['salary_to'])) * float(
-                self.__currency_to_rub[x.salary.__dict__['salary_currency']]) / 2),
-                               reverse=isSortReversed)
-        return vacancies_objects
+        keys = [(float(x.salary.__dict__['salary_from']) + float(x.salary.__dict__['salary_to'])) * rate / 2
+                for x, rate in zip(vacancies_objects, self.rub_rates(vacancies_objects))]
+        return self.sort_by_keys(vacancies_objects, keys, isSortReversed)
 
     def sort_by_salary_param(self, vacancies_objects: list, paramName: str, isSortReversed=False) -> list:
         """
@@ -583,10 +621,9 @@ class CSVParser:
         if not vacancies_objects[0].salary.__dict__.__contains__(paramName):
             self.throwError("Параметр сортировки некорректен")
         else:
-            vacancies_objects.sort(key=lambda x: float(x.salary.__dict__[paramName])
-                                                 * self.__currency_to_rub[x.salary.__dict__['salary_currency']],
-                                   reverse=isSortReversed)
-            return vacancies_objects
+            keys = [float(x.salary.__dict__[paramName]) * rate
+                    for x, rate in zip(vacancies_objects, self.rub_rates(vacancies_objects))]
+            return self.sort_by_keys(vacancies_objects, keys, isSortReversed)
 
     def sort_by_listCount(self, vacancies_objects: list, paramName: str, isSortReversed=False) -> list:
         """
@@ -664,8 +701,15 @@ class CSVParser:
         self.__sortFuncDict = self.__sortFuncDict
 
 
-    def __init__(self):
-        """Пустой __init__ для ручного ввода"""
+    def __init__(self, cache: VacancyCache = None, rate_index: RateIndex = None):
+        """Пустой __init__ для ручного ввода
+
+        Parameters:
+            cache (VacancyCache): Дисковый кэш разобранных файлов.
+            rate_index (RateIndex): Помесячные курсы ЦБ для сортировки по окладу в рублях.
+        """
+        self.__cache = cache
+        self.__rate_index = rate_index
         self.__filename = None
         self.__filterParam = None
         self.__sortParam = None
@@ -738,12 +782,83 @@ class CSVParser:
             Returns:
                 DataSet: Новый датасет
         """
-        headerAndVacs = self.csv_reader(self.__filename)
-        filedCsv = self.csv_filer(headerAndVacs[0], headerAndVacs[1])
+        filedCsv = self.load_cached_vacancies()
+        if filedCsv is None:
+            headerAndVacs = self.csv_reader(self.__filename)
+            filedCsv = self.csv_filer(headerAndVacs[0], headerAndVacs[1])
+            self.store_cached_vacancies(filedCsv)
         vacancies_objects = list(map(lambda x: Vacancy(x), filedCsv))
         dataSet = DataSet(self.__filename, vacancies_objects)
         return dataSet
 
+    def store_cached_vacancies(self, filedCsv: list):
+        """Сохраняет очищенные вакансии в кэш типизированными колонками: числа без потери записи - float64,
+        True/False - bool, остальные строки - словарём. У колонок со списками рядом хранятся границы списков
+        (<колонка>.offsets) и признак списка (<колонка>.is_list), сами элементы кодируются словарём.
+
+            Parameters:
+                filedCsv (list): Список словарей-вакансий после csv_filer.
+        """
+        if self.__cache is None or len(filedCsv) == 0:
+            return
+        columns = {}
+        for key in filedCsv[0]:
+            values = [row[key] for row in filedCsv]
+            is_list = np.fromiter((isinstance(value, list) for value in values), dtype=bool, count=len(values))
+            if is_list.any():
+                items = [value if isinstance(value, list) else [value] for value in values]
+                columns[key] = encode_strings(item for value in items for item in value)
+                columns[f'{key}.offsets'] = np.cumsum([0] + [len(value) for value in items], dtype=np.int64)
+                columns[f'{key}.is_list'] = is_list
+            elif all(value in ('True', 'False') for value in values):
+                columns[key] = np.array([value == 'True' for value in values], dtype=bool)
+            elif self.is_lossless_float(values):
+                columns[key] = np.array(values, dtype=np.float64)
+            else:
+                columns[key] = encode_strings(values)
+        self.__cache.store(self.__filename, 'table_creator-typed', columns)
+
+    @staticmethod
+    def is_lossless_float(values: list) -> bool:
+        """Проверяет, что строки - числа, которые восстанавливаются из float без изменения записи.
+
+            Parameters:
+                values (list): Строковые значения колонки.
+            Returns:
+                bool: True, если колонку можно хранить как float64.
+        """
+        try:
+            return all(str(float(value)) == value for value in values)
+        except (TypeError, ValueError):
+            return False
+
+    def load_cached_vacancies(self):
+        """Загружает очищенные вакансии из кэша.
+
+            Returns:
+                Список словарей-вакансий или None, если в кэше их нет.
+        """
+        columns = self.__cache.load(self.__filename, 'table_creator-typed') if self.__cache is not None else None
+        if columns is None:
+            return None
+        decoded = {}
+        for key, column in columns.items():
+            if key.endswith('.offsets') or key.endswith('.is_list'):
+                continue
+            if isinstance(column, tuple):
+                codes, values = column
+                items = [values[code] for code in codes.tolist()]
+            elif column.dtype == bool:
+                items = ['True' if value else 'False' for value in column.tolist()]
+            else:
+                items = [str(value) for value in column.tolist()]
+            if f'{key}.offsets' in columns:
+                offsets = columns[f'{key}.offsets'].tolist()
+                items = [items[offsets[i]:offsets[i + 1]] if is_list else items[offsets[i]]
+                         for i, is_list in enumerate(columns[f'{key}.is_list'].tolist())]
+            decoded[key] = items
+        return [dict(zip(decoded, row)) for row in zip(*decoded.values())]
+
 
 class InputCorrect:
 
@@ -784,10 +899,10 @@ class InputCorrect:
 
 def create_table():
     """Создает табличку из ввода и печатает её на экран"""
-    parser = CSVParser().create_csv_parser_from_input()
+    parser = CSVParser(cache=VacancyCache()).create_csv_parser_from_input()
     print(parser.get_parsed_table())
 
 
 if __name__ == '__main__':
-    csvParser = CSVParser().create_csv_parser_from_input()
+    csvParser = CSVParser(cache=VacancyCache()).create_csv_parser_from_input()
     print(csvParser.get_parsed_table())
@@ -1,6 +1,12 @@
+import csv
+import os
+import tempfile
 import unittest
+import numpy as np
+from table_creator import CSVParser
 from table_creator import Salary
 from table_creator import Vacancy
+from vacancy_cache import VacancyCache
 
 
 class SalaryTest(unittest.TestCase):
@@ -40,5 +46,41 @@ class VacancyTest(unittest.TestCase):
     def test_type(self):
         self.assertEqual(type(self.testcase).__name__, 'Vacancy')
 
+
+class CachedVacanciesTest(unittest.TestCase):
+    header = ['name', 'description', 'key_skills', 'experience_id', 'premium', 'employer_name', 'salary_from',
+              'salary_to', 'salary_gross', 'salary_currency', 'area_name', 'published_at']
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.directory.name, 'vacancies.csv')
+        with open(self.file_name, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(self.header)
+            for number in range(30):
+                skills = '\n'.join(f'Навык {skill}' for skill in range(number % 4 + 1))
+                writer.writerow([f'Программист {number % 5}', 'Первая строка\nВторая' if number % 7 == 0 else 'Опис',
+                                 skills, 'between1And3', 'False' if number % 2 else 'True', 'Компания',
+                                 f'{1000.0 * number}', '100000' if number % 3 == 0 else f'{2000.0 * number}', 'True',
+                                 'RUR', 'Москва', f'2022-07-{number % 28 + 1:02d}T10:00:00+0300'])
+        self.parser = CSVParser(cache=VacancyCache(os.path.join(self.directory.name, 'cache')))
+        self.parser._CSVParser__filename = self.file_name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_typed_round_trip(self):
+        header, vacancies = self.parser.csv_reader(self.file_name)
+        expected = self.parser.csv_filer(header, vacancies)
+        self.parser.store_cached_vacancies(expected)
+        self.assertEqual(self.parser.load_cached_vacancies(), expected)
+        columns = VacancyCache(os.path.join(self.directory.name, 'cache')).load(self.file_name,
+                                                                                 'table_creator-typed')
+        self.assertEqual(columns['salary_from'].dtype, np.float64)
+        self.assertEqual(columns['premium'].dtype, bool)
+        self.assertIsInstance(columns['salary_to'], tuple)
+        self.assertEqual(columns['key_skills.offsets'][-1], sum(number % 4 + 1 for number in range(30)))
+
+
 if __name__ == '__main__':
     unittest.main()
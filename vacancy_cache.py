@@ -0,0 +1,197 @@
+"""
+Модуль дискового кэша разобранных вакансий в бинарном колоночном виде.
+
+Каждая запись кэша - это папка с файлами .npy для числовых колонок, кодами и словарями значений для строковых колонок
+и файлом manifest.json. Запись привязана к пути, размеру, времени изменения и хэшу содержимого исходного файла и
+удаляется, как только исходный файл меняется.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+
+_sample_size = 1024 * 1024
+_manifest_name = 'manifest.json'
+
+
+def fingerprint(file_name: str) -> dict:
+    """
+    Получает отпечаток исходного файла
+
+    Хэш считается по размеру файла и трём блокам по 1 МБ (начало, середина и конец), поэтому не требует
+    чтения всего файла.
+
+    :param file_name: имя файла
+    :return: словарь с путём, размером, временем изменения и хэшем содержимого
+    """
+    stat = os.stat(file_name)
+    digest = hashlib.blake2b(str(stat.st_size).encode(), digest_size=16)
+    offsets = {0, max(stat.st_size // 2 - _sample_size // 2, 0), max(stat.st_size - _sample_size, 0)}
+    with open(file_name, 'rb') as file:
+        for offset in sorted(offsets):
+            file.seek(offset)
+            digest.update(file.read(_sample_size))
+    return {'path': os.path.abspath(file_name), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'hash': digest.hexdigest()}
+
+
+def encode_strings(values) -> (np.ndarray, list):
+    """
+    Кодирует строковую колонку словарём
+
+    :param values: итерируемый объект со строками
+    :return: массив кодов и список уникальных значений в порядке первого появления
+    """
+    index = {}
+    codes = np.fromiter((index.setdefault(value, len(index)) for value in values), dtype=np.int32)
+    return codes, list(index)
+
+
+class VacancyCache:
+    """Кэш колонок разобранных файлов вакансий с ограничением на общий размер папки кэша.
+
+    Attributes:
+        cache_dir (str): Папка кэша.
+        max_size (int): Максимальный размер папки кэша в байтах. При превышении удаляются давно не использованные
+            записи.
+    """
+
+    def __init__(self, cache_dir='.vacancy_cache', max_size=2 * 1024 ** 3):
+        """
+        Parameters:
+            cache_dir (str): Папка кэша.
+            max_size (int): Максимальный размер папки кэша в байтах.
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def _entry_dir(self, file_name: str, kind: str) -> str:
+        """Возвращает папку записи кэша для файла и вида разбора."""
+        key = hashlib.sha1(f'{os.path.abspath(file_name)}\n{kind}'.encode()).hexdigest()
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, file_name: str, kind: str):
+        """
+        Загружает колонки из кэша. Числовые колонки отображаются в память через mmap.
+
+        :param file_name: имя исходного файла
+        :param kind: вид разбора, например 'statistics_creator'
+        :return: словарь колонок или None, если записи нет или исходный файл изменился.
+            Строковые колонки возвращаются кортежем (массив кодов, список значений).
+        """
+        entry = self._entry_dir(file_name, kind)
+        manifest_path = os.path.join(entry, _manifest_name)
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(file_name) or manifest['fingerprint'] != fingerprint(file_name):
+            shutil.rmtree(entry, ignore_errors=True)
+            return None
+        columns = {}
+        for name, column in manifest['columns'].items():
+            data = np.load(os.path.join(entry, column['file']), mmap_mode='r')
+            if column['type'] == 'dictionary':
+                with open(os.path.join(entry, column['values']), 'r', encoding='utf-8') as file:
+                    data = (data, json.load(file))
+            columns[name] = data
+        os.utime(manifest_path)
+        return columns
+
+    def store(self, file_name: str, kind: str, columns: dict):
+        """
+        Сохраняет колонки в кэш и освобождает место, если папка кэша превысила max_size
+
+        :param file_name: имя исходного файла
+        :param kind: вид разбора
+        :param columns: словарь колонок: numpy-массивы или кортежи (массив кодов, список значений)
+        :return: None
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        source = fingerprint(file_name)
+        entry = self._entry_dir(file_name, kind)
+        staging = tempfile.mkdtemp(dir=self.cache_dir, prefix='.staging-')
+        manifest = {'fingerprint': source, 'kind': kind, 'columns': {}}
+        for number, (name, data) in enumerate(columns.items()):
+            column = {'file': f'{number}.npy', 'type': 'array'}
+            if isinstance(data, tuple):
+                data, values = data
+                column.update({'type': 'dictionary', 'values': f'{number}.json'})
+                with open(os.path.join(staging, column['values']), 'w', encoding='utf-8') as file:
+                    json.dump(values, file, ensure_ascii=False)
+            np.save(os.path.join(staging, column['file']), np.ascontiguousarray(data))
+            manifest['columns'][name] = column
+        with open(os.path.join(staging, _manifest_name), 'w', encoding='utf-8') as file:
+            json.dump(manifest, file, ensure_ascii=False)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(staging, entry)
+        self.evict(keep=entry)
+
+    def evict(self, keep=None):
+        """
+        Удаляет давно не использованные записи, пока размер папки кэша больше max_size
+
+        :param keep: папка записи, которую удалять нельзя
+        :return: None
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            entry = os.path.join(self.cache_dir, name)
+            manifest_path = os.path.join(entry, _manifest_name)
+            if not os.path.isfile(manifest_path):
+                if name.startswith('.staging-') and time.time() - os.path.getmtime(entry) > 3600:
+                    shutil.rmtree(entry, ignore_errors=True)
+                continue
+            size = sum(os.path.getsize(os.path.join(entry, file)) for file in os.listdir(entry))
+            entries.append((os.path.getmtime(manifest_path), size, entry))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_size:
+                break
+            if entry == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+
+def frame_to_columns(frame) -> dict:
+    """
+    Преобразует DataFrame в колонки для VacancyCache.store. Строковые колонки кодируются словарём, пропуски
+    получают код -1.
+
+    :param frame: pandas DataFrame
+    :return: словарь колонок
+    """
+    import pandas as pd
+    columns = {}
+    for name in frame.columns:
+        series = frame[name]
+        if pd.api.types.is_numeric_dtype(series.dtype):
+            columns[name] = series.to_numpy()
+        else:
+            codes, uniques = pd.factorize(series)
+            columns[name] = (codes.astype(np.int32), [str(value) for value in uniques])
+    return columns
+
+
+def columns_to_frame(columns: dict):
+    """
+    Собирает DataFrame из колонок, полученных через VacancyCache.load. Строковые колонки восстанавливаются
+    с типом object и NaN на месте пропусков.
+
+    :param columns: словарь колонок
+    :return: pandas DataFrame
+    """
+    import pandas as pd
+    data = {}
+    for name, column in columns.items():
+        if isinstance(column, tuple):
+            codes, values = column
+            values = np.array(values + [np.nan], dtype=object)
+            column = values[np.where(codes < 0, len(values) - 1, codes)]
+        data[name] = column
+    return pd.DataFrame(data)
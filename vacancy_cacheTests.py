@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import statistics_creator
+import vacancy_cache
+from statistics_creatorTests import write_vacancies_csv, legacy_statistics, accumulated_statistics
+
+
+class VacancyCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.directory.name, 'vacancies.csv')
+        write_vacancies_csv(self.file_name, 500, seed=3)
+        self.cache = vacancy_cache.VacancyCache(os.path.join(self.directory.name, 'cache'))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        self.cache.store(self.file_name, 'test', {'salary': np.arange(5, dtype=np.float64),
+                                                  'town': vacancy_cache.encode_strings(['a', 'b', 'a', 'c', 'a'])})
+        columns = self.cache.load(self.file_name, 'test')
+        self.assertIsInstance(columns['salary'], np.memmap)
+        self.assertEqual(columns['salary'].tolist(), [0, 1, 2, 3, 4])
+        self.assertEqual([columns['town'][1][code] for code in columns['town'][0]], ['a', 'b', 'a', 'c', 'a'])
+        self.assertIsNone(self.cache.load(self.file_name, 'other'))
+
+    def test_invalidation(self):
+        self.cache.store(self.file_name, 'test', {'salary': np.arange(5)})
+        with open(self.file_name, 'a', encoding='utf-8') as file:
+            file.write('Программист,1000,2000,RUR,Москва,2022-01-01T10:00:00+0300\n')
+        self.assertIsNone(self.cache.load(self.file_name, 'test'))
+        self.assertEqual(os.listdir(self.cache.cache_dir), [])
+
+    def test_eviction(self):
+        self.cache.max_size = 3000
+        self.cache.store(self.file_name, 'first', {'salary': np.zeros(200)})
+        self.cache.store(self.file_name, 'second', {'salary': np.zeros(200)})
+        self.assertIsNone(self.cache.load(self.file_name, 'first'))
+        self.assertIsNotNone(self.cache.load(self.file_name, 'second'))
+
+    def test_statistics_from_cache(self):
+        for _ in range(2):
+            parser = statistics_creator.CSVParser(self.file_name, 'Программист')
+            accumulator = parser.create_columnar_dataset(self.cache).create_accumulator('Программист')
+            self.assertEqual(accumulated_statistics(accumulator), legacy_statistics(self.file_name, 'Программист'))
+
+    def test_frame_round_trip(self):
+        frame = pd.DataFrame({'name': ['a', None, 'b'], 'Salary': [1.0, np.nan, 3.0]})
+        self.cache.store(self.file_name, 'frame', vacancy_cache.frame_to_columns(frame))
+        restored = vacancy_cache.columns_to_frame(self.cache.load(self.file_name, 'frame'))
+        pd.testing.assert_frame_equal(restored, frame, check_dtype=False)
+
+
+if __name__ == '__main__':
+    unittest.main()